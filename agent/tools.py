@@ -4,6 +4,7 @@ Nami Hospital Assistant - Tool Functions
 All tools call backend API endpoints using httpx
 """
 
+import asyncio
 import httpx
 import os
 import json
@@ -28,6 +29,19 @@ async def log_interaction(query: str, intent: str, action: str, target: str, res
         except Exception as e:
             print(f"Logging failed: {e}")
 
+_pending_logs = set()
+
+def _spawn_log(coroutine):
+    """Run a log_interaction call in the background, keeping a reference until it finishes"""
+    task = asyncio.create_task(coroutine)
+    _pending_logs.add(task)
+    task.add_done_callback(_pending_logs.discard)
+
+async def call_batch(client: httpx.AsyncClient, requests: List[Dict[str, Any]], mode: str = "parallel") -> List[Dict[str, Any]]:
+    """Run several backend calls in one round trip via POST /batch; returns one result per request"""
+    response = await client.post(f"{API_BASE}/batch", json={"mode": mode, "requests": requests})
+    return response.json()["results"]
+
 # ==================== DOCTOR TOOLS ====================
 
 @function_tool()
@@ -126,16 +140,17 @@ async def get_patient_info(patient_id: Optional[str] = None, name: Optional[str]
         if patient_id:
             response = await client.get(f"{API_BASE}/patients/{patient_id}")
         elif name:
-            response = await client.get(f"{API_BASE}/patients", params={"name": name})
-            patients = response.json()
-            if not patients:
+            # Lookup by name and the detail read in one round trip
+            _, response = await call_batch(client, [
+                {"id": "lookup", "path": "/patients", "query": {"name": name}},
+                {"path": "/patients/${lookup.body.0._id}"},
+            ])
+            if response["status"] != 200:
                 return f"No patient found with name {name}"
-            patient = patients[0]
-            return f"Patient: {patient['name']}, Room: {patient['room_number']}, Status: {patient['status']}, Age: {patient['age']}"
         else:
             return "Please provide either patient ID or name"
         
-        patient = response.json()
+        patient = response["body"] if isinstance(response, dict) else response.json()
         result = f"Patient: {patient['name']}, Room: {patient['room_number']}, Status: {patient['status']}, Age: {patient['age']}, Blood Type: {patient.get('blood_type', 'N/A')}"
         
         await log_interaction(
@@ -201,6 +216,46 @@ async def book_appointment(doctor_name: str, patient_name: str, date: str, time:
         
         return result
 
+@function_tool()
+async def find_free_slots(specialization: Optional[str] = None, start_date: Optional[str] = None, days: int = 7) -> str:
+    """
+    Find free appointment slots for doctors of a specialization.
+    
+    Args:
+        specialization: Medical specialization (cardiology, neurology, etc.), or all doctors if omitted
+        start_date: First day to search (YYYY-MM-DD, 'today' or 'tomorrow'), defaults to today
+        days: Number of days to search
+    
+    Returns:
+        Free slots per day and doctor
+    """
+    async with httpx.AsyncClient() as client:
+        if start_date and start_date.lower() == "today":
+            start_date = datetime.now().strftime("%Y-%m-%d")
+        elif start_date and start_date.lower() == "tomorrow":
+            from datetime import timedelta
+            start_date = (datetime.now() + timedelta(days=1)).strftime("%Y-%m-%d")
+        
+        params = {"days": days}
+        if specialization:
+            params["specialization"] = specialization
+        if start_date:
+            params["start_date"] = start_date
+        
+        response = await client.get(f"{API_BASE}/doctors/free-slots", params=params)
+        slots = response.json()
+        
+        days_with_slots = [day for day in slots.get("days", []) if day["free"]]
+        if not days_with_slots:
+            return "No free slots found in that period."
+        
+        result = "Free slots:\n"
+        for day in days_with_slots[:3]:  # Limit for voice readability
+            for doctor, times in list(day["doctors"].items())[:3]:
+                result += f"- {day['date']}: {doctor} at {', '.join(times[:4])}\n"
+        
+        return result
+
 # ==================== MEDICINE TOOLS ====================
 
 @function_tool()
@@ -225,37 +280,28 @@ async def assign_medicine(patient_name: str, medicine_name: str, dosage: str, fr
             "dosage": dosage,
             "frequency": frequency,
             "room_number": room_number,
-            "status": "pending",
             "assigned_at": datetime.utcnow().isoformat()
         }
         
-        response = await client.post(f"{API_BASE}/medicines/assign", json=payload)
-        medicine_record = response.json()
-        
-        # Also create a robot delivery command
-        robot_payload = {
-            "intent": "medicine_delivery",
-            "action": "deliver",
-            "target": room_number or "patient room",
-            "details": {
-                "medicine": medicine_name,
-                "patient": patient_name,
-                "dosage": dosage
-            },
-            "status": "pending"
-        }
-        await client.post(f"{API_BASE}/robot/commands", json=robot_payload)
-        
         result = f"Assigned {dosage} of {medicine_name} to {patient_name}. Delivery scheduled to room {room_number or 'TBD'}."
+        log_payload = {
+            "query": f"assign_medicine({patient_name}, {medicine_name}, {dosage})",
+            "intent": "medicine",
+            "action": "assign",
+            "target": patient_name,
+            "response": result,
+            "timestamp": datetime.utcnow().isoformat()
+        }
         
-        await log_interaction(
-            query=f"assign_medicine({patient_name}, {medicine_name}, {dosage})",
-            intent="medicine",
-            action="assign",
-            target=patient_name,
-            response=result
-        )
+        # Medicine and its linked robot delivery command (one transaction), then the log, in one round trip;
+        # sequential so the log is only written once the assignment succeeded
+        dispatch, _ = await call_batch(client, [
+            {"method": "POST", "path": "/medicines/assign-and-dispatch", "body": payload},
+            {"method": "POST", "path": "/logs", "body": log_payload},
+        ], mode="sequential")
         
+        if dispatch["status"] >= 400:
+            return f"Could not assign {medicine_name} to {patient_name}."
         return result
 
 @function_tool()
@@ -611,13 +657,14 @@ async def trigger_emergency_alert(alert_type: str, location: str, details: Optio
         
         result = f"EMERGENCY ALERT: {alert_type.upper()} triggered at {location}. All emergency personnel notified."
         
-        await log_interaction(
+        # Don't hold up the confirmation on the log write
+        _spawn_log(log_interaction(
             query=f"trigger_emergency_alert({alert_type}, {location})",
             intent="emergency",
             action="trigger",
             target=location,
             response=result
-        )
+        ))
         
         return result
 
@@ -658,6 +705,7 @@ TOOL_REGISTRY = {
     "list_patients": list_patients,
     "get_patient_info": get_patient_info,
     "book_appointment": book_appointment,
+    "find_free_slots": find_free_slots,
     "assign_medicine": assign_medicine,
     "get_medicine_tasks": get_medicine_tasks,
     "mark_medicine_delivered": mark_medicine_delivered,
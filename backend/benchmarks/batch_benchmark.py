@@ -0,0 +1,124 @@
+"""
+Batch Endpoint Benchmark
+Times the agent's multi-call tool turns as separate HTTP calls (how the
+tools used to call the backend) and as one POST /batch, against a running
+backend. --rtt-ms adds a simulated network round trip to every HTTP call,
+since on localhost the round trip itself costs almost nothing.
+
+Chains:
+  - patient lookup: GET /patients?name=... then GET /patients/{id}
+  - medicine assign: POST /medicines/assign then POST /robot/commands
+    (created records are deleted afterwards, outside the timing)
+
+Run from the backend directory (backend must be running, with dummy data):
+    python benchmarks/batch_benchmark.py [--url http://localhost:5000] [--turns 50] [--rtt-ms 20]
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+
+class Client:
+    """httpx client that sleeps a simulated round trip before each call"""
+    
+    def __init__(self, client: httpx.AsyncClient, rtt_ms: float):
+        self.client = client
+        self.rtt = rtt_ms / 1000
+    
+    async def request(self, method: str, path: str, **kwargs) -> httpx.Response:
+        await asyncio.sleep(self.rtt)
+        response = await self.client.request(method, path, **kwargs)
+        response.raise_for_status()
+        return response
+
+
+def medicine_payload(i: int) -> dict:
+    return {"patient_name": f"Benchmark Patient {i}", "medicine_name": "Paracetamol", "dosage": "500mg", "frequency": "once", "room_number": "999"}
+
+
+def command_payload(medicine_id: str) -> dict:
+    return {"intent": "medicine_delivery", "action": "deliver", "target": "999", "details": {"medicine_id": medicine_id}}
+
+
+async def lookup_separate(client: Client, name: str) -> list:
+    patients = (await client.request("GET", "/patients", params={"name": name})).json()
+    await client.request("GET", f"/patients/{patients[0]['_id']}")
+    return []
+
+
+async def lookup_batched(client: Client, name: str) -> list:
+    await client.request("POST", "/batch", json={"requests": [
+        {"id": "lookup", "path": "/patients", "query": {"name": name}},
+        {"path": "/patients/${lookup.body.0._id}"},
+    ]})
+    return []
+
+
+async def assign_separate(client: Client, i: int) -> list:
+    medicine = (await client.request("POST", "/medicines/assign", json=medicine_payload(i))).json()
+    command = (await client.request("POST", "/robot/commands", json=command_payload(medicine["_id"]))).json()
+    return [f"/medicines/{medicine['_id']}", f"/robot/commands/{command['_id']}"]
+
+
+async def assign_batched(client: Client, i: int) -> list:
+    response = await client.request("POST", "/batch", json={"requests": [
+        {"id": "medicine", "method": "POST", "path": "/medicines/assign", "body": medicine_payload(i)},
+        {"method": "POST", "path": "/robot/commands", "body": command_payload("${medicine.body._id}")},
+    ]})
+    medicine, command = response.json()["results"]
+    return [f"/medicines/{medicine['body']['_id']}", f"/robot/commands/{command['body']['_id']}"]
+
+
+async def run(client: Client, turn, argument, turns: int) -> tuple:
+    """Latencies of `turns` sequential tool turns, plus paths of created records"""
+    latencies = []
+    created = []
+    for i in range(turns):
+        start = time.perf_counter()
+        created.extend(await turn(client, argument if argument is not None else i))
+        latencies.append(time.perf_counter() - start)
+    return latencies, created
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Separate calls vs POST /batch benchmark")
+    parser.add_argument("--url", default="http://localhost:5000")
+    parser.add_argument("--turns", type=int, default=50)
+    parser.add_argument("--rtt-ms", type=float, default=20, help="Simulated network round trip per HTTP call")
+    args = parser.parse_args()
+    
+    print("=" * 60)
+    print("📦 Nami Backend - Batch Endpoint Benchmark")
+    print("=" * 60)
+    print(f"Turns per chain: {args.turns}, simulated RTT: {args.rtt_ms:.0f} ms")
+    
+    async with httpx.AsyncClient(base_url=args.url) as http:
+        client = Client(http, args.rtt_ms)
+        patients = (await client.request("GET", "/patients")).json()
+        if not patients:
+            print("❌ No patients found; load dummy data first")
+            return
+        name = patients[0]["name"]
+        
+        chains = [
+            ("patient lookup", lookup_separate, lookup_batched, name),
+            ("medicine assign", assign_separate, assign_batched, None),
+        ]
+        for label, separate, batched, argument in chains:
+            print(f"\n{label}")
+            for mode, turn in (("separate calls", separate), ("POST /batch   ", batched)):
+                latencies, created = await run(client, turn, argument, args.turns)
+                print(
+                    f"  {mode}  median {statistics.median(latencies) * 1000:7.2f} ms  "
+                    f"p95 {sorted(latencies)[int(len(latencies) * 0.95)] * 1000:7.2f} ms"
+                )
+                for path in created:
+                    await http.delete(path)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,84 @@
+"""
+Booking Contention Benchmark
+Fires hundreds of concurrent bookings at a handful of doctor slots and
+checks that the unique slot index never lets a slot be double-booked.
+Uses a scratch database so real data is untouched.
+
+Run from the backend directory:
+    python benchmarks/booking_contention_benchmark.py [--bookings 500] [--slots 10]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from collections import Counter
+
+os.environ["MONGO_DB_NAME"] = os.getenv("BENCHMARK_DB_NAME", "nami_benchmark")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import HTTPException  # noqa: E402
+
+from models.appointment import Appointment  # noqa: E402
+from routes.appointments import create_appointment  # noqa: E402
+from utils.db import get_collection, init_database, close_database  # noqa: E402
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Concurrent appointment booking stress test")
+    parser.add_argument("--bookings", type=int, default=500)
+    parser.add_argument("--slots", type=int, default=10)
+    args = parser.parse_args()
+    
+    print("=" * 60)
+    print("📅 Nami Backend - Booking Contention Benchmark")
+    print("=" * 60)
+    
+    collection = get_collection("appointments")
+    await collection.delete_many({"doctor_name": "Dr. Benchmark"})
+    await init_database()
+    
+    outcomes = Counter()
+    
+    async def book(i: int):
+        slot = i % args.slots
+        appointment = Appointment(
+            doctor_name="Dr. Benchmark",
+            patient_name=f"Patient {i}",
+            date="2030-01-01",
+            time=f"{9 + slot // 4:02d}:{(slot % 4) * 15:02d}",
+        )
+        try:
+            await create_appointment(appointment)
+            outcomes["booked"] += 1
+        except HTTPException as e:
+            outcomes[e.status_code] += 1
+    
+    start = time.perf_counter()
+    await asyncio.gather(*[book(i) for i in range(args.bookings)])
+    elapsed = time.perf_counter() - start
+    
+    per_slot = Counter()
+    async for appt in collection.find({"doctor_name": "Dr. Benchmark", "status": {"$ne": "cancelled"}}):
+        per_slot[(appt["date"], appt["time"])] += 1
+    double_booked = {slot: n for slot, n in per_slot.items() if n > 1}
+    
+    print(f"Bookings attempted: {args.bookings} across {args.slots} slots")
+    print(f"  - booked:   {outcomes['booked']}")
+    print(f"  - 409:      {outcomes[409]}")
+    print(f"  - other:    {sum(n for k, n in outcomes.items() if k not in ('booked', 409))}")
+    print(f"  - elapsed:  {elapsed * 1000:.1f} ms ({args.bookings / elapsed:.0f} bookings/s)")
+    print(f"  - double-booked slots: {len(double_booked)}")
+    
+    await collection.delete_many({"doctor_name": "Dr. Benchmark"})
+    await close_database()
+    
+    if double_booked or outcomes["booked"] != args.slots:
+        print("❌ Slot reservation violated")
+        sys.exit(1)
+    print("✅ Zero double-bookings")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,69 @@
+"""
+Change Feed Fan-Out Benchmark
+Measures in-process fan-out of the change feed to many subscribers:
+one publisher records changes, N readers consume them with next_batch().
+Runs without MongoDB (uses the in-process feed path).
+
+Run from the backend directory:
+    python benchmarks/change_feed_benchmark.py [--subscribers 500] [--events 2000]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.changes import ChangeFeed  # noqa: E402
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Change feed fan-out benchmark")
+    parser.add_argument("--subscribers", type=int, default=500)
+    parser.add_argument("--events", type=int, default=2000)
+    args = parser.parse_args()
+    
+    print("=" * 60)
+    print("📡 Nami Backend - Change Feed Fan-Out Benchmark")
+    print("=" * 60)
+    
+    feed = ChangeFeed()
+    feed.streams_available = False
+    feed.hub.queue_size = args.events
+    
+    readers = [await feed.open(["tasks"]) for _ in range(args.subscribers)]
+    latencies = []
+    
+    async def consume(reader):
+        received = 0
+        while received < args.events:
+            batch = await reader.next_batch(timeout=10, limit=1000)
+            now = time.perf_counter()
+            for event in batch:
+                latencies.append(now - event["document"]["sent_at"])
+            received += len(batch)
+        reader.close()
+    
+    consumers = [asyncio.create_task(consume(reader)) for reader in readers]
+    
+    start = time.perf_counter()
+    for i in range(args.events):
+        feed.record_local("tasks", "insert", i, {"title": f"task {i}", "sent_at": time.perf_counter()})
+        await asyncio.sleep(0)
+    await asyncio.gather(*consumers)
+    elapsed = time.perf_counter() - start
+    
+    deliveries = args.subscribers * args.events
+    latencies.sort()
+    print(f"Subscribers: {args.subscribers}, events: {args.events}")
+    print(f"  - deliveries:  {deliveries} in {elapsed:.2f}s ({deliveries / elapsed:,.0f}/s)")
+    print(f"  - latency p50: {statistics.median(latencies) * 1000:.2f} ms")
+    print(f"  - latency p99: {latencies[int(len(latencies) * 0.99)] * 1000:.2f} ms")
+    print(f"  - dropped slow subscribers: {feed.hub.dropped_subscribers}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,71 @@
+"""
+Durability Profile Benchmark
+Measures insert throughput of each read/write-concern profile
+against the configured MongoDB, using a scratch collection.
+
+Run from the backend directory:
+    python benchmarks/db_profile_benchmark.py [--docs 2000] [--concurrency 50]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.db import DURABILITY_PROFILES, get_client_options, get_collection, close_database  # noqa: E402
+
+SCRATCH_COLLECTION = "benchmark_profiles"
+
+
+async def run_profile(profile: str, docs: int, concurrency: int) -> float:
+    """Insert `docs` log-sized documents with `concurrency` writers, return ops/s"""
+    collection = get_collection(SCRATCH_COLLECTION, profile=profile)
+    await collection.delete_many({})
+    
+    semaphore = asyncio.Semaphore(concurrency)
+    
+    async def insert(i: int):
+        async with semaphore:
+            await collection.insert_one({
+                "query": f"benchmark query {i}",
+                "intent": "benchmark",
+                "action": "insert",
+                "target": profile,
+                "response": "x" * 200,
+                "timestamp": datetime.utcnow()
+            })
+    
+    start = time.perf_counter()
+    await asyncio.gather(*[insert(i) for i in range(docs)])
+    elapsed = time.perf_counter() - start
+    
+    await collection.drop()
+    return docs / elapsed
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Write-concern profile throughput")
+    parser.add_argument("--docs", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+    
+    print("=" * 60)
+    print("🗄️  Nami Backend - Durability Profile Benchmark")
+    print("=" * 60)
+    print(f"Client options: {get_client_options()}")
+    print(f"Documents: {args.docs}, concurrency: {args.concurrency}\n")
+    
+    for profile, concerns in DURABILITY_PROFILES.items():
+        ops = await run_profile(profile, args.docs, args.concurrency)
+        wc = concerns["write_concern"].document
+        print(f"  {profile:10s} {str(wc):40s} {ops:10.0f} inserts/s")
+    
+    await close_database()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,144 @@
+"""
+Emergency Dispatch SLA Benchmark
+Fires concurrent emergency alerts while regular notification and robot
+command writes keep the database busy, and measures alert-to-delivery
+latency: from the dispatch call to both the emergency team's notification
+stream and a robot's robot_commands feed receiving it.
+Fails if p99 exceeds the SLA. Uses a scratch database so real data is untouched.
+
+Run from the backend directory:
+    python benchmarks/emergency_dispatch_benchmark.py [--alerts 200] [--concurrency 20] [--load 50] [--sla-ms 250]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+os.environ["MONGO_DB_NAME"] = os.getenv("BENCHMARK_DB_NAME", "nami_benchmark")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.notification import Notification  # noqa: E402
+from models.robot_command import RobotCommand  # noqa: E402
+from routes.notifications import create_notification  # noqa: E402
+from routes.robot import create_robot_command  # noqa: E402
+from utils.changes import change_feed  # noqa: E402
+from utils.db import get_collection, init_database, close_database  # noqa: E402
+from utils.emergency import EMERGENCY_RECIPIENT, EMERGENCY_SLA_MS, emergency_dispatcher  # noqa: E402
+from utils.notifications import notification_broadcaster  # noqa: E402
+
+BENCH_PREFIX = "Benchmark Room"
+
+
+async def cleanup():
+    pattern = {"$regex": f"^{BENCH_PREFIX}"}
+    await asyncio.gather(
+        get_collection("emergency_alerts").delete_many({"location": pattern}),
+        get_collection("notifications").delete_many({"message": {"$regex": BENCH_PREFIX}}),
+        get_collection("robot_commands").delete_many({"target": pattern}),
+        get_collection("chatbot_logs").delete_many({"target": pattern}),
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Emergency dispatch alert-to-delivery benchmark")
+    parser.add_argument("--alerts", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--load", type=int, default=50, help="Concurrent background writers")
+    parser.add_argument("--sla-ms", type=float, default=EMERGENCY_SLA_MS)
+    args = parser.parse_args()
+    
+    print("=" * 60)
+    print("🚨 Nami Backend - Emergency Dispatch SLA Benchmark")
+    print("=" * 60)
+    
+    await init_database()
+    await cleanup()
+    # No change streams are started here, so regular writes publish in-process
+    change_feed.streams_available = False
+    # The robot follower also sees every background command; don't let it be dropped
+    change_feed.hub.queue_size = 100000
+    
+    team = await notification_broadcaster.open([EMERGENCY_RECIPIENT])
+    robot = await change_feed.open(["robot_commands"])
+    sent_at = {}
+    received = {}
+    latencies = []
+    
+    def delivered(location: str, channel: str):
+        if location not in sent_at:
+            return
+        channels = received.setdefault(location, set())
+        channels.add(channel)
+        if len(channels) == 2:
+            latencies.append(time.perf_counter() - sent_at[location])
+    
+    async def follow_team():
+        while len(latencies) < args.alerts:
+            for _, notif in await team.next_batch(timeout=1):
+                delivered(notif["message"].rsplit(" at ", 1)[-1], "team")
+    
+    async def follow_robot():
+        while len(latencies) < args.alerts:
+            for event in await robot.next_batch(timeout=1, limit=500):
+                if event["operation"] == "insert" and event["document"]["intent"] == "emergency":
+                    delivered(event["document"]["target"], "robot")
+    
+    stop_load = asyncio.Event()
+    
+    async def background_writer(i: int):
+        n = 0
+        while not stop_load.is_set():
+            n += 1
+            await create_notification(Notification(recipient=f"Ward {i}", message=f"{BENCH_PREFIX} routine {n}"))
+            await create_robot_command(RobotCommand(intent="navigation", action="navigate", target=f"{BENCH_PREFIX} {i}"))
+    
+    semaphore = asyncio.Semaphore(args.concurrency)
+    
+    async def fire(i: int):
+        location = f"{BENCH_PREFIX} {i}"
+        async with semaphore:
+            sent_at[location] = time.perf_counter()
+            await emergency_dispatcher.dispatch({"alert_type": "code_blue", "location": location, "status": "active"})
+    
+    followers = [asyncio.create_task(follow_team()), asyncio.create_task(follow_robot())]
+    writers = [asyncio.create_task(background_writer(i)) for i in range(args.load)]
+    await asyncio.sleep(0.5)
+    
+    start = time.perf_counter()
+    await asyncio.gather(*[fire(i) for i in range(args.alerts)])
+    try:
+        await asyncio.wait_for(asyncio.gather(*followers), timeout=10)
+    except asyncio.TimeoutError:
+        pass
+    elapsed = time.perf_counter() - start
+    
+    stop_load.set()
+    await asyncio.gather(*writers)
+    await emergency_dispatcher.drain()
+    team.close()
+    robot.close()
+    
+    materialized = await get_collection("robot_commands").count_documents({"intent": "emergency", "target": {"$regex": f"^{BENCH_PREFIX}"}})
+    await cleanup()
+    await close_database()
+    
+    latencies.sort()
+    p99 = latencies[min(int(len(latencies) * 0.99), len(latencies) - 1)] * 1000 if latencies else float("inf")
+    print(f"Alerts: {args.alerts} (concurrency {args.concurrency}) with {args.load} background writers")
+    print(f"  - delivered to team and robot: {len(latencies)}/{args.alerts} in {elapsed:.2f}s")
+    if latencies:
+        print(f"  - latency p50: {statistics.median(latencies) * 1000:.2f} ms")
+    print(f"  - latency p99: {p99:.2f} ms (SLA {args.sla_ms:.0f} ms)")
+    print(f"  - robot commands written in background: {materialized}/{args.alerts}")
+    
+    if len(latencies) < args.alerts or p99 > args.sla_ms or materialized != args.alerts:
+        print("❌ Emergency dispatch SLA not met")
+        sys.exit(1)
+    print("✅ Emergency dispatch within SLA")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
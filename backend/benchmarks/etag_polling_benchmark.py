@@ -0,0 +1,66 @@
+"""
+ETag Polling Benchmark
+Simulates a dashboard/robot polling unchanged data, with and without
+If-None-Match, against a running backend. Against a replica set, list
+routes that read from secondaries carry no ETag; poll detail routes there.
+
+Run from the backend directory (backend must be running):
+    python benchmarks/etag_polling_benchmark.py [--url http://localhost:5000] [--polls 500]
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+DEFAULT_PATHS = ["/tasks", "/notifications", "/robot/commands"]
+
+
+async def poll(client: httpx.AsyncClient, path: str, polls: int, conditional: bool):
+    """Poll `path` and return (latencies, total_body_bytes, status counts)"""
+    latencies = []
+    body_bytes = 0
+    statuses = {}
+    etag = None
+    
+    for _ in range(polls):
+        headers = {"If-None-Match": etag} if conditional and etag else {}
+        start = time.perf_counter()
+        response = await client.get(path, headers=headers)
+        latencies.append(time.perf_counter() - start)
+        
+        body_bytes += len(response.content)
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+        etag = response.headers.get("etag", etag)
+    
+    return latencies, body_bytes, statuses
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Conditional GET polling benchmark")
+    parser.add_argument("--url", default="http://localhost:5000")
+    parser.add_argument("--polls", type=int, default=500)
+    parser.add_argument("--path", action="append", help="Path to poll (repeatable)")
+    args = parser.parse_args()
+    
+    print("=" * 60)
+    print("🏷️  Nami Backend - ETag Polling Benchmark")
+    print("=" * 60)
+    
+    async with httpx.AsyncClient(base_url=args.url) as client:
+        for path in args.path or DEFAULT_PATHS:
+            print(f"\n{path}")
+            for conditional in (False, True):
+                latencies, body_bytes, statuses = await poll(client, path, args.polls, conditional)
+                label = "If-None-Match" if conditional else "plain GET    "
+                print(
+                    f"  {label}  median {statistics.median(latencies) * 1000:6.2f} ms  "
+                    f"p95 {sorted(latencies)[int(len(latencies) * 0.95)] * 1000:6.2f} ms  "
+                    f"body {body_bytes / 1024:8.1f} KiB  statuses {statuses}"
+                )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,110 @@
+"""
+Notification Fan-Out Benchmark
+Measures publish-to-delivery latency of new notifications to many
+per-recipient subscribers through the change feed listener path, then
+checks that a dropped slow subscriber replays what it missed.
+Runs without MongoDB (uses the in-process feed path).
+
+Run from the backend directory:
+    python benchmarks/notification_fanout_benchmark.py [--subscribers 1000] [--recipients 50] [--notifications 500]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bson import ObjectId  # noqa: E402
+
+from utils.changes import ChangeFeed  # noqa: E402
+from utils.notifications import NotificationBroadcaster  # noqa: E402
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Notification fan-out benchmark")
+    parser.add_argument("--subscribers", type=int, default=1000)
+    parser.add_argument("--recipients", type=int, default=50)
+    parser.add_argument("--notifications", type=int, default=500)
+    args = parser.parse_args()
+    
+    print("=" * 60)
+    print("🔔 Nami Backend - Notification Fan-Out Benchmark")
+    print("=" * 60)
+    
+    feed = ChangeFeed()
+    feed.streams_available = False
+    broadcaster = NotificationBroadcaster()
+    feed.add_listener("notifications", broadcaster.on_change)
+    
+    recipients = [f"Ward {i}" for i in range(args.recipients)]
+    # One in ten subscribers watches every notification (dashboards)
+    streams = []
+    for i in range(args.subscribers):
+        names = [] if i % 10 == 0 else [recipients[i % args.recipients]]
+        streams.append((names, await broadcaster.open(names)))
+    
+    expected = {}
+    for names, stream in streams:
+        if names:
+            index = recipients.index(names[0])
+            expected[stream] = len(range(index, args.notifications, args.recipients))
+        else:
+            expected[stream] = args.notifications
+    
+    latencies = []
+    
+    async def consume(stream):
+        received = 0
+        while received < expected[stream]:
+            batch = await stream.next_batch(timeout=10)
+            if not batch:
+                break
+            now = time.perf_counter()
+            for _, notif in batch:
+                latencies.append(now - notif["sent_at"])
+            received += len(batch)
+        stream.close()
+        return received
+    
+    consumers = [asyncio.create_task(consume(stream)) for _, stream in streams]
+    
+    start = time.perf_counter()
+    for i in range(args.notifications):
+        notif_id = ObjectId()
+        feed.record_local("notifications", "insert", notif_id, {
+            "_id": notif_id,
+            "recipient": recipients[i % args.recipients],
+            "message": f"Notification {i}",
+            "sent_at": time.perf_counter(),
+        })
+        await asyncio.sleep(0)
+    received = await asyncio.gather(*consumers)
+    elapsed = time.perf_counter() - start
+    
+    deliveries = sum(received)
+    latencies.sort()
+    print(f"Subscribers: {args.subscribers} over {args.recipients} recipients, notifications: {args.notifications}")
+    print(f"  - deliveries:  {deliveries}/{sum(expected.values())} in {elapsed:.2f}s ({deliveries / elapsed:,.0f}/s)")
+    print(f"  - latency p50: {statistics.median(latencies) * 1000:.2f} ms")
+    print(f"  - latency p99: {latencies[int(len(latencies) * 0.99)] * 1000:.2f} ms")
+    
+    # A subscriber that stops reading is dropped, then replays from its last id
+    broadcaster.hub.queue_size = 10
+    slow = await broadcaster.open([recipients[0]])
+    for i in range(25):
+        broadcaster.publish({"_id": str(ObjectId()), "recipient": recipients[0], "message": f"Backlog {i}"})
+    first = await slow.next_batch(timeout=1, limit=5)
+    resumed = await broadcaster.open([recipients[0]], first[-1][0])
+    replayed = await resumed.next_batch(timeout=1)
+    resumed.close()
+    print("\nSlow consumer:")
+    print(f"  - dropped: {slow.overflowed} (dropped subscribers: {broadcaster.hub.dropped_subscribers})")
+    print(f"  - read before drop: {len(first)}, replayed on reconnect: {len(replayed)} (expected {25 - len(first)})")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
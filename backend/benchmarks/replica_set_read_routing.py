@@ -0,0 +1,192 @@
+"""
+Replica Set Read Routing Check
+Starts a throwaway three-node replica set with local `mongod` binaries,
+seeds it, calls the route handlers directly and records which member
+served each find via pymongo command monitoring. List endpoints must be
+served by a secondary, claim/conflict-check paths by the primary.
+
+Requires `mongod` on PATH. Run from the backend directory:
+    python benchmarks/replica_set_read_routing.py [--base-port 27117] [--rounds 50]
+"""
+
+import argparse
+import asyncio
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from pymongo import MongoClient, monitoring
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPLICA_SET = "nami-rs-check"
+
+
+class FindRecorder(monitoring.CommandListener):
+    """Records the server address of every find/aggregate per collection"""
+    
+    def __init__(self):
+        self.served_by = defaultdict(list)
+    
+    def started(self, event):
+        if event.command_name in ("find", "aggregate"):
+            collection = event.command.get(event.command_name)
+            self.served_by[collection].append(event.connection_id)
+    
+    def succeeded(self, event):
+        pass
+    
+    def failed(self, event):
+        pass
+
+
+@contextmanager
+def replica_set(base_port: int):
+    """Start three mongod members, initiate the set and tear it down afterwards"""
+    if shutil.which("mongod") is None:
+        raise SystemExit("❌ mongod not found on PATH")
+    
+    workdir = tempfile.mkdtemp(prefix="nami-rs-")
+    ports = [base_port + i for i in range(3)]
+    processes = []
+    
+    try:
+        for port in ports:
+            dbpath = os.path.join(workdir, str(port))
+            os.makedirs(dbpath)
+            processes.append(subprocess.Popen(
+                ["mongod", "--replSet", REPLICA_SET, "--port", str(port),
+                 "--dbpath", dbpath, "--bind_ip", "127.0.0.1"],
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            ))
+        
+        admin = MongoClient(f"mongodb://127.0.0.1:{ports[0]}", directConnection=True)
+        deadline = time.time() + 30
+        while True:
+            try:
+                admin.admin.command("ping")
+                break
+            except Exception:
+                if time.time() > deadline:
+                    raise
+                time.sleep(0.5)
+        
+        admin.admin.command("replSetInitiate", {
+            "_id": REPLICA_SET,
+            "members": [
+                {"_id": i, "host": f"127.0.0.1:{port}", "priority": 2 if i == 0 else 1}
+                for i, port in enumerate(ports)
+            ],
+        })
+        
+        while True:
+            status = admin.admin.command("replSetGetStatus")
+            states = sorted(member["stateStr"] for member in status["members"])
+            if states == ["PRIMARY", "SECONDARY", "SECONDARY"]:
+                break
+            if time.time() > deadline + 30:
+                raise RuntimeError(f"Replica set did not converge: {states}")
+            time.sleep(0.5)
+        admin.close()
+        
+        hosts = ",".join(f"127.0.0.1:{port}" for port in ports)
+        yield f"mongodb://{hosts}/?replicaSet={REPLICA_SET}", f"127.0.0.1:{ports[0]}"
+    
+    finally:
+        for proc in processes:
+            proc.terminate()
+        for proc in processes:
+            proc.wait(timeout=30)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+async def exercise_routes(rounds: int):
+    """Call list endpoints and primary-only paths directly"""
+    from starlette.requests import Request
+    from utils.db import get_collection
+    from routes import logs, notifications, tasks, robot
+    
+    # The pending route negotiates its body format from the request headers
+    pending_request = Request({
+        "type": "http",
+        "method": "GET",
+        "path": "/robot/commands/pending",
+        "query_string": b"",
+        "headers": [(b"accept", b"application/json")],
+    })
+    
+    await get_collection("chatbot_logs").insert_many([
+        {"query": f"q{i}", "intent": "query", "action": "answer", "target": "general", "response": "ok"}
+        for i in range(100)
+    ])
+    await get_collection("robot_commands").insert_one(
+        {"intent": "navigation", "action": "navigate", "target": "Room 101", "status": "pending"}
+    )
+    # Give secondaries time to replicate the seed data
+    await asyncio.sleep(2)
+    
+    latencies = defaultdict(list)
+    for _ in range(rounds):
+        for name, call in (
+            ("list_logs", lambda: logs.list_logs(intent=None, limit=500)),
+            ("list_notifications", lambda: notifications.list_notifications(recipient=None, status=None, limit=50)),
+            ("list_tasks", lambda: tasks.list_tasks(status=None, assigned_to=None, priority=None, limit=50)),
+            ("pending_commands", lambda: robot.get_pending_commands(pending_request)),
+        ):
+            start = time.perf_counter()
+            await call()
+            latencies[name].append(time.perf_counter() - start)
+    
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Verify per-route read preference on a replica set")
+    parser.add_argument("--base-port", type=int, default=27117)
+    parser.add_argument("--rounds", type=int, default=50)
+    args = parser.parse_args()
+    
+    print("=" * 60)
+    print("🔀 Nami Backend - Replica Set Read Routing Check")
+    print("=" * 60)
+    
+    recorder = FindRecorder()
+    monitoring.register(recorder)
+    
+    with replica_set(args.base_port) as (uri, primary):
+        os.environ["MONGO_URI"] = uri
+        os.environ["MONGO_DB_NAME"] = "nami_rs_check"
+        sys.path.insert(0, BACKEND_DIR)
+        
+        latencies = asyncio.run(exercise_routes(args.rounds))
+    
+    expectations = {
+        "chatbot_logs": "secondary",
+        "notifications": "secondary",
+        "tasks": "secondary",
+        "robot_commands": "primary",
+    }
+    
+    failures = 0
+    for collection, expected in expectations.items():
+        hosts = {f"{host}:{port}" for host, port in recorder.served_by[collection]}
+        on_primary = primary in hosts
+        ok = (expected == "primary") == on_primary and hosts
+        failures += 0 if ok else 1
+        print(f"  {'✅' if ok else '❌'} {collection:16s} expected {expected:9s} served by {sorted(hosts)}")
+    
+    print("\nMedian latency per route:")
+    for name, samples in latencies.items():
+        samples.sort()
+        print(f"  {name:20s} {samples[len(samples) // 2] * 1000:7.2f} ms")
+    
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
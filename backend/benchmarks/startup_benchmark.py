@@ -0,0 +1,97 @@
+"""
+Startup Benchmark
+Measures backend cold-start time with an import-time profile
+and times index initialization against the configured MongoDB.
+
+Run from the backend directory:
+    python benchmarks/startup_benchmark.py [--runs 5] [--top 15] [--with-db]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def profile_import():
+    """Import main.py in a fresh interpreter and return (wall_seconds, importtime rows)"""
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True,
+    )
+    wall = time.perf_counter() - start
+    
+    if proc.returncode != 0:
+        raise RuntimeError(f"Importing main failed:\n{proc.stderr[-2000:]}")
+    
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative_us), int(self_us), name.strip()))
+    
+    return wall, rows
+
+
+async def time_init_database(runs: int):
+    """Time init_database on a live MongoDB (first run creates, later runs skip)"""
+    sys.path.insert(0, BACKEND_DIR)
+    from utils.db import init_database, close_database
+    
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        await init_database()
+        timings.append(time.perf_counter() - start)
+    
+    await close_database()
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backend cold-start benchmark")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--with-db", action="store_true", help="Also time init_database")
+    args = parser.parse_args()
+    
+    print("=" * 60)
+    print("⏱️  Nami Backend - Startup Benchmark")
+    print("=" * 60)
+    
+    walls = []
+    rows = []
+    for _ in range(args.runs):
+        wall, rows = profile_import()
+        walls.append(wall)
+    
+    print(f"\nCold start (import main, {args.runs} runs):")
+    print(f"  - median: {statistics.median(walls) * 1000:.1f} ms")
+    print(f"  - min:    {min(walls) * 1000:.1f} ms")
+    print(f"  - max:    {max(walls) * 1000:.1f} ms")
+    
+    print(f"\nTop {args.top} imports by cumulative time (last run):")
+    for cumulative_us, self_us, name in sorted(rows, reverse=True)[:args.top]:
+        print(f"  {cumulative_us / 1000:8.1f} ms  (self {self_us / 1000:6.1f} ms)  {name}")
+    
+    heavy = [name for _, _, name in rows if name.split(".")[0] in ("google", "livekit")]
+    print(f"\nHeavy optional modules imported at startup: {len(heavy)}")
+    
+    if args.with_db:
+        timings = asyncio.run(time_init_database(args.runs))
+        print("\ninit_database:")
+        for i, elapsed in enumerate(timings, 1):
+            print(f"  - run {i}: {elapsed * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
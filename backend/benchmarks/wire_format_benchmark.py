@@ -0,0 +1,188 @@
+"""
+Robot Wire Format Benchmark
+Byte size and encode/decode CPU time of robot traffic in the current JSON
+(whole Mongo documents) versus the trimmed command schema as JSON,
+MessagePack and CBOR, each uncompressed, gzip and zstd. Each payload is
+encoded and decoded where it is in practice: the poll is encoded by the
+backend's utils.wire (its JSON path is FastAPI's jsonable_encoder plus
+json.dumps, as for every JSON response) and decoded on the robot; the sync
+upload is encoded on the robot and decoded by utils.wire. No database or
+running backend needed.
+
+Payloads:
+  - pending poll: N queued commands (medicine, dose and navigation commands with history)
+  - sync upload: a robot's journaled reports after a stretch offline
+
+Run from the backend directory:
+    python benchmarks/wire_format_benchmark.py [--commands 20] [--reports 200] [--repeat 500]
+"""
+
+import argparse
+import gzip
+import json
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import wire  # noqa: E402
+from utils.wire import CBOR_TYPE, JSON_TYPE, MSGPACK_TYPE  # noqa: E402
+
+
+def make_commands(count: int) -> list:
+    """Queued commands as stored, like the pending poll returns them"""
+    now = datetime.utcnow()
+    commands = []
+    for i in range(count):
+        created = now - timedelta(minutes=count - i)
+        command = {
+            "_id": ObjectId(),
+            "intent": "medicine_delivery" if i % 3 else "navigation",
+            "action": "deliver" if i % 3 else "navigate",
+            "target": f"Room {300 + i % 40}",
+            "coordinates": {"x": 10.5 + i, "y": 20.25 + i} if i % 2 else None,
+            "details": {
+                "medicine": "Paracetamol",
+                "patient": f"Patient {i}",
+                "dosage": "500mg",
+                "room": f"Room {300 + i % 40}",
+                "medicine_id": str(ObjectId()),
+                "dose_ids": [f"{ObjectId()}|{created:%Y-%m-%dT%H:%M}" for _ in range(2)],
+            } if i % 3 else None,
+            "priority": "urgent" if i % 10 == 0 else "normal",
+            "scheduled_for": created + timedelta(minutes=20) if i % 3 == 2 else None,
+            "status": "pending",
+            "timestamp": created,
+            "claimed_by": None,
+            "claimed_at": None,
+            "started_at": None,
+            "completed_at": None,
+            "error_message": None,
+            "history": [{"status": "pending", "at": created}],
+        }
+        command["_id"] = str(command["_id"])
+        commands.append(command)
+    return commands
+
+
+def make_reports(count: int) -> dict:
+    """A sync body after the robot was offline for a while"""
+    now = datetime.utcnow()
+    reports = []
+    for seq in range(1, count + 1):
+        at = (now - timedelta(seconds=(count - seq) * 10)).isoformat()
+        if seq % 4 == 0:
+            reports.append({"seq": seq, "kind": "telemetry", "at": at, "data": {"location": f"Room {300 + seq % 40}", "battery": round(100 - seq * 0.1, 1), "status": "navigating"}})
+        else:
+            reports.append({"seq": seq, "kind": ("started", "completed", "failed")[seq % 4 - 1], "command_id": str(ObjectId()), "at": at})
+    return {"robot_id": "NAMI-001", "reports": reports, "held": [str(ObjectId()) for _ in range(2)], "claim": 2}
+
+
+def timed(func, repeat: int) -> float:
+    """Median microseconds per call"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1e6
+
+
+def robot_encode(payload, media_type: str, encoding: str) -> bytes:
+    """How the robot client encodes a sync body"""
+    if media_type == MSGPACK_TYPE:
+        import msgpack
+        body = msgpack.packb(payload)
+    elif media_type == CBOR_TYPE:
+        import cbor2
+        body = cbor2.dumps(payload)
+    else:
+        body = json.dumps(payload, separators=(",", ":")).encode()
+    return wire.compress(body, encoding) if encoding != "none" else body
+
+
+def backend_encode(payload, media_type: str, encoding: str) -> bytes:
+    body = wire.encode(payload, media_type)
+    return wire.compress(body, encoding) if encoding != "none" else body
+
+
+def robot_decode(body: bytes, media_type: str, encoding: str):
+    """What the robot client does with a response (httpx undoes the Content-Encoding)"""
+    if encoding == "gzip":
+        body = gzip.decompress(body)
+    elif encoding == "zstd":
+        import zstandard
+        body = zstandard.ZstdDecompressor().decompressobj().decompress(body)
+    if media_type == MSGPACK_TYPE:
+        import msgpack
+        return msgpack.unpackb(body, timestamp=3)
+    if media_type == CBOR_TYPE:
+        import cbor2
+        return cbor2.loads(body)
+    return json.loads(body)
+
+
+def backend_decode(body: bytes, media_type: str, encoding: str):
+    return wire.decode(wire.decompress(body, encoding if encoding != "none" else None), media_type)
+
+
+def measure(payload, media_type: str, encoding: str, encoder, decoder, repeat: int) -> tuple:
+    body = encoder(payload, media_type, encoding)
+    encode_us = timed(lambda: encoder(payload, media_type, encoding), repeat)
+    decode_us = timed(lambda: decoder(body, media_type, encoding), repeat)
+    return len(body), encode_us, decode_us
+
+
+def report(title: str, variants: list, encodings: list, encoder, decoder, repeat: int):
+    print(f"\n{title}")
+    print(f"  {'format':<28}{'encoding':<10}{'bytes':>9}{'vs JSON':>9}{'encode µs':>12}{'decode µs':>12}")
+    baseline = None
+    for label, payload, media_type in variants:
+        for encoding in encodings:
+            size, encode_us, decode_us = measure(payload, media_type, encoding, encoder, decoder, repeat)
+            baseline = baseline or size
+            print(f"  {label:<28}{encoding:<10}{size:>9}{size / baseline:>8.0%}{encode_us:>12.1f}{decode_us:>12.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="JSON vs MessagePack/CBOR robot wire format benchmark")
+    parser.add_argument("--commands", type=int, default=20, help="Commands in the pending poll payload")
+    parser.add_argument("--reports", type=int, default=200, help="Reports in the sync upload payload")
+    parser.add_argument("--repeat", type=int, default=500)
+    args = parser.parse_args()
+    
+    print("=" * 60)
+    print("📡 Nami Backend - Robot Wire Format Benchmark")
+    print("=" * 60)
+    
+    formats = [(JSON_TYPE, "JSON")]
+    if wire.HAS_MSGPACK:
+        formats.insert(0, (MSGPACK_TYPE, "MessagePack"))
+    if wire.HAS_CBOR:
+        formats.insert(1, (CBOR_TYPE, "CBOR"))
+    missing = [name for name, ok in (("msgpack", wire.HAS_MSGPACK), ("cbor2", wire.HAS_CBOR), ("zstandard", wire.HAS_ZSTD)) if not ok]
+    if missing:
+        print(f"⚠️  Not installed, skipped: {', '.join(missing)}")
+    encodings = ["none", "gzip"] + (["zstd"] if wire.HAS_ZSTD else [])
+    
+    formats.sort(key=lambda f: f[1] != "JSON")
+    
+    commands = make_commands(args.commands)
+    # The trimmed schema is what binary responses carry; as JSON it isolates the format from the trimming
+    trimmed = [wire.robot_command(command, MSGPACK_TYPE) for command in commands]
+    poll = [("JSON, full documents", commands, JSON_TYPE)]
+    poll += [(f"{name}, trimmed", trimmed, media_type) for media_type, name in formats]
+    report(f"Pending poll ({args.commands} commands, encoded on the backend, decoded on the robot)", poll, encodings, backend_encode, robot_decode, args.repeat)
+    
+    sync = make_reports(args.reports)
+    upload = [(name, sync, media_type) for media_type, name in formats]
+    report(f"Sync upload ({args.reports} reports, encoded on the robot, decoded on the backend)", upload, encodings, robot_encode, backend_decode, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
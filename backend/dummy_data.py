@@ -31,6 +31,8 @@ async def generate_dummy_data():
     await db.tasks.delete_many({})
     await db.robot_commands.delete_many({})
     await db.notifications.delete_many({})
+    await db.notification_counters.delete_many({})
+    await db.staff.delete_many({})
     await db.emergency_alerts.delete_many({})
     
     # Doctors
@@ -192,8 +194,11 @@ async def generate_dummy_data():
             "patient_name": "John Doe",
             "date": today.isoformat(),
             "time": "11:00",
+            "start_at": datetime.combine(today, datetime.min.time()).replace(hour=11, minute=0),
+            "duration_minutes": 30,
             "reason": "Cardiac checkup",
             "status": "scheduled",
+            "slot_reserved": True,
             "created_at": datetime.utcnow(),
             "updated_at": datetime.utcnow()
         },
@@ -202,8 +207,11 @@ async def generate_dummy_data():
             "patient_name": "Jane Smith",
             "date": today.isoformat(),
             "time": "14:00",
+            "start_at": datetime.combine(today, datetime.min.time()).replace(hour=14, minute=0),
+            "duration_minutes": 30,
             "reason": "Neurological assessment",
             "status": "scheduled",
+            "slot_reserved": True,
             "created_at": datetime.utcnow(),
             "updated_at": datetime.utcnow()
         },
@@ -212,8 +220,11 @@ async def generate_dummy_data():
             "patient_name": "Anita Singh",
             "date": tomorrow.isoformat(),
             "time": "10:00",
+            "start_at": datetime.combine(tomorrow, datetime.min.time()).replace(hour=10, minute=0),
+            "duration_minutes": 30,
             "reason": "Bone density test review",
             "status": "scheduled",
+            "slot_reserved": True,
             "created_at": datetime.utcnow(),
             "updated_at": datetime.utcnow()
         },
@@ -222,8 +233,11 @@ async def generate_dummy_data():
             "patient_name": "Michael Johnson",
             "date": tomorrow.isoformat(),
             "time": "15:30",
+            "start_at": datetime.combine(tomorrow, datetime.min.time()).replace(hour=15, minute=30),
+            "duration_minutes": 30,
             "reason": "General consultation",
             "status": "scheduled",
+            "slot_reserved": True,
             "created_at": datetime.utcnow(),
             "updated_at": datetime.utcnow()
         }
@@ -363,10 +377,35 @@ async def generate_dummy_data():
     result = await db.robot_commands.insert_many(robot_commands)
     print(f"✅ Inserted {len(result.inserted_ids)} robot commands")
     
+    # Staff directory
+    staff = [
+        {"name": "Dr. Sarah Mehat", "role": "doctor", "departments": ["Emergency Team"]},
+        {"name": "Nurse Priya Nair", "role": "nurse", "departments": ["Nursing Staff", "Emergency Team"]},
+        {"name": "Nurse Anil Kumar", "role": "nurse", "departments": ["Nursing Staff"]},
+        {"name": "Ravi Shetty", "role": "porter", "departments": ["Emergency Team"]},
+    ]
+    
+    departments = {}
+    for member in staff:
+        member.update({
+            "name_key": member["name"].lower(),
+            "department_keys": sorted(d.lower() for d in member["departments"]),
+            "phone": None,
+            "on_duty": True,
+            "created_at": datetime.utcnow(),
+            "updated_at": datetime.utcnow()
+        })
+        for department in member["department_keys"]:
+            departments.setdefault(department, []).append(member["name_key"])
+    
+    result = await db.staff.insert_many(staff)
+    print(f"✅ Inserted {len(result.inserted_ids)} staff members")
+    
     # Notifications
     notifications = [
         {
             "recipient": "Dr. Sarah Mehat",
+            "recipient_key": "dr. sarah mehat",
             "message": "Patient John Doe's test results are ready",
             "priority": "normal",
             "status": "sent",
@@ -375,6 +414,7 @@ async def generate_dummy_data():
         },
         {
             "recipient": "Nursing Staff",
+            "recipient_key": "nursing staff",
             "message": "Medicine delivery required for Room 405",
             "priority": "high",
             "status": "sent",
@@ -383,6 +423,7 @@ async def generate_dummy_data():
         },
         {
             "recipient": "Emergency Team",
+            "recipient_key": "emergency team",
             "message": "Patient in Room 201 requires immediate attention",
             "priority": "urgent",
             "status": "read",
@@ -391,9 +432,25 @@ async def generate_dummy_data():
         }
     ]
     
+    # Department notifications are one record with read state per member
+    for notif in notifications:
+        notif["members"] = departments.get(notif["recipient_key"], [notif["recipient_key"]])
+        notif["unread_members"] = list(notif["members"]) if notif["status"] == "sent" else []
+        notif["read_by"] = [] if notif["status"] == "sent" else [
+            {"member": member, "read_at": notif["read_at"]} for member in notif["members"]
+        ]
+    
     result = await db.notifications.insert_many(notifications)
     print(f"✅ Inserted {len(result.inserted_ids)} notifications")
     
+    # Unread counters per staff member
+    unread = {}
+    for notif in notifications:
+        for member in notif["unread_members"]:
+            unread[member] = unread.get(member, 0) + 1
+    if unread:
+        await db.notification_counters.insert_many([{"_id": key, "unread": n} for key, n in unread.items()])
+    
     print("\n✅ All dummy data generated successfully!")
     print("\n📊 Summary:")
     print(f"  - Doctors: {len(doctors)}")
@@ -402,6 +459,7 @@ async def generate_dummy_data():
     print(f"  - Medicines: {len(medicines)}")
     print(f"  - Tasks: {len(tasks)}")
     print(f"  - Robot Commands: {len(robot_commands)}")
+    print(f"  - Staff: {len(staff)}")
     print(f"  - Notifications: {len(notifications)}")
     
     client.close()
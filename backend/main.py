@@ -4,10 +4,12 @@ FastAPI + MongoDB
 """
 
 import os
+import asyncio
 import logging
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from dotenv import load_dotenv
 
 # Import routes
@@ -17,9 +19,22 @@ from routes.emergency import router as emergency_router
 from routes.confirm import router as confirm_router
 from routes.notifications import router as notifications_router
 from routes.logs import router as logs_router
+from routes.changes import router as changes_router
+from routes.staff import router as staff_router
+from routes.archive import router as archive_router
+from routes.analytics import router as analytics_router
+from routes.batch import router as batch_router
 
 # Import database utilities
 from utils.db import init_database, close_database
+from utils.migrations import migrate_appointment_start_at
+from utils.changes import change_feed
+from utils.directory import staff_directory
+from utils.emergency import emergency_dispatcher
+from utils.tiering import tierer
+from utils.dosing import dose_scheduler
+from utils.etag import ETagMiddleware
+from utils import metrics
 
 # Load environment variables
 load_dotenv()
@@ -40,10 +55,31 @@ async def lifespan(app: FastAPI):
     await init_database()
     logger.info("✅ Database initialized and ready")
     
+    # Department -> members map used to expand group notifications
+    await staff_directory.load()
+    
+    # Background migrations run while the server is already serving requests
+    migration_task = asyncio.create_task(migrate_appointment_start_at())
+    
+    # Cold documents are moved to the archive tier in the background
+    tiering_task = asyncio.create_task(tierer.run_forever())
+    
+    # Dose timelines from medicine frequencies, planned into robot deliveries ahead of time
+    dosing_task = asyncio.create_task(dose_scheduler.run_forever())
+    
+    # Shared change streams feed /changes and invalidate caches and ETags
+    # on writes made by other workers
+    change_feed.start()
+    
     yield
     
     # Shutdown
     logger.info("Shutting down...")
+    migration_task.cancel()
+    tiering_task.cancel()
+    dosing_task.cancel()
+    change_feed.stop()
+    await emergency_dispatcher.drain()
     await close_database()
     logger.info("✅ Database connections closed")
 
@@ -56,6 +92,9 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# Conditional GET support for list and detail routes (added first so CORS wraps it)
+app.add_middleware(ETagMiddleware)
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -63,6 +102,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
 
 
@@ -94,6 +134,12 @@ async def health_check():
     }
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Prometheus-style metrics (response cache and other subsystems)"""
+    return metrics.render()
+
+
 # LiveKit token generation endpoint
 @app.get("/livekit/token")
 async def generate_livekit_token(room: str, participant: str):
@@ -127,6 +173,11 @@ app.include_router(emergency_router)
 app.include_router(confirm_router)
 app.include_router(notifications_router)
 app.include_router(logs_router)
+app.include_router(changes_router)
+app.include_router(staff_router)
+app.include_router(archive_router)
+app.include_router(analytics_router)
+app.include_router(batch_router)
 
 
 if __name__ == "__main__":
@@ -9,6 +9,9 @@ from .robot_command import RobotCommand
 from .chatbot_log import ChatbotLog
 from .notification import Notification
 from .emergency import EmergencyAlert
+from .staff import StaffMember
+from .batch import BatchRequest
+from .robot_sync import RobotSync
 
 __all__ = [
     "Doctor",
@@ -19,5 +22,8 @@ __all__ = [
     "RobotCommand",
     "ChatbotLog",
     "Notification",
-    "EmergencyAlert"
+    "EmergencyAlert",
+    "StaffMember",
+    "BatchRequest",
+    "RobotSync"
 ]
\ No newline at end of file
@@ -1,15 +1,41 @@
 # appointment.py - placeholder
 """Appointment Data Model"""
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
 from datetime import datetime
 from typing import Optional
 
+
+def parse_start_at(date: str, time: str) -> datetime:
+    """Combine legacy YYYY-MM-DD and HH:MM strings into a datetime"""
+    return datetime.strptime(f"{date} {time}", "%Y-%m-%d %H:%M")
+
+
+def local_naive(value: datetime) -> datetime:
+    """Aware datetimes as naive ward-local time, the form start_at is stored in"""
+    return value.astimezone().replace(tzinfo=None) if value.tzinfo is not None else value
+
+
 class Appointment(BaseModel):
     doctor_name: str
     patient_name: str
-    date: str  # YYYY-MM-DD
-    time: str  # HH:MM
+    start_at: Optional[datetime] = None
+    duration_minutes: int = Field(30, ge=5, le=480)
+    date: Optional[str] = None  # YYYY-MM-DD, kept in sync with start_at for older readers
+    time: Optional[str] = None  # HH:MM, kept in sync with start_at for older readers
     reason: Optional[str] = "General consultation"
     status: str = "scheduled"  # scheduled, completed, cancelled
     created_at: datetime = Field(default_factory=datetime.utcnow)
-    updated_at: datetime = Field(default_factory=datetime.utcnow)
\ No newline at end of file
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    
+    @model_validator(mode="after")
+    def sync_start_at(self):
+        """Derive start_at from date/time, or date/time from start_at"""
+        if self.start_at is None:
+            if not (self.date and self.time):
+                raise ValueError("Either start_at or date and time are required")
+            self.start_at = parse_start_at(self.date, self.time)
+        else:
+            self.start_at = local_naive(self.start_at).replace(second=0, microsecond=0)
+            self.date = self.start_at.strftime("%Y-%m-%d")
+            self.time = self.start_at.strftime("%H:%M")
+        return self
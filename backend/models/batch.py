@@ -0,0 +1,16 @@
+"""Batch Request Data Model"""
+from pydantic import BaseModel, Field
+from typing import Any, Dict, List, Optional
+
+class BatchItem(BaseModel):
+    id: Optional[str] = None  # name later items use in ${id.body.field} references
+    method: str = "GET"
+    path: str  # e.g. "/patients" or "/patients/${lookup.body.0._id}"
+    query: Optional[Dict[str, Any]] = None
+    body: Optional[Any] = None
+    headers: Optional[Dict[str, str]] = None
+
+class BatchRequest(BaseModel):
+    mode: str = "parallel"  # parallel (items wait only for items they reference) or sequential
+    stop_on_error: bool = True  # sequential: skip the rest after a failed item
+    requests: List[BatchItem] = Field(default_factory=list)
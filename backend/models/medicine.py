@@ -8,9 +8,10 @@ class Medicine(BaseModel):
     patient_name: str
     medicine_name: str
     dosage: str
-    frequency: str
+    frequency: str  # e.g. "twice daily", "every 6 hours", "at bedtime"; scheduled by utils/dosing.py
     room_number: Optional[str] = None
-    status: str = "pending"  # pending, assigned, delivered
+    status: str = "pending"  # pending, assigned, delivered, discontinued
     assigned_at: datetime = Field(default_factory=datetime.utcnow)
     delivered_at: Optional[datetime] = None
+    ends_at: Optional[datetime] = None  # last scheduled dose is before this time
     notes: Optional[str] = None
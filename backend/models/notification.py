@@ -2,7 +2,7 @@
 """Notification Data Model"""
 from pydantic import BaseModel, Field
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 
 class Notification(BaseModel):
     recipient: str  # staff name or department
@@ -10,4 +10,9 @@ class Notification(BaseModel):
     priority: str = "normal"  # low, normal, high, urgent
     status: str = "sent"  # sent, read, archived
     timestamp: datetime = Field(default_factory=datetime.utcnow)
-    read_at: Optional[datetime] = None
\ No newline at end of file
+    read_at: Optional[datetime] = None
+
+class MarkReadRequest(BaseModel):
+    recipient: str
+    ids: Optional[List[str]] = None  # mark these notifications read
+    before: Optional[datetime] = None  # or everything sent up to this time
@@ -2,7 +2,7 @@
 """Robot Command Data Model"""
 from pydantic import BaseModel, Field
 from datetime import datetime
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 
 class RobotCommand(BaseModel):
     intent: str  # navigation, delivery, medicine_delivery, robot_control
@@ -10,7 +10,13 @@ class RobotCommand(BaseModel):
     target: str  # location, room number, etc.
     coordinates: Optional[Dict[str, float]] = None  # {"x": 10.5, "y": 20.3}
     details: Optional[Dict[str, Any]] = None
-    status: str = "pending"  # pending, confirmed, executing, completed, failed
+    priority: str = "normal"  # normal, urgent
+    scheduled_for: Optional[datetime] = None  # not handed to robots before this time (pre-planned deliveries)
+    status: str = "pending"  # pending, confirmed, claimed, executing, completed, failed, cancelled
     timestamp: datetime = Field(default_factory=datetime.utcnow)
+    claimed_by: Optional[str] = None  # robot id holding the command
+    claimed_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
     completed_at: Optional[datetime] = None
-    error_message: Optional[str] = None
\ No newline at end of file
+    error_message: Optional[str] = None
+    history: List[Dict[str, Any]] = Field(default_factory=list)  # recent transitions: {status, at, by}
\ No newline at end of file
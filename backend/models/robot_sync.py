@@ -0,0 +1,18 @@
+"""Robot Sync Data Model"""
+from pydantic import BaseModel, Field
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+class RobotReport(BaseModel):
+    seq: int  # journal sequence number on the robot, acknowledged back
+    kind: str  # started, completed, failed, released, telemetry
+    command_id: Optional[str] = None
+    at: datetime  # when it happened on the robot
+    error_message: Optional[str] = None
+    data: Optional[Dict[str, Any]] = None  # telemetry: location, battery, status, ...
+
+class RobotSync(BaseModel):
+    robot_id: str
+    reports: List[RobotReport] = Field(default_factory=list)
+    held: List[str] = Field(default_factory=list)  # command ids still queued in the robot's journal
+    claim: int = 0  # new commands the robot wants queued
@@ -0,0 +1,29 @@
+"""
+Staff Directory Data Model
+"""
+
+from pydantic import BaseModel, Field
+from typing import Optional, List
+from datetime import datetime
+
+
+class StaffMember(BaseModel):
+    """Staff member and the departments they receive group notifications for"""
+    name: str
+    role: str  # nurse, doctor, technician, porter, etc.
+    departments: List[str] = Field(default_factory=list)  # e.g., ["Nursing Staff", "Emergency Team"]
+    phone: Optional[str] = None
+    on_duty: bool = True
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "name": "Nurse Priya Nair",
+                "role": "nurse",
+                "departments": ["Nursing Staff", "Emergency Team"],
+                "phone": "+91-98765-11111",
+                "on_duty": True
+            }
+        }
@@ -0,0 +1,73 @@
+"""
+Robot Analytics Routes
+"""
+
+from fastapi import APIRouter, HTTPException, Query
+
+from utils.cache import cached
+
+router = APIRouter(prefix="/analytics", tags=["Analytics"])
+
+
+def _check_group(group_by: str, allowed: tuple):
+    if group_by not in allowed:
+        raise HTTPException(status_code=400, detail=f"group_by must be one of: {', '.join(allowed)}")
+
+
+@router.get("/robot")
+@cached()  # TTL only: command writes are too frequent to invalidate on
+async def robot_analytics(
+    days: int = Query(7, ge=1, le=365),
+    group_by: str = Query("intent")
+):
+    """Robot command latency percentiles, failure rate and throughput per intent, target or hour"""
+    # NumPy is only imported when analytics are first requested
+    from utils import analytics
+    _check_group(group_by, analytics.COMMAND_GROUPS)
+    
+    start, end = analytics.window(days)
+    columns = await analytics.load_commands(start, end)
+    
+    return {
+        "from": start,
+        "to": end,
+        "group_by": group_by,
+        "commands": len(columns["status"]),
+        "groups": analytics.command_stats(columns, group_by, days * 24)
+    }
+
+
+@router.get("/medicines")
+@cached()
+async def medicine_analytics(
+    days: int = Query(7, ge=1, le=365),
+    group_by: str = Query("medicine_name")
+):
+    """Medicine assignment-to-delivery latency percentiles and throughput per medicine, room or hour"""
+    from utils import analytics
+    _check_group(group_by, analytics.MEDICINE_GROUPS)
+    
+    start, end = analytics.window(days)
+    columns = await analytics.load_medicines(start, end)
+    
+    return {
+        "from": start,
+        "to": end,
+        "group_by": group_by,
+        "medicines": len(columns["status"]),
+        "groups": analytics.medicine_stats(columns, group_by, days * 24)
+    }
+
+
+@router.post("/export")
+async def export_analytics(days: int = Query(7, ge=1, le=365)):
+    """Write command and medicine columns to disk (Parquet with pyarrow, else .npz)"""
+    from utils import analytics
+    start, end = analytics.window(days)
+    commands = await analytics.load_commands(start, end)
+    medicines = await analytics.load_medicines(start, end)
+    
+    return {
+        "robot_commands": await analytics.export_columns("robot_commands", commands, start, end),
+        "medicines": await analytics.export_columns("medicines", medicines, start, end)
+    }
@@ -6,9 +6,13 @@ Appointment Management Routes
 from fastapi import APIRouter, HTTPException, Query
 from typing import Optional
 from datetime import datetime
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
 
-from models.appointment import Appointment
+from models.appointment import Appointment, local_naive
 from utils.db import get_collection
+from utils.changes import record_change
+from utils.slots import slot_cache, overlapping_booking, revert_overlapping_update
 
 router = APIRouter(prefix="/appointments", tags=["Appointments"])
 
@@ -19,10 +23,12 @@ async def list_appointments(
     patient_name: Optional[str] = Query(None),
     date: Optional[str] = Query(None),
     status: Optional[str] = Query(None),
+    from_: Optional[datetime] = Query(None, alias="from"),
+    to: Optional[datetime] = Query(None),
     limit: int = Query(50, ge=1, le=100)
 ):
-    """List all appointments with optional filters"""
-    collection = get_collection("appointments")
+    """List appointments with optional filters, ordered by start time"""
+    collection = get_collection("appointments", read_preference="secondaryPreferred")
     
     query = {}
     if doctor_name:
@@ -33,8 +39,15 @@ async def list_appointments(
         query["date"] = date
     if status:
         query["status"] = status
-    
-    cursor = collection.find(query).sort("date", 1).sort("time", 1).limit(limit)
+    if from_ or to:
+        # start_at is stored as naive local time; pymongo would shift aware bounds to UTC
+        query["start_at"] = {}
+        if from_:
+            query["start_at"]["$gte"] = local_naive(from_)
+        if to:
+            query["start_at"]["$lt"] = local_naive(to)
+    
+    cursor = collection.find(query).sort([("start_at", 1)]).limit(limit)
     appointments = await cursor.to_list(length=limit)
     
     for appt in appointments:
@@ -66,22 +79,31 @@ async def create_appointment(appointment: Appointment):
     """Create a new appointment"""
     collection = get_collection("appointments")
     
-    # Check for conflicts
-    existing = await collection.find_one({
-        "doctor_name": appointment.doctor_name,
-        "date": appointment.date,
-        "time": appointment.time,
-        "status": {"$ne": "cancelled"}
-    })
+    appt_dict = appointment.model_dump()
+    appt_dict["slot_reserved"] = appointment.status != "cancelled"
     
-    if existing:
+    # The unique_active_slot index rejects a second active booking atomically
+    try:
+        result = await collection.insert_one(appt_dict)
+    except DuplicateKeyError:
         raise HTTPException(
             status_code=409,
             detail=f"Dr. {appointment.doctor_name} already has an appointment at {appointment.time} on {appointment.date}"
         )
     
-    appt_dict = appointment.model_dump()
-    result = await collection.insert_one(appt_dict)
+    # Longer bookings can overlap without sharing a start time; checking after the insert
+    # means two concurrent overlapping requests see each other and both back out
+    if appt_dict["slot_reserved"]:
+        clash = await overlapping_booking(collection, {**appt_dict, "_id": result.inserted_id})
+        if clash is not None:
+            await collection.delete_one({"_id": result.inserted_id})
+            raise HTTPException(
+                status_code=409,
+                detail=f"Dr. {appointment.doctor_name} already has an appointment at {clash.get('time')} on {appointment.date}"
+            )
+    
+    slot_cache.apply(appt_dict, +1)
+    record_change("appointments", "insert", result.inserted_id, appt_dict)
     
     appt_dict["_id"] = str(result.inserted_id)
     return appt_dict
@@ -94,18 +116,49 @@ async def update_appointment(appointment_id: str, update_data: dict):
     collection = get_collection("appointments")
     
     update_data["updated_at"] = datetime.utcnow()
+    if "status" in update_data:
+        update_data["slot_reserved"] = update_data["status"] != "cancelled"
+    
+    if update_data.get("start_at"):
+        # Keep the legacy date/time strings in sync with the new start time
+        try:
+            start_at = datetime.fromisoformat(str(update_data["start_at"]))
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid start_at")
+        update_data["start_at"] = start_at = local_naive(start_at)
+        update_data["date"] = start_at.strftime("%Y-%m-%d")
+        update_data["time"] = start_at.strftime("%H:%M")
+    
+    update = [{"$set": {field: {"$literal": value} for field, value in update_data.items()}}]
+    if "start_at" not in update_data and ("date" in update_data or "time" in update_data):
+        # Recompute start_at from the merged date and time in the same update
+        update.append({"$set": {"start_at": {"$dateFromString": {
+            "dateString": {"$concat": ["$date", " ", "$time"]},
+            "format": "%Y-%m-%d %H:%M",
+            "onError": None
+        }}}})
     
     try:
-        result = await collection.update_one(
+        before = await collection.find_one_and_update(
             {"_id": ObjectId(appointment_id)},
-            {"$set": update_data}
+            update,
+            return_document=ReturnDocument.BEFORE
         )
+    except DuplicateKeyError:
+        raise HTTPException(status_code=409, detail="Doctor already has an appointment in that slot")
     except:
         raise HTTPException(status_code=400, detail="Invalid appointment ID")
     
-    if result.matched_count == 0:
+    if before is None:
         raise HTTPException(status_code=404, detail="Appointment not found")
     
+    clash = await revert_overlapping_update(collection, before, update_data)
+    if clash is not None:
+        raise HTTPException(status_code=409, detail=f"Doctor already has an appointment at {clash.get('time')} that overlaps")
+    
+    slot_cache.apply_change(before, {**before, **update_data})
+    record_change("appointments", "update", appointment_id)
+    
     return {"message": "Appointment updated successfully"}
 
 
@@ -116,11 +169,14 @@ async def delete_appointment(appointment_id: str):
     collection = get_collection("appointments")
     
     try:
-        result = await collection.delete_one({"_id": ObjectId(appointment_id)})
+        deleted = await collection.find_one_and_delete({"_id": ObjectId(appointment_id)})
     except:
         raise HTTPException(status_code=400, detail="Invalid appointment ID")
     
-    if result.deleted_count == 0:
+    if deleted is None:
         raise HTTPException(status_code=404, detail="Appointment not found")
     
+    slot_cache.apply(deleted, -1)
+    record_change("appointments", "delete", appointment_id)
+    
     return {"message": "Appointment deleted successfully"}
\ No newline at end of file
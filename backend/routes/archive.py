@@ -0,0 +1,51 @@
+"""
+Archive Routes - Read hot and cold tiers together
+"""
+
+import re
+from bson import ObjectId
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.encoders import jsonable_encoder
+from typing import Optional
+from datetime import datetime, timezone
+
+from utils.tiering import TIERING_POLICIES, tierer
+
+router = APIRouter(prefix="/archive", tags=["Archive"])
+
+_RESERVED_PARAMS = {"from", "to", "limit", "tier"}
+_FIELD_NAME = re.compile(r"^[a-z_]+$")
+
+
+def _naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Stored timestamps are naive UTC; aware bounds are converted to match"""
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+@router.get("/{collection_name}")
+async def query_archive(
+    collection_name: str,
+    request: Request,
+    from_: Optional[datetime] = Query(None, alias="from"),
+    to: Optional[datetime] = Query(None),
+    tier: str = Query("all", pattern="^(all|hot|cold)$"),
+    limit: int = Query(100, ge=1, le=1000)
+):
+    """Documents from a tiered collection, hot and archived alike; other query params filter by equality"""
+    if collection_name not in TIERING_POLICIES:
+        raise HTTPException(status_code=404, detail=f"{collection_name} is not tiered")
+    
+    filters = {}
+    for field, value in request.query_params.items():
+        if field in _RESERVED_PARAMS:
+            continue
+        if not _FIELD_NAME.match(field):
+            raise HTTPException(status_code=400, detail=f"Invalid filter field: {field}")
+        filters[field] = value
+    
+    tiers = ("hot", "cold") if tier == "all" else (tier,)
+    documents = await tierer.query(collection_name, filters, _naive_utc(from_), _naive_utc(to), limit, tiers)
+    
+    return jsonable_encoder(documents, custom_encoder={ObjectId: str})
@@ -0,0 +1,22 @@
+"""
+Batch Routes - Several API calls in one round trip
+"""
+
+from fastapi import APIRouter, Request
+
+from models.batch import BatchRequest
+from utils.batch import execute_batch
+
+router = APIRouter(prefix="/batch", tags=["Batch"])
+
+
+@router.post("")
+async def run_batch(batch: BatchRequest, request: Request):
+    """Run sub-requests in-process, in parallel or in sequence, with ${id.body.field} references between them"""
+    results = await execute_batch(request.app, request.scope, batch)
+    
+    return {
+        "mode": batch.mode,
+        "succeeded": sum(1 for result in results if result["status"] < 400),
+        "results": results
+    }
@@ -0,0 +1,85 @@
+"""
+Change Feed Routes - Incremental sync over long-polling or SSE
+"""
+
+import json
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from typing import Optional
+
+from utils.changes import change_feed, CHANGE_FEED_COLLECTIONS
+from utils.pubsub import ReplayGap
+
+router = APIRouter(prefix="/changes", tags=["Changes"])
+
+SSE_HEARTBEAT_SECONDS = 15
+
+
+def _parse_collections(collections: Optional[str]):
+    if not collections:
+        return list(CHANGE_FEED_COLLECTIONS)
+    
+    names = [name.strip() for name in collections.split(",") if name.strip()]
+    unknown = [name for name in names if name not in CHANGE_FEED_COLLECTIONS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown collections: {', '.join(unknown)}")
+    return names
+
+
+def _sse(event: str, data: dict, event_id: Optional[str] = None) -> str:
+    message = f"event: {event}\n"
+    if event_id:
+        message += f"id: {event_id}\n"
+    return message + f"data: {json.dumps(data)}\n\n"
+
+
+@router.get("")
+async def get_changes(
+    request: Request,
+    collections: Optional[str] = Query(None, description="Comma-separated collection names (default: all)"),
+    resume_token: Optional[str] = Query(None),
+    mode: str = Query("poll", pattern="^(poll|sse)$"),
+    timeout: float = Query(25, ge=0, le=60),
+    limit: int = Query(500, ge=1, le=5000)
+):
+    """Changes since `resume_token` (or from now), by long-polling or as a Server-Sent Events stream"""
+    names = _parse_collections(collections)
+    # EventSource sends the last received id on reconnect
+    token = resume_token or request.headers.get("last-event-id")
+    
+    try:
+        reader = await change_feed.open(names, token)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid resume token")
+    except ReplayGap:
+        raise HTTPException(status_code=410, detail="Resume token too old, re-list and resync without a token")
+    
+    if mode == "poll":
+        try:
+            # Events dropped on overflow are replayed on the next call from the returned token
+            events = await reader.next_batch(timeout, limit)
+            return {"events": events, "resume_token": reader.token}
+        finally:
+            reader.close()
+    
+    async def stream():
+        try:
+            yield _sse("ready", {"resume_token": reader.token}, reader.token)
+            while not await request.is_disconnected():
+                events = await reader.next_batch(SSE_HEARTBEAT_SECONDS, limit)
+                if not events:
+                    yield ": keep-alive\n\n"
+                for event in events:
+                    yield _sse("change", event, event["resume_token"])
+                if reader.overflowed and reader.sub.queue.empty():
+                    # Dropped as a slow consumer: reconnect from the last id to replay
+                    yield _sse("resync", {"resume_token": reader.token})
+                    break
+        finally:
+            reader.close()
+    
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
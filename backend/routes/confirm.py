@@ -8,8 +8,12 @@ from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from datetime import datetime
 from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
 
 from utils.db import get_collection
+from utils.slots import slot_cache, revert_overlapping_update
+from utils.changes import record_change
+from utils.command_states import cancel_command, transition_command
 
 router = APIRouter(prefix="/confirm", tags=["Confirmation"])
 
@@ -48,16 +52,37 @@ async def confirm_action(request: ConfirmRequest):
     else:
         raise HTTPException(status_code=400, detail="Invalid action")
     
+    if request.item_type == "robot_command":
+        # Robot commands only move through their state machine
+        if request.action == "cancel":
+            await cancel_command(request.item_id)
+        else:
+            await transition_command(request.item_id, "confirmed", projection={"_id": 1})
+        record_change("robot_commands", "update", request.item_id)
+        return {"message": f"{request.item_type} {request.action}ed successfully"}
+    
     update_data["updated_at"] = datetime.utcnow()
+    if request.item_type == "appointment":
+        update_data["slot_reserved"] = request.action != "cancel"
     
-    result = await collection.update_one(
-        {"_id": item_id},
-        {"$set": update_data}
-    )
+    try:
+        before = await collection.find_one_and_update(
+            {"_id": item_id},
+            {"$set": update_data}
+        )
+    except DuplicateKeyError:
+        raise HTTPException(status_code=409, detail="Doctor already has an appointment in that slot")
     
-    if result.matched_count == 0:
+    if before is None:
         raise HTTPException(status_code=404, detail="Item not found")
     
+    if request.item_type == "appointment":
+        # Confirming a cancelled appointment takes its slots back
+        if await revert_overlapping_update(collection, before, update_data) is not None:
+            raise HTTPException(status_code=409, detail="Doctor already has an overlapping appointment")
+        slot_cache.apply_change(before, {**before, **update_data})
+    record_change(collection_map[request.item_type], "update", request.item_id)
+    
     return {"message": f"{request.item_type} {request.action}ed successfully"}
 
 
@@ -3,24 +3,36 @@
 Doctor Management Routes
 """
 
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query, Request
 from typing import Optional, List
-from datetime import datetime
+from datetime import datetime, date
 
 from models.doctor import Doctor
 from utils.db import get_collection
+from utils.cache import cached
+from utils.changes import record_change
+from utils.bulk import bulk_insert
+from utils.slots import (
+    slot_cache,
+    upcoming_bitmap,
+    working_bitmap,
+    bitmap_to_times,
+    date_range,
+    SLOT_MINUTES,
+)
 
 router = APIRouter(prefix="/doctors", tags=["Doctors"])
 
 
 @router.get("")
+@cached("doctors")
 async def list_doctors(
     specialization: Optional[str] = Query(None),
     available: Optional[str] = Query(None),
     limit: int = Query(50, ge=1, le=100)
 ):
     """List all doctors with optional filters"""
-    collection = get_collection("doctors")
+    collection = get_collection("doctors", read_preference="secondaryPreferred")
     
     query = {}
     if specialization:
@@ -38,7 +50,108 @@ async def list_doctors(
     return doctors
 
 
+def _parse_start_date(start_date: Optional[str]) -> date:
+    """Parse a YYYY-MM-DD query parameter, defaulting to today"""
+    if not start_date:
+        return datetime.now().date()
+    try:
+        return date.fromisoformat(start_date)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid start_date, expected YYYY-MM-DD")
+
+
+async def _free_bitmaps(doctors: List[dict], start: date, days: int):
+    """Free-slot bitmap per doctor name and date: working, not yet started and not booked"""
+    dates = date_range(start, days)
+    booked = await slot_cache.booked_bitmaps(
+        get_collection("appointments"),
+        [doc["name"] for doc in doctors],
+        dates
+    )
+    
+    # Appointment times are ward-local, like the default start date
+    now = datetime.now()
+    free = {}
+    for doc in doctors:
+        for day in dates:
+            day_date = date.fromisoformat(day)
+            working = working_bitmap(doc.get("schedule"), day_date) & upcoming_bitmap(day_date, now)
+            free[(doc["name"], day)] = working & ~booked[(doc["name"], day)]
+    return dates, free
+
+
+@router.get("/free-slots")
+async def find_free_slots(
+    specialization: Optional[str] = Query(None),
+    available: Optional[str] = Query(None),
+    start_date: Optional[str] = Query(None),
+    days: int = Query(7, ge=1, le=31)
+):
+    """Free appointment slots across all doctors matching a specialization"""
+    start = _parse_start_date(start_date)
+    collection = get_collection("doctors", read_preference="secondaryPreferred")
+    
+    query = {}
+    if specialization:
+        query["specialization"] = {"$regex": specialization, "$options": "i"}
+    if available == "true":
+        query["available"] = True
+    
+    doctors = await collection.find(query, {"name": 1, "schedule": 1}).to_list(length=100)
+    dates, free = await _free_bitmaps(doctors, start, days)
+    
+    result = []
+    for day in dates:
+        any_free = 0
+        for doc in doctors:
+            any_free |= free[(doc["name"], day)]
+        result.append({
+            "date": day,
+            "free": bitmap_to_times(any_free),
+            "doctors": {
+                doc["name"]: bitmap_to_times(free[(doc["name"], day)])
+                for doc in doctors
+                if free[(doc["name"], day)]
+            }
+        })
+    
+    return {"slot_minutes": SLOT_MINUTES, "days": result}
+
+
+@router.get("/{doctor_id}/free-slots")
+async def get_doctor_free_slots(
+    doctor_id: str,
+    start_date: Optional[str] = Query(None),
+    days: int = Query(7, ge=1, le=31)
+):
+    """Free appointment slots for one doctor over a range of days"""
+    from bson import ObjectId
+    start = _parse_start_date(start_date)
+    collection = get_collection("doctors")
+    
+    try:
+        doctor = await collection.find_one({"_id": ObjectId(doctor_id)}, {"name": 1, "schedule": 1})
+    except:
+        raise HTTPException(status_code=400, detail="Invalid doctor ID")
+    
+    if not doctor:
+        raise HTTPException(status_code=404, detail="Doctor not found")
+    
+    dates, free = await _free_bitmaps([doctor], start, days)
+    
+    return {
+        "doctor_id": doctor_id,
+        "doctor_name": doctor["name"],
+        "slot_minutes": SLOT_MINUTES,
+        "days": [
+            {"date": day, "free": bitmap_to_times(free[(doctor["name"], day)])}
+            for day in dates
+        ]
+    }
+
+
 @router.get("/{doctor_id}")
+@cached("doctors")
 async def get_doctor(doctor_id: str):
     """Get a specific doctor by ID"""
     from bson import ObjectId
@@ -64,10 +177,18 @@ async def create_doctor(doctor: Doctor):
     doctor_dict = doctor.model_dump()
     result = await collection.insert_one(doctor_dict)
     
+    record_change("doctors", "insert", result.inserted_id, doctor_dict)
+    
     doctor_dict["_id"] = str(result.inserted_id)
     return doctor_dict
 
 
+@router.post("/bulk")
+async def bulk_create_doctors(request: Request, ordered: bool = Query(False)):
+    """Create many doctors from a JSON array or streamed NDJSON body, with a result per item"""
+    return await bulk_insert(request, "doctors", Doctor, ordered)
+
+
 @router.patch("/{doctor_id}")
 async def update_doctor(doctor_id: str, update_data: dict):
     """Update doctor information"""
@@ -87,6 +208,8 @@ async def update_doctor(doctor_id: str, update_data: dict):
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Doctor not found")
     
+    record_change("doctors", "update", doctor_id)
+    
     return {"message": "Doctor updated successfully"}
 
 
@@ -104,4 +227,6 @@ async def delete_doctor(doctor_id: str):
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Doctor not found")
     
+    record_change("doctors", "delete", doctor_id)
+    
     return {"message": "Doctor deleted successfully"}
\ No newline at end of file
@@ -9,6 +9,8 @@ from datetime import datetime
 
 from models.emergency import EmergencyAlert
 from utils.db import get_collection
+from utils.changes import record_change
+from utils.emergency import emergency_dispatcher
 
 router = APIRouter(prefix="/emergency", tags=["Emergency"])
 
@@ -33,23 +35,11 @@ async def list_emergency_alerts(status: str = None):
 
 @router.post("")
 async def trigger_emergency(alert: EmergencyAlert):
-    """Trigger an emergency alert"""
-    collection = get_collection("emergency_alerts")
-    
-    alert_dict = alert.model_dump()
-    result = await collection.insert_one(alert_dict)
+    """Trigger an emergency alert and broadcast it to staff and robots"""
+    alert_dict = await emergency_dispatcher.dispatch(alert.model_dump())
     
-    # Also create notifications for staff
-    notifications_collection = get_collection("notifications")
-    await notifications_collection.insert_one({
-        "recipient": "Emergency Team",
-        "message": f"EMERGENCY: {alert.alert_type.upper()} at {alert.location}",
-        "priority": "urgent",
-        "status": "sent",
-        "timestamp": datetime.utcnow()
-    })
-    
-    alert_dict["_id"] = str(result.inserted_id)
+    for field in ("_id", "notification_id", "robot_command_id"):
+        alert_dict[field] = str(alert_dict[field])
     return alert_dict
 
 
@@ -70,4 +60,6 @@ async def resolve_emergency(alert_id: str):
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Alert not found")
     
+    record_change("emergency_alerts", "update", alert_id)
+    
     return {"message": "Emergency resolved"}
\ No newline at end of file
@@ -2,12 +2,16 @@
 Chatbot Logs Routes
 """
 
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, HTTPException, Query
 from typing import Optional
-from datetime import datetime
+from datetime import datetime, timedelta
 
 from models.chatbot_log import ChatbotLog
 from utils.db import get_collection
+from utils.changes import record_change
+from utils.cache import cached
+from utils.export import ndjson_response
+from utils.rollups import record_log_rollups, rollup_stats
 
 router = APIRouter(prefix="/logs", tags=["Logs"])
 
@@ -18,7 +22,7 @@ async def list_logs(
     limit: int = Query(100, ge=1, le=500)
 ):
     """List chatbot logs"""
-    collection = get_collection("chatbot_logs")
+    collection = get_collection("chatbot_logs", read_preference="secondaryPreferred")
     
     query = {}
     if intent:
@@ -33,6 +37,46 @@ async def list_logs(
     return logs
 
 
+@router.get("/stats")
+@cached("chatbot_logs")
+async def log_stats(
+    from_: Optional[datetime] = Query(None, alias="from"),
+    to: Optional[datetime] = Query(None),
+    granularity: str = Query("hour", pattern="^(hour|day)$"),
+    intent: Optional[str] = Query(None),
+    action: Optional[str] = Query(None)
+):
+    """Log volume, intent/action mix and response sizes from hourly or daily rollups (default: last 24 hours)"""
+    to = to or datetime.utcnow()
+    from_ = from_ or to - timedelta(days=1)
+    if from_ >= to:
+        raise HTTPException(status_code=400, detail="'from' must be before 'to'")
+    
+    return await rollup_stats(from_, to, granularity, intent, action)
+
+
+@router.get("/export")
+async def export_logs(
+    from_: Optional[datetime] = Query(None, alias="from"),
+    to: Optional[datetime] = Query(None),
+    intent: Optional[str] = Query(None)
+):
+    """Stream chatbot logs in a time range as NDJSON, oldest first, without a size limit"""
+    collection = get_collection("chatbot_logs", read_preference="secondaryPreferred")
+    
+    query = {}
+    if intent:
+        query["intent"] = intent
+    if from_ or to:
+        query["timestamp"] = {}
+        if from_:
+            query["timestamp"]["$gte"] = from_
+        if to:
+            query["timestamp"]["$lt"] = to
+    
+    return ndjson_response(collection.find(query).sort("timestamp", 1), "chatbot_logs.ndjson")
+
+
 @router.post("")
 async def create_log(log: ChatbotLog):
     """Create a new chatbot log entry"""
@@ -40,6 +84,9 @@ async def create_log(log: ChatbotLog):
     
     log_dict = log.model_dump()
     result = await collection.insert_one(log_dict)
+    await record_log_rollups([log_dict])
+    
+    record_change("chatbot_logs", "insert", result.inserted_id, log_dict)
     
     log_dict["_id"] = str(result.inserted_id)
     return log_dict
\ No newline at end of file
@@ -3,12 +3,16 @@
 Medicine Management Routes
 """
 
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query, Request
 from typing import Optional
-from datetime import datetime
+from datetime import datetime, timedelta
 
 from models.medicine import Medicine
-from utils.db import get_collection
+from models.robot_command import RobotCommand
+from utils.db import get_collection, run_transaction
+from utils.changes import record_change
+from utils.bulk import bulk_insert
+from utils.dosing import parse_frequency, upcoming_doses
 
 router = APIRouter(prefix="/medicines", tags=["Medicines"])
 
@@ -20,7 +24,7 @@ async def list_medicines(
     limit: int = Query(50, ge=1, le=100)
 ):
     """List all medicine records with optional filters"""
-    collection = get_collection("medicines")
+    collection = get_collection("medicines", read_preference="secondaryPreferred")
     
     query = {}
     if patient_name:
@@ -37,6 +41,50 @@ async def list_medicines(
     return medicines
 
 
+@router.get("/doses")
+async def list_doses(
+    status: Optional[str] = Query("scheduled"),
+    room_number: Optional[str] = Query(None),
+    medicine_id: Optional[str] = Query(None),
+    hours: int = Query(24, ge=1, le=168),
+    limit: int = Query(100, ge=1, le=500)
+):
+    """Upcoming doses from the dose schedule, soonest first"""
+    collection = get_collection("medicine_doses", read_preference="secondaryPreferred")
+    
+    query = {"due_at": {"$lte": datetime.utcnow() + timedelta(hours=hours)}}
+    if status:
+        query["status"] = status
+    if room_number:
+        query["room_number"] = room_number
+    if medicine_id:
+        query["medicine_id"] = medicine_id
+    
+    cursor = collection.find(query).sort("due_at", 1).limit(limit)
+    return await cursor.to_list(length=limit)
+
+
+@router.get("/{medicine_id}/schedule")
+async def get_medicine_schedule(medicine_id: str, count: int = Query(5, ge=1, le=50)):
+    """Next dose times a medicine's frequency resolves to (empty for as-needed or unrecognized frequencies)"""
+    from bson import ObjectId
+    collection = get_collection("medicines")
+    
+    try:
+        medicine = await collection.find_one({"_id": ObjectId(medicine_id)})
+    except:
+        raise HTTPException(status_code=400, detail="Invalid medicine ID")
+    
+    if not medicine:
+        raise HTTPException(status_code=404, detail="Medicine record not found")
+    
+    return {
+        "frequency": medicine["frequency"],
+        "scheduled": parse_frequency(medicine["frequency"]) is not None,
+        "next_doses": upcoming_doses(medicine, count)
+    }
+
+
 @router.get("/{medicine_id}")
 async def get_medicine(medicine_id: str):
     """Get a specific medicine record by ID"""
@@ -63,10 +111,67 @@ async def assign_medicine(medicine: Medicine):
     med_dict = medicine.model_dump()
     result = await collection.insert_one(med_dict)
     
+    record_change("medicines", "insert", result.inserted_id, med_dict)
+    
     med_dict["_id"] = str(result.inserted_id)
     return med_dict
 
 
+@router.post("/assign/bulk")
+async def bulk_assign_medicines(request: Request, ordered: bool = Query(False)):
+    """Assign a ward's medication chart from a JSON array or streamed NDJSON body, with a result per item"""
+    return await bulk_insert(request, "medicines", Medicine, ordered)
+
+
+@router.post("/assign-and-dispatch")
+async def assign_and_dispatch(
+    medicine: Medicine,
+    priority: str = Query("normal", pattern="^(normal|urgent)$")
+):
+    """Assign medicine and create its robot delivery command in one transaction, linked both ways"""
+    from bson import ObjectId
+    medicines = get_collection("medicines")
+    commands = get_collection("robot_commands")
+    
+    med_dict = medicine.model_dump()
+    cmd_dict = RobotCommand(
+        intent="medicine_delivery",
+        action="deliver",
+        target=med_dict["room_number"] or "patient room",
+        details={
+            "medicine": med_dict["medicine_name"],
+            "patient": med_dict["patient_name"],
+            "dosage": med_dict["dosage"]
+        },
+        priority=priority
+    ).model_dump()
+    
+    # Ids are chosen up front so each document can carry the other's
+    med_dict["_id"], cmd_dict["_id"] = ObjectId(), ObjectId()
+    med_dict["status"] = "assigned"
+    med_dict["robot_command_id"] = str(cmd_dict["_id"])
+    cmd_dict["details"]["medicine_id"] = str(med_dict["_id"])
+    
+    async def write(session):
+        await medicines.insert_one(med_dict, session=session)
+        try:
+            await commands.insert_one(cmd_dict, session=session)
+        except Exception:
+            if session is None:
+                # Standalone server: no transaction to abort, so undo by hand
+                await medicines.delete_one({"_id": med_dict["_id"]})
+            raise
+    
+    await run_transaction(write)
+    
+    record_change("medicines", "insert", med_dict["_id"], med_dict)
+    record_change("robot_commands", "insert", cmd_dict["_id"], cmd_dict)
+    
+    med_dict["_id"] = str(med_dict["_id"])
+    cmd_dict["_id"] = str(cmd_dict["_id"])
+    return {"medicine": med_dict, "robot_command": cmd_dict}
+
+
 @router.post("/deliver")
 async def mark_delivered(medicine_id: str):
     """Mark medicine as delivered"""
@@ -89,6 +194,8 @@ async def mark_delivered(medicine_id: str):
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Medicine record not found")
     
+    record_change("medicines", "update", medicine_id)
+    
     return {"message": "Medicine marked as delivered"}
 
 
@@ -109,6 +216,8 @@ async def update_medicine(medicine_id: str, update_data: dict):
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Medicine record not found")
     
+    record_change("medicines", "update", medicine_id)
+    
     return {"message": "Medicine record updated successfully"}
 
 
@@ -126,4 +235,6 @@ async def delete_medicine(medicine_id: str):
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Medicine record not found")
     
+    record_change("medicines", "delete", medicine_id)
+    
     return {"message": "Medicine record deleted successfully"}
\ No newline at end of file
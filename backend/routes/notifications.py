@@ -2,15 +2,33 @@
 Notification Routes
 """
 
-from fastapi import APIRouter, HTTPException, Query
-from typing import Optional
+import json
+from fastapi import APIRouter, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from typing import List, Optional
 from datetime import datetime
 
-from models.notification import Notification
-from utils.db import get_collection
+from models.notification import MarkReadRequest, Notification
+from utils.db import get_collection, run_transaction
+from utils.changes import record_change
+from utils.directory import staff_directory
+from utils.notifications import (
+    adjust_unread,
+    mark_read_pipeline,
+    notification_broadcaster,
+    recipient_filter,
+    recipient_key,
+    unmark_read_pipeline,
+)
 
 router = APIRouter(prefix="/notifications", tags=["Notifications"])
 
+STREAM_HEARTBEAT_SECONDS = 15
+
+
+def _parse_recipients(recipient: Optional[str]) -> List[str]:
+    return [name.strip() for name in (recipient or "").split(",") if name.strip()]
+
 
 @router.get("")
 async def list_notifications(
@@ -18,12 +36,12 @@ async def list_notifications(
     status: Optional[str] = Query(None),
     limit: int = Query(50, ge=1, le=100)
 ):
-    """List all notifications"""
-    collection = get_collection("notifications")
+    """List notifications, optionally for a staff member or department"""
+    collection = get_collection("notifications", read_preference="secondaryPreferred")
     
     query = {}
     if recipient:
-        query["recipient"] = {"$regex": recipient, "$options": "i"}
+        query.update(recipient_filter(recipient_key(recipient)))
     if status:
         query["status"] = status
     
@@ -35,33 +53,198 @@ async def list_notifications(
     
     return notifications
 
+
+@router.get("/unread-count")
+async def get_unread_count(recipient: str = Query(...)):
+    """Unread notifications for a staff member (or non-directory recipient), from its counter"""
+    collection = get_collection("notification_counters")
+    
+    counter = await collection.find_one({"_id": recipient_key(recipient)})
+    return {"recipient": recipient, "unread": counter["unread"] if counter else 0}
+
+
 @router.post("")
 async def create_notification(notification: Notification):
-    """Create a new notification"""
+    """Create a new notification; a department recipient becomes one record for all its members"""
+    from bson import ObjectId
     collection = get_collection("notifications")
     
     notif_dict = notification.model_dump()
-    result = await collection.insert_one(notif_dict)
+    notif_dict["recipient_key"] = recipient_key(notification.recipient)
+    notif_dict["members"] = staff_directory.expand(notif_dict["recipient_key"])
+    notif_dict["unread_members"] = list(notif_dict["members"]) if notification.status == "sent" else []
+    notif_dict["read_by"] = []
+    notif_dict["_id"] = ObjectId()
+    
+    # The notification and its unread counters are written together
+    async def write(session):
+        await collection.insert_one(notif_dict, session=session)
+        try:
+            await adjust_unread(notif_dict["unread_members"], 1, session=session)
+        except Exception:
+            if session is None:
+                # Standalone server: no transaction to abort, so undo by hand
+                await collection.delete_one({"_id": notif_dict["_id"]})
+            raise
+    
+    await run_transaction(write)
+    record_change("notifications", "insert", notif_dict["_id"], notif_dict)
     
-    notif_dict["_id"] = str(result.inserted_id)
+    notif_dict["_id"] = str(notif_dict["_id"])
     return notif_dict
 
 
 @router.patch("/{notification_id}/read")
-async def mark_as_read(notification_id: str):
-    """Mark notification as read"""
+async def mark_as_read(notification_id: str, reader: Optional[str] = Query(None, description="Staff member reading it (default: everyone)")):
+    """Mark notification as read, for one member or for everyone"""
     from bson import ObjectId
     collection = get_collection("notifications")
     
+    keys = [recipient_key(reader)] if reader else None
+    
     try:
-        result = await collection.update_one(
-            {"_id": ObjectId(notification_id)},
-            {"$set": {"status": "read", "read_at": datetime.utcnow()}}
-        )
+        notif_id = ObjectId(notification_id)
     except:
         raise HTTPException(status_code=400, detail="Invalid notification ID")
     
-    if result.matched_count == 0:
-        raise HTTPException(status_code=404, detail="Notification not found")
+    # Only members still unread are moved, so each one touches its counter once
+    unread = {"unread_members": keys[0]} if keys else {"unread_members.0": {"$exists": True}}
+    now = datetime.utcnow()
+    
+    async def write(session):
+        notif = await collection.find_one_and_update(
+            {"_id": notif_id, **unread},
+            mark_read_pipeline(now, keys),
+            projection={"unread_members": 1},
+            session=session
+        )
+        if notif is not None:
+            try:
+                await adjust_unread(keys or notif["unread_members"], -1, session=session)
+            except Exception:
+                if session is None:
+                    # Standalone server: no transaction to abort, so undo by hand
+                    await collection.update_one({"_id": notif_id}, unmark_read_pipeline(now, keys))
+                raise
+        return notif
+    
+    if await run_transaction(write) is None:
+        if await collection.count_documents({"_id": notif_id}, limit=1) == 0:
+            raise HTTPException(status_code=404, detail="Notification not found")
+        return {"message": "Notification already read"}
     
-    return {"message": "Notification marked as read"}
\ No newline at end of file
+    record_change("notifications", "update", notification_id)
+    
+    return {"message": "Notification marked as read"}
+
+
+@router.post("/mark-read")
+async def mark_many_as_read(request: MarkReadRequest):
+    """Mark a staff member's notifications read, by ids or everything sent up to `before`"""
+    from bson import ObjectId
+    collection = get_collection("notifications")
+    
+    if request.ids is None and request.before is None:
+        raise HTTPException(status_code=400, detail="Provide ids or before")
+    
+    key = recipient_key(request.recipient)
+    query = {"unread_members": key}
+    if request.ids is not None:
+        try:
+            query["_id"] = {"$in": [ObjectId(notif_id) for notif_id in request.ids]}
+        except:
+            raise HTTPException(status_code=400, detail="Invalid notification ID")
+    if request.before is not None:
+        query["timestamp"] = {"$lte": request.before}
+    
+    now = datetime.utcnow()
+    
+    async def write(session):
+        result = await collection.update_many(query, mark_read_pipeline(now, [key]), session=session)
+        try:
+            await adjust_unread([key], -result.modified_count, session=session)
+        except Exception:
+            if session is None:
+                # Standalone server: no transaction to abort, so undo by hand
+                await collection.update_many(
+                    {"read_by": {"$elemMatch": {"member": key, "read_at": now}}},
+                    unmark_read_pipeline(now, [key])
+                )
+            raise
+        return result.modified_count
+    
+    modified = await run_transaction(write)
+    if modified:
+        record_change("notifications", "update")
+    
+    return {"message": f"{modified} notifications marked as read", "modified": modified}
+
+
+@router.get("/stream")
+async def stream_notifications(
+    request: Request,
+    recipient: Optional[str] = Query(None, description="Comma-separated staff names or departments (default: all)"),
+    last_event_id: Optional[str] = Query(None)
+):
+    """New notifications for the given recipients as a Server-Sent Events stream"""
+    # EventSource sends the last received id on reconnect
+    event_id = last_event_id or request.headers.get("last-event-id")
+    
+    try:
+        stream = await notification_broadcaster.open(_parse_recipients(recipient), event_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid event id")
+    
+    async def events():
+        try:
+            yield f"event: ready\nid: {stream.last_event_id}\ndata: {{}}\n\n"
+            while not await request.is_disconnected():
+                batch = await stream.next_batch(STREAM_HEARTBEAT_SECONDS)
+                if not batch:
+                    yield ": keep-alive\n\n"
+                for notif_id, notif in batch:
+                    yield f"event: notification\nid: {notif_id}\ndata: {json.dumps(notif)}\n\n"
+                if stream.overflowed and stream.sub.queue.empty():
+                    # Dropped as a slow consumer: reconnecting from the last id replays the rest
+                    yield f"event: resync\ndata: {json.dumps({'last_event_id': stream.last_event_id})}\n\n"
+                    break
+        finally:
+            stream.close()
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.websocket("/ws")
+async def notifications_websocket(
+    websocket: WebSocket,
+    recipient: Optional[str] = None,
+    last_event_id: Optional[str] = None
+):
+    """New notifications for the given recipients over a WebSocket"""
+    await websocket.accept()
+    
+    try:
+        stream = await notification_broadcaster.open(_parse_recipients(recipient), last_event_id)
+    except ValueError:
+        await websocket.close(code=1008, reason="Invalid event id")
+        return
+    
+    try:
+        while True:
+            batch = await stream.next_batch(STREAM_HEARTBEAT_SECONDS)
+            if not batch:
+                await websocket.send_json({"type": "keep-alive"})
+            for notif_id, notif in batch:
+                await websocket.send_json({"type": "notification", "id": notif_id, "notification": notif})
+            if stream.overflowed and stream.sub.queue.empty():
+                await websocket.send_json({"type": "resync", "last_event_id": stream.last_event_id})
+                await websocket.close()
+                break
+    except WebSocketDisconnect:
+        pass
+    finally:
+        stream.close()
\ No newline at end of file
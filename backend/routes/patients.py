@@ -3,17 +3,21 @@
 Patient Management Routes
 """
 
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query, Request
 from typing import Optional
 from datetime import datetime
 
 from models.patient import Patient
 from utils.db import get_collection
+from utils.cache import cached
+from utils.changes import record_change
+from utils.bulk import bulk_insert
 
 router = APIRouter(prefix="/patients", tags=["Patients"])
 
 
 @router.get("")
+@cached("patients")
 async def list_patients(
     room_number: Optional[str] = Query(None),
     status: Optional[str] = Query(None),
@@ -21,7 +25,7 @@ async def list_patients(
     limit: int = Query(50, ge=1, le=100)
 ):
     """List all patients with optional filters"""
-    collection = get_collection("patients")
+    collection = get_collection("patients", read_preference="secondaryPreferred")
     
     query = {}
     if room_number:
@@ -41,6 +45,7 @@ async def list_patients(
 
 
 @router.get("/{patient_id}")
+@cached("patients")
 async def get_patient(patient_id: str):
     """Get a specific patient by ID"""
     from bson import ObjectId
@@ -66,10 +71,18 @@ async def create_patient(patient: Patient):
     patient_dict = patient.model_dump()
     result = await collection.insert_one(patient_dict)
     
+    record_change("patients", "insert", result.inserted_id, patient_dict)
+    
     patient_dict["_id"] = str(result.inserted_id)
     return patient_dict
 
 
+@router.post("/bulk")
+async def bulk_create_patients(request: Request, ordered: bool = Query(False)):
+    """Create many patient records from a JSON array or streamed NDJSON body, with a result per item"""
+    return await bulk_insert(request, "patients", Patient, ordered)
+
+
 @router.patch("/{patient_id}")
 async def update_patient(patient_id: str, update_data: dict):
     """Update patient information"""
@@ -89,6 +102,8 @@ async def update_patient(patient_id: str, update_data: dict):
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Patient not found")
     
+    record_change("patients", "update", patient_id)
+    
     return {"message": "Patient updated successfully"}
 
 
@@ -106,4 +121,6 @@ async def delete_patient(patient_id: str):
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Patient not found")
     
+    record_change("patients", "delete", patient_id)
+    
     return {"message": "Patient deleted successfully"}
\ No newline at end of file
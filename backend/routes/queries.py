@@ -5,16 +5,29 @@ Query Handling Routes - Uses Gemini for general questions
 
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-import google.generativeai as genai
 import os
 from datetime import datetime
 
 from utils.db import get_collection
+from utils.changes import record_change
+from utils.rollups import record_log_rollups
 
 router = APIRouter(prefix="/queries", tags=["Queries"])
 
-# Configure Gemini
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+# Gemini client, imported and configured on first use
+_genai = None
+
+
+def get_genai():
+    """Lazily import and configure the Gemini SDK"""
+    global _genai
+    
+    if _genai is None:
+        import google.generativeai as genai
+        genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+        _genai = genai
+    
+    return _genai
 
 
 class QueryRequest(BaseModel):
@@ -41,7 +54,7 @@ async def handle_query(request: QueryRequest):
     """
     
     try:
-        model = genai.GenerativeModel('gemini-pro')
+        model = get_genai().GenerativeModel('gemini-pro')
         response = model.generate_content(
             f"{hospital_context}\n\nQuestion: {request.query}\n\nAnswer:"
         )
@@ -50,14 +63,17 @@ async def handle_query(request: QueryRequest):
         
         # Log the query
         logs_collection = get_collection("chatbot_logs")
-        await logs_collection.insert_one({
+        log_entry = {
             "query": request.query,
             "intent": "query",
             "action": "answer",
             "target": "general",
             "response": answer,
             "timestamp": datetime.utcnow()
-        })
+        }
+        await logs_collection.insert_one(log_entry)
+        await record_log_rollups([log_entry])
+        record_change("chatbot_logs", "insert", log_entry["_id"], log_entry)
         
         return {"answer": answer}
         
@@ -71,7 +87,7 @@ async def parse_intent(request: QueryRequest):
     from agent.prompts import INTENT_PARSER_PROMPT
     
     try:
-        model = genai.GenerativeModel('gemini-pro')
+        model = get_genai().GenerativeModel('gemini-pro')
         prompt = INTENT_PARSER_PROMPT.format(query=request.query)
         
         response = model.generate_content(prompt)
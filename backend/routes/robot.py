@@ -3,15 +3,37 @@
 Robot Command & Control Routes
 """
 
-from fastapi import APIRouter, HTTPException, Query
+import os
+import json
+from fastapi import APIRouter, HTTPException, Query, Request
+from pydantic import ValidationError
 from typing import Optional
 from datetime import datetime
 
 from models.robot_command import RobotCommand
-from utils.db import get_collection
+from models.robot_sync import RobotSync
+from utils.db import get_collection, run_transaction
+from utils.changes import record_change
+from utils.export import ndjson_response
+from utils.dosing import settle_doses
+from utils.wire import negotiate, read_body, robot_command, wire_response
+from utils.command_states import (
+    LIFECYCLE_FIELDS,
+    QUEUED_STATUSES,
+    cancel_command,
+    claim_next_command,
+    release_expired_claims,
+    transition_command,
+)
 
 router = APIRouter(prefix="/robot", tags=["Robot"])
 
+# Most commands one sync may hand a robot for its local queue
+ROBOT_SYNC_MAX_CLAIM = int(os.getenv("ROBOT_SYNC_MAX_CLAIM", 5))
+
+# Journal report kind -> command status it moves to
+_REPORT_STATUSES = {"started": "executing", "completed": "completed", "failed": "failed", "released": "pending"}
+
 
 @router.get("/status")
 async def get_robot_status():
@@ -19,6 +41,7 @@ async def get_robot_status():
     # This would normally query the actual robot
     # For now, return simulated status
     commands_collection = get_collection("robot_commands")
+    telemetry_collection = get_collection("robot_telemetry")
     
     # Get latest command
     latest_command = await commands_collection.find_one(
@@ -39,6 +62,14 @@ async def get_robot_status():
         status["current_task"] = latest_command.get("action")
         status["location"] = latest_command.get("target")
     
+    # Last telemetry a robot synced, if any
+    telemetry = await telemetry_collection.find_one({}, sort=[("at", -1)])
+    if telemetry:
+        status["robot_id"] = telemetry.get("robot_id")
+        status["location"] = telemetry.get("location", status["location"])
+        status["battery"] = telemetry.get("battery", status["battery"])
+        status["last_update"] = telemetry["at"].isoformat()
+    
     return status
 
 
@@ -49,7 +80,7 @@ async def list_robot_commands(
     limit: int = Query(50, ge=1, le=100)
 ):
     """List robot commands"""
-    collection = get_collection("robot_commands")
+    collection = get_collection("robot_commands", read_preference="secondaryPreferred")
     
     query = {}
     if status:
@@ -66,18 +97,55 @@ async def list_robot_commands(
     return commands
 
 
+@router.get("/commands/export")
+async def export_robot_commands(
+    from_: Optional[datetime] = Query(None, alias="from"),
+    to: Optional[datetime] = Query(None),
+    status: Optional[str] = Query(None),
+    intent: Optional[str] = Query(None)
+):
+    """Stream robot commands in a time range as NDJSON, oldest first, without a size limit"""
+    collection = get_collection("robot_commands", read_preference="secondaryPreferred")
+    
+    query = {}
+    if status:
+        query["status"] = status
+    if intent:
+        query["intent"] = intent
+    if from_ or to:
+        query["timestamp"] = {}
+        if from_:
+            query["timestamp"]["$gte"] = from_
+        if to:
+            query["timestamp"]["$lt"] = to
+    
+    return ndjson_response(collection.find(query).sort("timestamp", 1), "robot_commands.ndjson")
+
+
 @router.get("/commands/pending")
-async def get_pending_commands():
-    """Get all pending robot commands (for robot client to poll)"""
+async def get_pending_commands(request: Request):
+    """Get all pending robot commands (for robot client to poll); JSON, MessagePack or CBOR per Accept"""
     collection = get_collection("robot_commands")
     
-    cursor = collection.find({"status": {"$in": ["pending", "confirmed"]}}).sort("timestamp", 1)
-    commands = await cursor.to_list(length=100)
+    # Pre-planned deliveries stay hidden until their scheduled time
+    queued = {
+        "status": {"$in": list(QUEUED_STATUSES)},
+        "$or": [{"scheduled_for": None}, {"scheduled_for": {"$lte": datetime.utcnow()}}]
+    }
+    # Urgent (emergency) commands jump the queue, each group oldest first,
+    # so the limit never cuts an urgent command behind older normal ones
+    commands = []
+    for priority in ({"priority": "urgent"}, {"priority": {"$ne": "urgent"}}):
+        cursor = collection.find({**queued, **priority}).sort("timestamp", 1)
+        commands += await cursor.to_list(length=100 - len(commands))
+        if len(commands) >= 100:
+            break
     
     for cmd in commands:
         cmd["_id"] = str(cmd["_id"])
     
-    return commands
+    media_type = negotiate(request)
+    return wire_response(request, [robot_command(cmd, media_type) for cmd in commands], media_type)
 
 
 @router.post("/commands")
@@ -85,81 +153,280 @@ async def create_robot_command(command: RobotCommand):
     """Create a new robot command"""
     collection = get_collection("robot_commands")
     
+    if command.status not in QUEUED_STATUSES:
+        raise HTTPException(status_code=400, detail=f"New commands start as {' or '.join(QUEUED_STATUSES)}")
+    
     cmd_dict = command.model_dump()
     result = await collection.insert_one(cmd_dict)
     
+    record_change("robot_commands", "insert", result.inserted_id, cmd_dict)
+    
     cmd_dict["_id"] = str(result.inserted_id)
     return cmd_dict
 
 
+@router.post("/commands/claim")
+async def claim_command(
+    request: Request,
+    robot_id: str = Query(...),
+    execute: bool = Query(True),
+    urgent: Optional[bool] = Query(None)
+):
+    """Take the next due command for a robot (urgent first, or only urgent / only other with `urgent`) and start it, in one atomic update"""
+    if await release_expired_claims():
+        record_change("robot_commands", "update")
+    
+    command = await claim_next_command(robot_id, execute=execute, urgent=urgent)
+    if command is None:
+        return wire_response(request, {"command": None})
+    
+    record_change("robot_commands", "update", command["_id"])
+    
+    command["_id"] = str(command["_id"])
+    media_type = negotiate(request)
+    return wire_response(request, {"command": robot_command(command, media_type)}, media_type)
+
+
 @router.patch("/commands/{command_id}")
 async def update_robot_command(command_id: str, update_data: dict):
-    """Update robot command status"""
+    """Update robot command fields; a status change goes through the command state machine"""
     from bson import ObjectId
     collection = get_collection("robot_commands")
     
-    # Add completed timestamp if status is completed
-    if update_data.get("status") == "completed":
-        update_data["completed_at"] = datetime.utcnow()
+    managed = [field for field in LIFECYCLE_FIELDS if field != "status" and field in update_data]
+    if managed:
+        raise HTTPException(status_code=400, detail=f"{', '.join(managed)} can only change through status transitions")
     
-    try:
-        result = await collection.update_one(
-            {"_id": ObjectId(command_id)},
-            {"$set": update_data}
-        )
-    except:
-        raise HTTPException(status_code=400, detail="Invalid command ID")
+    status = update_data.pop("status", None)
+    if status in ("completed", "failed"):
+        return await _finish(command_id, status == "completed", update_data.pop("error_message", None), None, update_data)
+    if status == "cancelled":
+        await cancel_command(command_id, fields=update_data)
+    elif status:
+        await transition_command(command_id, status, fields=update_data, projection={"_id": 1})
+    else:
+        try:
+            result = await collection.update_one(
+                {"_id": ObjectId(command_id)},
+                {"$set": update_data}
+            )
+        except:
+            raise HTTPException(status_code=400, detail="Invalid command ID")
+        
+        if result.matched_count == 0:
+            raise HTTPException(status_code=404, detail="Command not found")
     
-    if result.matched_count == 0:
-        raise HTTPException(status_code=404, detail="Command not found")
+    record_change("robot_commands", "update", command_id)
     
     return {"message": "Command updated successfully"}
 
 
-@router.post("/commands/{command_id}/execute")
-async def execute_command(command_id: str):
-    """Mark command as executing"""
-    from bson import ObjectId
-    collection = get_collection("robot_commands")
+@router.post("/commands/{command_id}/claim")
+async def claim_command_by_id(command_id: str, robot_id: str = Query(...)):
+    """Claim a queued command for a robot without starting it"""
+    await transition_command(command_id, "claimed", robot_id, projection={"_id": 1})
     
-    try:
-        result = await collection.update_one(
-            {"_id": ObjectId(command_id)},
-            {"$set": {"status": "executing"}}
-        )
-    except:
-        raise HTTPException(status_code=400, detail="Invalid command ID")
+    record_change("robot_commands", "update", command_id)
     
-    if result.matched_count == 0:
-        raise HTTPException(status_code=404, detail="Command not found")
+    return {"message": "Command claimed"}
+
+
+@router.post("/commands/{command_id}/release")
+async def release_command(command_id: str, robot_id: Optional[str] = Query(None)):
+    """Hand a claimed command back to the queue"""
+    await transition_command(command_id, "pending", robot_id, projection={"_id": 1})
+    
+    record_change("robot_commands", "update", command_id)
+    
+    return {"message": "Command released"}
+
+
+@router.post("/commands/{command_id}/execute")
+async def execute_command(command_id: str, robot_id: Optional[str] = Query(None)):
+    """Mark a queued or claimed command as executing"""
+    await transition_command(command_id, "executing", robot_id, projection={"_id": 1})
+    
+    record_change("robot_commands", "update", command_id)
     
     return {"message": "Command execution started"}
 
 
 @router.post("/commands/{command_id}/complete")
-async def complete_command(command_id: str, success: bool = True, error_message: Optional[str] = None):
-    """Mark command as completed or failed"""
+async def complete_command(
+    command_id: str,
+    success: bool = True,
+    error_message: Optional[str] = None,
+    robot_id: Optional[str] = Query(None)
+):
+    """Mark an executing command as completed or failed; a completed medicine delivery also marks its medicine delivered"""
+    return await _finish(command_id, success, error_message, robot_id)
+
+
+@router.post("/commands/{command_id}/cancel")
+async def cancel_robot_command(command_id: str, robot_id: Optional[str] = Query(None)):
+    """Cancel an unfinished command"""
+    await cancel_command(command_id, robot_id)
+    
+    record_change("robot_commands", "update", command_id)
+    
+    return {"message": "Command cancelled"}
+
+
+@router.post("/sync")
+async def sync_robot(request: Request):
+    """Apply a robot's journaled reports in order and top up its local queue, in one round trip"""
     from bson import ObjectId
     collection = get_collection("robot_commands")
     
-    update_data = {
-        "status": "completed" if success else "failed",
-        "completed_at": datetime.utcnow()
-    }
+    # JSON, MessagePack or CBOR, optionally gzip or zstd compressed
+    try:
+        sync = RobotSync.model_validate(await read_body(request))
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=json.loads(e.json(include_url=False)))
+    
+    results = []
+    telemetry = []
+    for report in sorted(sync.reports, key=lambda report: report.seq):
+        if report.kind == "telemetry":
+            telemetry.append({**(report.data or {}), "robot_id": sync.robot_id, "at": report.at})
+            results.append({"seq": report.seq, "status": "ok"})
+            continue
+        
+        status = _REPORT_STATUSES.get(report.kind)
+        if status is None or not report.command_id:
+            results.append({"seq": report.seq, "status": "invalid", "error": f"Unknown report kind '{report.kind}' or missing command_id"})
+            continue
+        
+        try:
+            if status in ("completed", "failed"):
+                await _finish(report.command_id, status == "completed", report.error_message, sync.robot_id, at=report.at)
+            else:
+                await transition_command(report.command_id, status, sync.robot_id, projection={"_id": 1}, at=report.at)
+                record_change("robot_commands", "update", report.command_id)
+            results.append({"seq": report.seq, "status": "ok"})
+        except HTTPException as e:
+            # Overtaken while the robot was offline (e.g. cancelled); retrying cannot help
+            results.append({"seq": report.seq, "status": "rejected", "error": e.detail})
     
+    if telemetry:
+        await get_collection("robot_telemetry").insert_many(telemetry)
+    
+    held_ids = [ObjectId(command_id) for command_id in sync.held if ObjectId.is_valid(command_id)]
+    
+    # A sync renews the lease on every command still claimed for this robot
+    await collection.update_many(
+        {"status": "claimed", "claimed_by": sync.robot_id},
+        {"$set": {"claimed_at": datetime.utcnow()}}
+    )
+    
+    # Queued commands the robot must drop: cancelled or reassigned meanwhile
+    dropped = []
+    if sync.held:
+        still_held = await collection.find(
+            {
+                "_id": {"$in": held_ids},
+                "status": {"$in": ["claimed", "executing"]},
+                "claimed_by": sync.robot_id
+            },
+            {"_id": 1}
+        ).to_list(length=None)
+        kept = {str(command["_id"]) for command in still_held}
+        dropped = [command_id for command_id in sync.held if command_id not in kept]
+    
+    # Claimed for this robot but not in its journal: the response that carried them was lost
+    commands = await collection.find({
+        "status": "claimed",
+        "claimed_by": sync.robot_id,
+        "_id": {"$nin": held_ids}
+    }).to_list(length=ROBOT_SYNC_MAX_CLAIM)
+    for command in commands:
+        command["_id"] = str(command["_id"])
+    
+    if sync.claim and await release_expired_claims():
+        record_change("robot_commands", "update")
+    
+    # Urgent commands are never queued on a robot, where they could sit while it
+    # is offline; robots take them with POST /commands/claim?urgent=true when ready
+    for _ in range(min(sync.claim, ROBOT_SYNC_MAX_CLAIM) - len(commands)):
+        command = await claim_next_command(sync.robot_id, execute=False, urgent=False)
+        if command is None:
+            break
+        record_change("robot_commands", "update", command["_id"])
+        command["_id"] = str(command["_id"])
+        commands.append(command)
+    
+    media_type = negotiate(request)
+    return wire_response(request, {
+        "acked": max((report.seq for report in sync.reports), default=None),
+        "results": results,
+        "dropped": dropped,
+        "commands": [robot_command(command, media_type) for command in commands],
+    }, media_type)
+
+
+async def _finish(
+    command_id: str,
+    success: bool,
+    error_message: Optional[str],
+    robot_id: Optional[str],
+    fields: Optional[dict] = None,
+    at: Optional[datetime] = None
+) -> dict:
+    from bson import ObjectId
+    medicines = get_collection("medicines")
+    commands = get_collection("robot_commands")
+    status = "completed" if success else "failed"
+    
+    fields = dict(fields or {})
     if error_message:
-        update_data["error_message"] = error_message
+        fields["error_message"] = error_message
     
-    try:
-        result = await collection.update_one(
-            {"_id": ObjectId(command_id)},
-            {"$set": update_data}
+    async def write(session):
+        try:
+            command = await transition_command(
+                command_id,
+                status,
+                robot_id,
+                fields,
+                projection={"details": 1, "completed_at": 1},
+                session=session,
+                at=at
+            )
+        except HTTPException as e:
+            # Already finished the same way: a retried /complete or a replayed sync report.
+            # The steps below are idempotent and run again, so on a standalone server
+            # (no transaction) a failure after the transition is repaired by the retry
+            if e.status_code != 409:
+                raise
+            owner = {"claimed_by": {"$in": [robot_id, None]}} if robot_id else {}
+            command = await commands.find_one(
+                {"_id": ObjectId(command_id), "status": status, **owner},
+                {"details": 1, "completed_at": 1},
+                session=session
+            )
+            if command is None:
+                raise
+        details = command.get("details") or {}
+        # Pre-planned dose delivery: its doses are delivered, or re-planned on failure
+        await settle_doses(details.get("dose_ids"), success, command["completed_at"], session=session)
+        
+        medicine_id = details.get("medicine_id")
+        if not (success and medicine_id and ObjectId.is_valid(medicine_id)):
+            return None
+        
+        result = await medicines.update_one(
+            {"_id": ObjectId(medicine_id), "status": {"$ne": "delivered"}},
+            {"$set": {"status": "delivered", "delivered_at": command["completed_at"]}},
+            session=session
         )
-    except:
-        raise HTTPException(status_code=400, detail="Invalid command ID")
+        return medicine_id if result.modified_count else None
     
-    if result.matched_count == 0:
-        raise HTTPException(status_code=404, detail="Command not found")
+    delivered_medicine_id = await run_transaction(write)
+    
+    record_change("robot_commands", "update", command_id)
+    if delivered_medicine_id:
+        record_change("medicines", "update", delivered_medicine_id)
+        return {"message": "Command completed", "delivered_medicine_id": delivered_medicine_id}
     
     return {"message": "Command completed"}
 
@@ -178,4 +445,6 @@ async def delete_robot_command(command_id: str):
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Command not found")
     
+    record_change("robot_commands", "delete", command_id)
+    
     return {"message": "Command deleted successfully"}
\ No newline at end of file
@@ -0,0 +1,139 @@
+"""
+Staff Directory Routes
+"""
+
+from fastapi import APIRouter, HTTPException, Query, Request
+from typing import Optional
+from datetime import datetime
+from pymongo.errors import DuplicateKeyError
+
+from models.staff import StaffMember
+from utils.db import get_collection
+from utils.changes import record_change
+from utils.directory import staff_directory, staff_keys
+from utils.notifications import recipient_key
+from utils.bulk import bulk_insert
+
+router = APIRouter(prefix="/staff", tags=["Staff"])
+
+
+@router.get("")
+async def list_staff(
+    department: Optional[str] = Query(None),
+    on_duty: Optional[str] = Query(None),
+    limit: int = Query(100, ge=1, le=500)
+):
+    """List staff members, optionally by department"""
+    collection = get_collection("staff", read_preference="secondaryPreferred")
+    
+    query = {}
+    if department:
+        query["department_keys"] = recipient_key(department)
+    if on_duty == "true":
+        query["on_duty"] = True
+    
+    cursor = collection.find(query).sort("name", 1).limit(limit)
+    staff = await cursor.to_list(length=limit)
+    
+    for member in staff:
+        member["_id"] = str(member["_id"])
+    
+    return staff
+
+
+@router.get("/departments")
+async def list_departments():
+    """Departments and their member keys, as used for notification expansion"""
+    return staff_directory.departments
+
+
+@router.get("/{staff_id}")
+async def get_staff_member(staff_id: str):
+    """Get a specific staff member by ID"""
+    from bson import ObjectId
+    collection = get_collection("staff")
+    
+    try:
+        member = await collection.find_one({"_id": ObjectId(staff_id)})
+    except:
+        raise HTTPException(status_code=400, detail="Invalid staff ID")
+    
+    if not member:
+        raise HTTPException(status_code=404, detail="Staff member not found")
+    
+    member["_id"] = str(member["_id"])
+    return member
+
+
+@router.post("")
+async def create_staff_member(member: StaffMember):
+    """Add a staff member to the directory"""
+    collection = get_collection("staff")
+    
+    member_dict = member.model_dump()
+    member_dict.update(staff_keys(member_dict))
+    
+    try:
+        result = await collection.insert_one(member_dict)
+    except DuplicateKeyError:
+        raise HTTPException(status_code=409, detail="A staff member with this name already exists")
+    
+    record_change("staff", "insert", result.inserted_id, member_dict)
+    
+    member_dict["_id"] = str(result.inserted_id)
+    return member_dict
+
+
+@router.post("/bulk")
+async def bulk_create_staff(request: Request, ordered: bool = Query(False)):
+    """Add a whole roster from a JSON array or streamed NDJSON body; duplicate names are reported per item"""
+    return await bulk_insert(request, "staff", StaffMember, ordered, prepare=lambda member: member.update(staff_keys(member)))
+
+
+@router.patch("/{staff_id}")
+async def update_staff_member(staff_id: str, update_data: dict):
+    """Update a staff member (name and departments keep their keys in sync)"""
+    from bson import ObjectId
+    collection = get_collection("staff")
+    
+    try:
+        member = await collection.find_one({"_id": ObjectId(staff_id)})
+    except:
+        raise HTTPException(status_code=400, detail="Invalid staff ID")
+    
+    if not member:
+        raise HTTPException(status_code=404, detail="Staff member not found")
+    
+    update_data.pop("name_key", None)
+    update_data.pop("department_keys", None)
+    if "name" in update_data or "departments" in update_data:
+        update_data.update(staff_keys({**member, **update_data}))
+    update_data["updated_at"] = datetime.utcnow()
+    
+    try:
+        await collection.update_one({"_id": member["_id"]}, {"$set": update_data})
+    except DuplicateKeyError:
+        raise HTTPException(status_code=409, detail="A staff member with this name already exists")
+    
+    record_change("staff", "update", staff_id)
+    
+    return {"message": "Staff member updated successfully"}
+
+
+@router.delete("/{staff_id}")
+async def delete_staff_member(staff_id: str):
+    """Remove a staff member from the directory"""
+    from bson import ObjectId
+    collection = get_collection("staff")
+    
+    try:
+        result = await collection.delete_one({"_id": ObjectId(staff_id)})
+    except:
+        raise HTTPException(status_code=400, detail="Invalid staff ID")
+    
+    if result.deleted_count == 0:
+        raise HTTPException(status_code=404, detail="Staff member not found")
+    
+    record_change("staff", "delete", staff_id)
+    
+    return {"message": "Staff member deleted successfully"}
@@ -3,12 +3,14 @@
 Task Management Routes
 """
 
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query, Request
 from typing import Optional
 from datetime import datetime
 
 from models.task import Task
 from utils.db import get_collection
+from utils.changes import record_change
+from utils.bulk import bulk_insert
 
 router = APIRouter(prefix="/tasks", tags=["Tasks"])
 
@@ -21,7 +23,7 @@ async def list_tasks(
     limit: int = Query(50, ge=1, le=100)
 ):
     """List all tasks with optional filters"""
-    collection = get_collection("tasks")
+    collection = get_collection("tasks", read_preference="secondaryPreferred")
     
     query = {}
     if status:
@@ -66,10 +68,18 @@ async def create_task(task: Task):
     task_dict = task.model_dump()
     result = await collection.insert_one(task_dict)
     
+    record_change("tasks", "insert", result.inserted_id, task_dict)
+    
     task_dict["_id"] = str(result.inserted_id)
     return task_dict
 
 
+@router.post("/bulk")
+async def bulk_create_tasks(request: Request, ordered: bool = Query(False)):
+    """Create many tasks from a JSON array or streamed NDJSON body, with a result per item"""
+    return await bulk_insert(request, "tasks", Task, ordered)
+
+
 @router.patch("/{task_id}")
 async def update_task(task_id: str, update_data: dict):
     """Update task information"""
@@ -89,6 +99,8 @@ async def update_task(task_id: str, update_data: dict):
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Task not found")
     
+    record_change("tasks", "update", task_id)
+    
     return {"message": "Task updated successfully"}
 
 
@@ -106,4 +118,6 @@ async def delete_task(task_id: str):
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Task not found")
     
+    record_change("tasks", "delete", task_id)
+    
     return {"message": "Task deleted successfully"}
\ No newline at end of file
@@ -0,0 +1,206 @@
+"""
+Robot Analytics
+Command and medicine history for a time window is bulk-loaded (both tiers)
+into columnar NumPy arrays once, then delivery-latency percentiles, failure
+rates and throughput are computed per group with vectorized operations
+instead of per-document Python loops or aggregation round trips.
+
+Columns can also be written to disk for offline analysis: Parquet when
+pyarrow is installed, otherwise a compressed .npz archive.
+"""
+
+import os
+import asyncio
+import importlib.util
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from utils.db import get_collection
+from utils.tiering import tierer
+
+# Analytics configuration
+ANALYTICS_EXPORT_DIR = os.getenv("ANALYTICS_EXPORT_DIR", "analytics")
+ANALYTICS_BATCH_SIZE = int(os.getenv("ANALYTICS_BATCH_SIZE", 2000))
+
+PERCENTILES = (0.5, 0.95, 0.99)
+
+COMMAND_GROUPS = ("intent", "target", "hour")
+MEDICINE_GROUPS = ("medicine_name", "room_number", "hour")
+
+_COMMAND_PROJECTION = {"intent": 1, "target": 1, "status": 1, "timestamp": 1, "completed_at": 1}
+_MEDICINE_PROJECTION = {"medicine_name": 1, "room_number": 1, "status": 1, "assigned_at": 1, "delivered_at": 1}
+
+_NAT = np.datetime64("NaT", "ms")
+
+
+def _datetimes(values: List[Optional[datetime]]) -> np.ndarray:
+    """datetime64[ms] column; missing values become NaT"""
+    return np.array([_NAT if v is None else np.datetime64(v, "ms") for v in values], dtype="datetime64[ms]")
+
+
+def _strings(values: List[Any]) -> np.ndarray:
+    return np.array(["" if v is None else str(v) for v in values], dtype=object)
+
+
+def _columns(documents: List[dict], fields: Dict[str, str]) -> Dict[str, np.ndarray]:
+    """Turn row documents into one array per field ("time" or "str" typed)"""
+    columns = {}
+    for field, kind in fields.items():
+        values = [document.get(field) for document in documents]
+        columns[field] = _datetimes(values) if kind == "time" else _strings(values)
+    return columns
+
+
+async def load_commands(start: datetime, end: datetime) -> Dict[str, np.ndarray]:
+    """Robot command columns for commands issued in [start, end), hot and archived"""
+    # Keyed by _id: an interrupted archive run can leave a document in both tiers
+    documents = {}
+    async for document in tierer.scan("robot_commands", start, end, _COMMAND_PROJECTION, ANALYTICS_BATCH_SIZE):
+        documents.setdefault(document["_id"], document)
+    return _columns(list(documents.values()), {"intent": "str", "target": "str", "status": "str", "timestamp": "time", "completed_at": "time"})
+
+
+async def load_medicines(start: datetime, end: datetime) -> Dict[str, np.ndarray]:
+    """Medicine assignment columns for medicines assigned in [start, end)"""
+    collection = get_collection("medicines", read_preference="secondaryPreferred")
+    cursor = collection.find({"assigned_at": {"$gte": start, "$lt": end}}, _MEDICINE_PROJECTION)
+    documents = await cursor.batch_size(ANALYTICS_BATCH_SIZE).to_list(length=None)
+    return _columns(documents, {"medicine_name": "str", "room_number": "str", "status": "str", "assigned_at": "time", "delivered_at": "time"})
+
+
+# ==================== VECTORIZED STATISTICS ====================
+
+def _group_keys(columns: Dict[str, np.ndarray], group_by: str, time_field: str) -> np.ndarray:
+    if group_by == "hour":
+        # Hour of day (UTC) of the issue/assignment time
+        hours = columns[time_field].astype("datetime64[h]").astype(np.int64) % 24
+        return np.char.zfill(hours.astype(str), 2).astype(object)
+    return columns[group_by]
+
+
+def _grouped_percentiles(inverse: np.ndarray, latency: np.ndarray, groups: int) -> Dict[float, np.ndarray]:
+    """Nearest-rank percentiles of `latency` per group in one sort (NaN latencies ignored)"""
+    valid = ~np.isnan(latency)
+    group_ids, values = inverse[valid], latency[valid]
+    order = np.lexsort((values, group_ids))
+    group_ids, values = group_ids[order], values[order]
+    
+    sizes = np.bincount(group_ids, minlength=groups)
+    starts = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+    
+    result = {}
+    for q in PERCENTILES:
+        rank = np.maximum(np.ceil(q * sizes).astype(np.int64) - 1, 0)
+        picked = np.full(groups, np.nan)
+        present = sizes > 0
+        picked[present] = values[starts[present] + rank[present]]
+        result[q] = picked
+    return result
+
+
+def _round(value: float) -> Optional[float]:
+    return None if np.isnan(value) else round(float(value), 2)
+
+
+def summarize(
+    keys: np.ndarray,
+    latency_s: np.ndarray,
+    succeeded: np.ndarray,
+    failed: np.ndarray,
+    window_hours: float
+) -> List[dict]:
+    """Per-group counts, failure rate, throughput and latency percentiles, busiest first"""
+    if not len(keys):
+        return []
+    
+    names, inverse = np.unique(keys, return_inverse=True)
+    groups = len(names)
+    total = np.bincount(inverse, minlength=groups)
+    done = np.bincount(inverse, weights=succeeded, minlength=groups).astype(np.int64)
+    failures = np.bincount(inverse, weights=failed, minlength=groups).astype(np.int64)
+    finished = done + failures
+    with np.errstate(invalid="ignore", divide="ignore"):
+        failure_rate = np.where(finished > 0, failures / finished, np.nan)
+    percentiles = _grouped_percentiles(inverse, latency_s, groups)
+    
+    summary = []
+    for i in np.argsort(-total, kind="stable"):
+        summary.append({
+            "key": names[i],
+            "total": int(total[i]),
+            "completed": int(done[i]),
+            "failed": int(failures[i]),
+            "failure_rate": _round(failure_rate[i] * 100),
+            "throughput_per_hour": round(float(done[i]) / window_hours, 3),
+            "latency_seconds": {f"p{int(q * 100)}": _round(percentiles[q][i]) for q in PERCENTILES},
+        })
+    return summary
+
+
+def _latency_seconds(start: np.ndarray, end: np.ndarray) -> np.ndarray:
+    """end - start in seconds as float64 (NaN where either side is missing)"""
+    delta = (end - start).astype("timedelta64[ms]")
+    seconds = delta.astype(np.float64) / 1000
+    seconds[np.isnat(delta)] = np.nan
+    return seconds
+
+
+def command_stats(columns: Dict[str, np.ndarray], group_by: str, window_hours: float) -> List[dict]:
+    """Command-to-completion latency, failure rate and throughput per intent, target or hour"""
+    status = columns["status"]
+    completed = status == "completed"
+    # Latency counts completed commands only; failures are reported as a rate
+    latency = np.where(completed, _latency_seconds(columns["timestamp"], columns["completed_at"]), np.nan)
+    return summarize(
+        _group_keys(columns, group_by, "timestamp"),
+        latency,
+        completed.astype(np.float64),
+        (status == "failed").astype(np.float64),
+        window_hours
+    )
+
+
+def medicine_stats(columns: Dict[str, np.ndarray], group_by: str, window_hours: float) -> List[dict]:
+    """Assignment-to-delivery latency and throughput per medicine, room or hour"""
+    return summarize(
+        _group_keys(columns, group_by, "assigned_at"),
+        _latency_seconds(columns["assigned_at"], columns["delivered_at"]),
+        (columns["status"] == "delivered").astype(np.float64),
+        np.zeros(len(columns["status"])),
+        window_hours
+    )
+
+
+def window(days: int, now: Optional[datetime] = None) -> tuple:
+    end = now or datetime.utcnow()
+    return end - timedelta(days=days), end
+
+
+# ==================== ON-DISK COLUMNS ====================
+
+def _write_columns(path: str, columns: Dict[str, np.ndarray]) -> str:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if importlib.util.find_spec("pyarrow") is not None:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        table = pa.table({
+            name: pa.array(column) if column.dtype.kind == "M" else pa.array(column.tolist(), type=pa.string())
+            for name, column in columns.items()
+        })
+        path += ".parquet"
+        pq.write_table(table, path, compression="zstd")
+    else:
+        path += ".npz"
+        np.savez_compressed(path, **{
+            name: column if column.dtype.kind == "M" else column.astype(str)
+            for name, column in columns.items()
+        })
+    return path
+
+
+async def export_columns(name: str, columns: Dict[str, np.ndarray], start: datetime, end: datetime) -> str:
+    """Write columns to ANALYTICS_EXPORT_DIR; returns the file path"""
+    stem = f"{name}_{start:%Y%m%d%H%M}_{end:%Y%m%d%H%M}"
+    return await asyncio.to_thread(_write_columns, os.path.join(ANALYTICS_EXPORT_DIR, stem), columns)
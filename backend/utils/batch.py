@@ -0,0 +1,215 @@
+"""
+Batch Execution
+Runs a list of sub-requests against the app itself, in-process (a direct
+ASGI call per item, through the same middleware and routes as a network
+request), so a client makes one round trip for several API calls.
+
+Items may reference earlier results with `${id.body.field}` placeholders
+in their path, query, body or headers (list indices are path segments too,
+e.g. `${lookup.body.0._id}`). In parallel mode an item only waits for the
+items it references; in sequential mode every item waits for the previous one.
+"""
+
+import os
+import re
+import json
+import asyncio
+from typing import Any, Dict, List, Set
+from urllib.parse import urlencode
+
+from fastapi import HTTPException
+
+from models.batch import BatchItem, BatchRequest
+
+# Batch limits
+BATCH_MAX_REQUESTS = int(os.getenv("BATCH_MAX_REQUESTS", 50))
+# Applies to reads only: cancelling a write partway could leave half of it applied
+BATCH_ITEM_TIMEOUT_SECONDS = float(os.getenv("BATCH_ITEM_TIMEOUT_SECONDS", 10))
+
+# Streaming and long-lived endpoints never finish inside a batch
+_EXCLUDED_PATH = re.compile(r"^/batch\b|^/changes\b|/(stream|ws|export)$")
+
+_REFERENCE = re.compile(r"\$\{([A-Za-z0-9_-]+)\.([^}]*)\}")
+
+
+class _Unresolved(Exception):
+    pass
+
+
+def _references(value: Any) -> Set[str]:
+    """Ids of the items a path, query, body or headers value refers to"""
+    if isinstance(value, str):
+        return {match.group(1) for match in _REFERENCE.finditer(value)}
+    if isinstance(value, dict):
+        return set().union(*(_references(v) for v in value.values())) if value else set()
+    if isinstance(value, list):
+        return set().union(*(_references(v) for v in value)) if value else set()
+    return set()
+
+
+def _lookup(results: Dict[str, dict], item_id: str, path: str) -> Any:
+    value: Any = results[item_id]
+    for part in path.split("."):
+        if isinstance(value, list) and part.isdigit() and int(part) < len(value):
+            value = value[int(part)]
+        elif isinstance(value, dict) and part in value:
+            value = value[part]
+        else:
+            raise _Unresolved(f"${{{item_id}.{path}}}")
+    return value
+
+
+def _resolve(value: Any, results: Dict[str, dict]) -> Any:
+    """Substitute references; a string that is exactly one reference takes the referenced value as is"""
+    if isinstance(value, str):
+        whole = _REFERENCE.fullmatch(value)
+        if whole:
+            return _lookup(results, whole.group(1), whole.group(2))
+        return _REFERENCE.sub(lambda m: str(_lookup(results, m.group(1), m.group(2))), value)
+    if isinstance(value, dict):
+        return {k: _resolve(v, results) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_resolve(v, results) for v in value]
+    return value
+
+
+def _query_string(path: str, query: Dict[str, Any]) -> tuple:
+    path, _, inline = path.partition("?")
+    params = [
+        (key, str(v).lower() if isinstance(v, bool) else str(v))
+        for key, value in query.items()
+        for v in (value if isinstance(value, list) else [value])
+        if v is not None
+    ]
+    encoded = "&".join(part for part in (inline, urlencode(params)) if part)
+    return path, encoded
+
+
+async def _call(app, parent_scope: dict, method: str, path: str, query: Dict[str, Any], body: Any, headers: Dict[str, str]) -> dict:
+    """One in-process ASGI request; returns status, headers and decoded body"""
+    path, query_string = _query_string(path, query)
+    payload = b"" if body is None else json.dumps(body, default=str).encode()
+    header_list = [(k.lower().encode(), str(v).encode()) for k, v in headers.items()]
+    if payload and "content-type" not in {k.lower() for k in headers}:
+        header_list.append((b"content-type", b"application/json"))
+    header_list.append((b"content-length", str(len(payload)).encode()))
+    
+    scope = {
+        "type": "http",
+        "asgi": parent_scope.get("asgi", {"version": "3.0"}),
+        "http_version": parent_scope.get("http_version", "1.1"),
+        "method": method.upper(),
+        "scheme": parent_scope.get("scheme", "http"),
+        "server": parent_scope.get("server"),
+        "client": parent_scope.get("client"),
+        "root_path": parent_scope.get("root_path", ""),
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": query_string.encode(),
+        "headers": header_list,
+    }
+    if "state" in parent_scope:
+        scope["state"] = parent_scope["state"]
+    
+    finished = asyncio.Event()
+    sent_body = False
+    status = 500
+    response_headers: Dict[str, str] = {}
+    chunks: List[bytes] = []
+    
+    async def receive():
+        nonlocal sent_body
+        if not sent_body:
+            sent_body = True
+            return {"type": "http.request", "body": payload, "more_body": False}
+        await finished.wait()
+        return {"type": "http.disconnect"}
+    
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+            response_headers.update((k.decode(), v.decode()) for k, v in message.get("headers", []))
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+    
+    try:
+        await app(scope, receive, send)
+    finally:
+        finished.set()
+    
+    raw = b"".join(chunks)
+    content_type = response_headers.get("content-type", "")
+    if raw and content_type.startswith("application/json"):
+        decoded: Any = json.loads(raw)
+    else:
+        decoded = raw.decode(errors="replace") if raw else None
+    response_headers.pop("content-length", None)
+    return {"status": status, "headers": response_headers, "body": decoded}
+
+
+def _validate(batch: BatchRequest) -> List[str]:
+    """Item ids (default: position); references must point at earlier items"""
+    if batch.mode not in ("parallel", "sequential"):
+        raise HTTPException(status_code=400, detail="mode must be 'parallel' or 'sequential'")
+    if len(batch.requests) > BATCH_MAX_REQUESTS:
+        raise HTTPException(status_code=400, detail=f"A batch can hold at most {BATCH_MAX_REQUESTS} requests")
+    
+    ids: List[str] = []
+    for position, item in enumerate(batch.requests):
+        item_id = item.id or str(position)
+        if item_id in ids:
+            raise HTTPException(status_code=400, detail=f"Duplicate request id '{item_id}'")
+        if not item.path.startswith("/") or _EXCLUDED_PATH.search(item.path.split("?")[0]):
+            raise HTTPException(status_code=400, detail=f"Request '{item_id}': {item.path} cannot be batched")
+        unknown = _references(item.model_dump()) - set(ids)
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Request '{item_id}' references unknown or later requests: {', '.join(sorted(unknown))}")
+        ids.append(item_id)
+    return ids
+
+
+async def execute_batch(app, parent_scope: dict, batch: BatchRequest) -> List[dict]:
+    """Run every item of a batch; results come back in request order"""
+    ids = _validate(batch)
+    results: Dict[str, dict] = {}
+    tasks: Dict[str, asyncio.Task] = {}
+    
+    async def run(position: int, item: BatchItem) -> dict:
+        item_id = ids[position]
+        referenced = _references(item.model_dump())
+        waits = set(referenced)
+        if batch.mode == "sequential" and position:
+            waits.add(ids[position - 1])
+        for dependency in waits:
+            await tasks[dependency]
+        
+        failed = sorted(d for d in referenced if results[d]["status"] >= 400)
+        if batch.mode == "sequential" and batch.stop_on_error and position and results[ids[position - 1]]["status"] >= 400:
+            failed.append(ids[position - 1])
+        if failed:
+            result = {"status": 424, "headers": {}, "body": {"detail": f"Not run: request '{failed[0]}' failed"}}
+        else:
+            try:
+                resolved = _resolve(
+                    {"path": item.path, "query": item.query or {}, "body": item.body, "headers": item.headers or {}},
+                    results
+                )
+                call = _call(app, parent_scope, item.method, resolved["path"], resolved["query"], resolved["body"], resolved["headers"])
+                if item.method.upper() in ("GET", "HEAD"):
+                    result = await asyncio.wait_for(call, timeout=BATCH_ITEM_TIMEOUT_SECONDS)
+                else:
+                    result = await call
+            except _Unresolved as e:
+                result = {"status": 424, "headers": {}, "body": {"detail": f"Unresolved reference {e}"}}
+            except asyncio.TimeoutError:
+                result = {"status": 504, "headers": {}, "body": {"detail": "Request timed out"}}
+            except Exception as e:
+                result = {"status": 500, "headers": {}, "body": {"detail": str(e) or type(e).__name__}}
+        
+        results[item_id] = result
+        return {"id": item_id, **result}
+    
+    for position, item in enumerate(batch.requests):
+        tasks[ids[position]] = asyncio.create_task(run(position, item))
+    return list(await asyncio.gather(*tasks.values()))
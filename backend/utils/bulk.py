@@ -0,0 +1,164 @@
+"""
+Bulk Imports
+Items are read from a JSON array body, or streamed line by line from an
+NDJSON body (Content-Type: application/x-ndjson) so imports of any size
+never sit in memory whole. Each item is validated with the entity's
+Pydantic model and valid documents are written with insert_many in
+batches. The response reports a result per item, by position in the body.
+
+Ordered imports stop at the first invalid or failed item, like an ordered
+insert_many; unordered imports write everything that can be written.
+"""
+
+import os
+import json
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple, Type
+
+from fastapi import HTTPException, Request
+from pydantic import BaseModel, ValidationError
+from pymongo.errors import BulkWriteError
+
+from utils.db import get_collection
+from utils.changes import record_change
+
+# Documents per insert_many round trip
+BULK_BATCH_SIZE = int(os.getenv("BULK_BATCH_SIZE", 500))
+
+NDJSON_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+
+
+async def _ndjson_items(request: Request) -> AsyncIterator[Tuple[Any, Optional[str]]]:
+    """(item, parse error) per non-empty line, decoded as the body streams in"""
+    buffer = b""
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield _parse_line(line)
+    if buffer.strip():
+        yield _parse_line(buffer)
+
+
+def _parse_line(line: bytes) -> Tuple[Any, Optional[str]]:
+    try:
+        return json.loads(line), None
+    except ValueError as e:
+        return None, f"Invalid JSON: {e}"
+
+
+async def read_items(request: Request) -> AsyncIterator[Tuple[Any, Optional[str]]]:
+    """Items of a bulk request body, NDJSON (streamed) or a JSON array / {"items": [...]}"""
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type in NDJSON_TYPES:
+        async for item in _ndjson_items(request):
+            yield item
+        return
+    
+    try:
+        body = json.loads(await request.body())
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Body must be a JSON array or NDJSON")
+    if isinstance(body, dict):
+        body = body.get("items")
+    if not isinstance(body, list):
+        raise HTTPException(status_code=400, detail="Body must be a JSON array or NDJSON")
+    for item in body:
+        yield item, None
+
+
+def _write_error(error: dict) -> dict:
+    if error.get("code") == 11000:
+        return {"status": "duplicate", "error": "A record with the same unique key already exists"}
+    return {"status": "failed", "error": error.get("errmsg", "Write failed")}
+
+
+async def bulk_insert(
+    request: Request,
+    collection_name: str,
+    model: Type[BaseModel],
+    ordered: bool = False,
+    prepare: Optional[Callable[[dict], None]] = None,
+    batch_size: int = BULK_BATCH_SIZE
+) -> dict:
+    """Validate and insert every item of a bulk request body; returns per-item results"""
+    collection = get_collection(collection_name)
+    results: List[dict] = []
+    pending: List[Tuple[int, dict]] = []
+    stopped = False
+    
+    async def flush():
+        nonlocal stopped
+        documents = [document for _, document in pending]
+        errors: Dict[int, dict] = {}
+        try:
+            await collection.insert_many(documents, ordered=ordered)
+        except BulkWriteError as e:
+            errors = {error["index"]: error for error in e.details["writeErrors"]}
+        
+        for position, (index, document) in enumerate(pending):
+            if position in errors:
+                results.append({"index": index, **_write_error(errors[position])})
+                stopped = stopped or ordered
+            elif ordered and errors and position > min(errors):
+                # An ordered insert_many does not attempt anything after its first error
+                results.append({"index": index, "status": "skipped"})
+            else:
+                record_change(collection_name, "insert", document["_id"], document)
+                results.append({"index": index, "status": "created", "_id": str(document["_id"])})
+        pending.clear()
+    
+    index = -1
+    async for index, (item, parse_error) in _enumerate(read_items(request)):
+        if stopped:
+            # Keep reading so every item gets a result
+            results.append({"index": index, "status": "skipped"})
+            continue
+        
+        if parse_error is None:
+            try:
+                document = model.model_validate(item).model_dump()
+            except ValidationError as e:
+                parse_error = "; ".join(
+                    f"{'.'.join(str(part) for part in error['loc']) or 'item'}: {error['msg']}"
+                    for error in e.errors()
+                )
+        if parse_error is not None:
+            if ordered and pending:
+                # Items before the invalid one are still written (and may fail first)
+                await flush()
+            if stopped:
+                results.append({"index": index, "status": "skipped"})
+            else:
+                results.append({"index": index, "status": "invalid", "error": parse_error})
+                stopped = ordered
+            continue
+        
+        if prepare:
+            prepare(document)
+        pending.append((index, document))
+        if len(pending) >= batch_size:
+            await flush()
+    
+    if pending:
+        await flush()
+    
+    results.sort(key=lambda result: result["index"])
+    counts: Dict[str, int] = {}
+    for result in results:
+        counts[result["status"]] = counts.get(result["status"], 0) + 1
+    
+    return {
+        "ordered": ordered,
+        "received": index + 1,
+        "created": counts.get("created", 0),
+        "counts": counts,
+        "results": results,
+    }
+
+
+async def _enumerate(items: AsyncIterator) -> AsyncIterator[Tuple[int, Any]]:
+    index = 0
+    async for item in items:
+        yield index, item
+        index += 1
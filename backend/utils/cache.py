@@ -0,0 +1,153 @@
+"""
+In-Process Response Cache
+Read routes are cached by route name and normalized query parameters.
+Each cached response remembers the version of the collections it was
+built from; write routes bump those versions in-process, and the change
+feed (utils/changes.py) bumps them for writes made by other workers.
+"""
+
+import os
+import json
+import time
+import logging
+import functools
+from collections import OrderedDict
+from typing import Any, Dict, Tuple
+
+from utils.db import MONGO_MAX_STALENESS_SECONDS, primary_reads, secondary_reads
+from utils.metrics import register_gauge
+
+logger = logging.getLogger(__name__)
+
+# Cache configuration
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", 1000))
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", 30))
+
+# Per-collection version counters, and when each was last bumped (monotonic)
+_versions: Dict[str, int] = {}
+_bumped_at: Dict[str, float] = {}
+
+
+def get_version(collection_name: str) -> int:
+    """Current in-process version of a collection"""
+    return _versions.get(collection_name, 0)
+
+
+def bump_version(*collection_names: str):
+    """Invalidate everything cached from these collections"""
+    now = time.monotonic()
+    for name in collection_names:
+        _versions[name] = _versions.get(name, 0) + 1
+        _bumped_at[name] = now
+
+
+def recently_written(*collection_names: str) -> bool:
+    """Whether a secondary may still lag behind a write to one of these collections"""
+    cutoff = time.monotonic() - MONGO_MAX_STALENESS_SECONDS
+    return any(_bumped_at.get(name, float("-inf")) > cutoff for name in collection_names)
+
+
+class ResponseCache:
+    """LRU + TTL cache whose entries are invalidated by collection versions"""
+    
+    def __init__(self, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES, ttl: float = RESPONSE_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[Tuple[int, ...], float, int, Any]]" = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, key: str, versions: Tuple[int, ...]):
+        entry = self._entries.get(key)
+        if entry is not None:
+            entry_versions, expires_at, _, value = entry
+            if entry_versions == versions and expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            self._evict(key)
+        
+        self.misses += 1
+        return None
+    
+    def set(self, key: str, versions: Tuple[int, ...], value: Any):
+        self._evict(key)
+        size = len(json.dumps(value, default=str))
+        self._entries[key] = (versions, time.monotonic() + self.ttl, size, value)
+        self.bytes += size
+        
+        while len(self._entries) > self.max_entries:
+            self._evict(next(iter(self._entries)))
+    
+    def _evict(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry[2]
+    
+    def clear(self):
+        self._entries.clear()
+        self.bytes = 0
+    
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+
+# Shared per-process cache
+response_cache = ResponseCache()
+
+register_gauge(
+    "nami_response_cache",
+    "Response cache entries, estimated bytes, hits, misses and hit ratio",
+    lambda: {f'stat="{k}"': v for k, v in response_cache.stats().items()}
+)
+
+
+def _cache_key(route: str, params: Dict[str, Any]) -> str:
+    """Route name plus query parameters, with empty values dropped and keys sorted"""
+    # Values are kept as sent: the filters they feed are case-sensitive
+    normalized = sorted((k, v) for k, v in params.items() if v is not None and v != "")
+    return f"{route}?{json.dumps(normalized, default=str)}"
+
+
+def cached(*collection_names: str):
+    """Cache a read route's result until one of `collection_names` changes"""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(**kwargs):
+            key = _cache_key(func.__name__, kwargs)
+            versions = tuple(get_version(name) for name in collection_names)
+            
+            tracked = secondary_reads.get()
+            entry = response_cache.get(key, versions)
+            if entry is None:
+                before = set(tracked.collections) if tracked is not None else set()
+                first_time = len(tracked.operation_times) if tracked is not None else 0
+                # A refill after a recent write reads from the primary, or a lagging
+                # secondary's result would be cached under the new version
+                token = primary_reads.set(recently_written(*collection_names))
+                try:
+                    value = await func(**kwargs)
+                finally:
+                    primary_reads.reset(token)
+                # Remember secondary reads so a hit is treated like the read it replays
+                lagging = (), ()
+                if tracked is not None:
+                    lagging = tuple(tracked.collections - before), tuple(tracked.operation_times[first_time:])
+                response_cache.set(key, versions, (value, lagging))
+            else:
+                value, lagging = entry
+                if tracked is not None:
+                    tracked.collections.update(lagging[0])
+                    tracked.operation_times.extend(lagging[1])
+            return value
+        return wrapper
+    return decorator
+
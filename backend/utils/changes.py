@@ -0,0 +1,314 @@
+"""
+Change Feed
+One shared MongoDB change stream per collection, fanned out in-process
+through a PubSubHub. Without change streams (standalone MongoDB) the
+write routes publish their own changes through record_change().
+
+Resume tokens are opaque to clients. They hold this process's hub
+sequence (fast replay from the buffer) and the last MongoDB resume
+token per collection (catch-up after a restart or on another worker).
+"""
+
+import os
+import json
+import base64
+import asyncio
+import logging
+import secrets
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+from pymongo.errors import PyMongoError
+
+from utils.cache import bump_version
+from utils.db import get_collection
+from utils.metrics import register_gauge
+from utils.pubsub import PubSubHub, ReplayGap
+
+logger = logging.getLogger(__name__)
+
+# Change feed configuration
+CHANGE_FEED_BUFFER_SIZE = int(os.getenv("CHANGE_FEED_BUFFER_SIZE", 1000))
+CHANGE_FEED_QUEUE_SIZE = int(os.getenv("CHANGE_FEED_QUEUE_SIZE", 1000))
+
+# Announced inserts remembered so their own change event is not published twice
+ANNOUNCED_IDS_SIZE = 1000
+
+# Collections exposed through /changes and watched for cache invalidation
+CHANGE_FEED_COLLECTIONS = [
+    "doctors",
+    "patients",
+    "appointments",
+    "medicines",
+    "tasks",
+    "notifications",
+    "robot_commands",
+    "emergency_alerts",
+    "chatbot_logs",
+    "staff",
+]
+
+# Server error codes meaning change streams are not supported here
+_UNSUPPORTED_CODES = (40573, 40324)
+
+_EPOCH = secrets.token_hex(4)
+
+
+def _encode_document(document: Optional[dict]) -> Optional[dict]:
+    if document is None:
+        return None
+    return jsonable_encoder(document, custom_encoder={ObjectId: str})
+
+
+def encode_token(seq: int, positions: Dict[str, Optional[str]]) -> str:
+    """Opaque resume token for a hub sequence and per-collection stream positions"""
+    payload = json.dumps({"e": _EPOCH, "s": seq, "m": positions}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_token(token: str) -> dict:
+    """Decode a resume token, raising ValueError if it is malformed"""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        state = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return {"e": str(state["e"]), "s": int(state["s"]), "m": dict(state.get("m") or {})}
+    except Exception:
+        raise ValueError("Invalid resume token")
+
+
+class ChangeFeed:
+    """Shared per-collection change streams with in-process fan-out"""
+    
+    def __init__(self):
+        self.hub = PubSubHub(CHANGE_FEED_BUFFER_SIZE, CHANGE_FEED_QUEUE_SIZE)
+        self.streams_available: Optional[bool] = None
+        self.positions: Dict[str, Optional[str]] = {}
+        self._listeners: Dict[str, List[Callable[[dict], None]]] = {}
+        self._announced: "OrderedDict[Tuple[str, Optional[str]], None]" = OrderedDict()
+        self._tasks: List[asyncio.Task] = []
+    
+    def start(self, collection_names: Iterable[str] = CHANGE_FEED_COLLECTIONS):
+        for name in collection_names:
+            self._tasks.append(asyncio.create_task(self._watch(name)))
+    
+    def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        self._tasks.clear()
+    
+    def add_listener(self, collection_name: str, callback: Callable[[dict], None]):
+        """Call `callback(event)` synchronously for every change published on a collection"""
+        self._listeners.setdefault(collection_name, []).append(callback)
+    
+    def _event(self, collection_name: str, change: dict) -> dict:
+        document_id = change.get("documentKey", {}).get("_id")
+        return {
+            "collection": collection_name,
+            "operation": change["operationType"],
+            "id": str(document_id) if document_id is not None else None,
+            "document": _encode_document(change.get("fullDocument")),
+            "stream_token": change["_id"]["_data"],
+        }
+    
+    def _local_event(self, collection_name: str, operation: str, document_id: Any, document: Optional[dict]) -> dict:
+        return {
+            "collection": collection_name,
+            "operation": operation,
+            "id": str(document_id) if document_id is not None else None,
+            "document": _encode_document(document),
+            "stream_token": None,
+        }
+    
+    def _publish(self, event: dict):
+        collection_name = event["collection"]
+        if event.get("stream_token"):
+            self.positions[collection_name] = event["stream_token"]
+        bump_version(collection_name)
+        
+        key = (collection_name, event["id"])
+        if event["operation"] == "insert" and key in self._announced:
+            # Subscribers already got this insert from announce()
+            del self._announced[key]
+            return
+        
+        self.hub.publish(collection_name, event)
+        for callback in self._listeners.get(collection_name, ()):
+            try:
+                callback(event)
+            except Exception:
+                logger.exception(f"Change listener for {collection_name} failed")
+    
+    async def _watch(self, collection_name: str):
+        """Follow one collection's change stream, reconnecting with its resume token"""
+        collection = get_collection(collection_name)
+        resume_token = None
+        delay = 1
+        
+        while True:
+            try:
+                async with collection.watch(full_document="updateLookup", resume_after=resume_token) as stream:
+                    self.streams_available = True
+                    delay = 1
+                    if stream.resume_token:
+                        self.positions[collection_name] = stream.resume_token["_data"]
+                    async for change in stream:
+                        if change["operationType"] == "invalidate":
+                            resume_token = None
+                            break
+                        resume_token = stream.resume_token
+                        self._publish(self._event(collection_name, change))
+            except asyncio.CancelledError:
+                raise
+            except PyMongoError as e:
+                # Changes may have been missed while the stream was down
+                bump_version(collection_name)
+                if getattr(e, "code", None) in _UNSUPPORTED_CODES:
+                    if self.streams_available is not False:
+                        logger.warning("Change streams unavailable (not a replica set), using in-process change feed")
+                    self.streams_available = False
+                    return
+                logger.warning(f"Change stream on {collection_name} failed, retrying in {delay}s: {e}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30)
+    
+    def record_local(self, collection_name: str, operation: str, document_id: Any = None, document: Optional[dict] = None):
+        """Record a write made by this process (published only when there is no change stream)"""
+        if self.streams_available is False:
+            self._publish(self._local_event(collection_name, operation, document_id, document))
+        else:
+            bump_version(collection_name)
+    
+    def announce(self, collection_name: str, document_id: Any, document: dict):
+        """Publish an insert ahead of the write itself; the write's own change event is then skipped"""
+        self._publish(self._local_event(collection_name, "insert", document_id, document))
+        self._announced[(collection_name, str(document_id))] = None
+        if len(self._announced) > ANNOUNCED_IDS_SIZE:
+            self._announced.popitem(last=False)
+    
+    async def _catch_up(self, collection_name: str, stream_token: str) -> List[dict]:
+        """Events after a MongoDB resume token, read from a dedicated short-lived stream"""
+        events = []
+        collection = get_collection(collection_name)
+        async with collection.watch(full_document="updateLookup", resume_after={"_data": stream_token}) as stream:
+            while True:
+                change = await stream.try_next()
+                if change is None or change["operationType"] == "invalidate":
+                    break
+                events.append(self._event(collection_name, change))
+        return events
+    
+    async def open(self, collection_names: List[str], token: Optional[str] = None) -> "FeedReader":
+        """Open a reader positioned at `token` (or now); raises ReplayGap or ValueError"""
+        state = decode_token(token) if token else None
+        
+        if state is None:
+            sub, _ = self.hub.subscribe(collection_names)
+            return FeedReader(sub, [], self.hub.seq, {name: self.positions.get(name) for name in collection_names})
+        
+        if state["e"] == _EPOCH:
+            try:
+                sub, missed = self.hub.subscribe(collection_names, state["s"])
+                return FeedReader(sub, [(seq, event) for seq, _, event in missed], state["s"], state["m"])
+            except ReplayGap:
+                pass
+        
+        stream_tokens = {name: state["m"].get(name) for name in collection_names}
+        if not self.streams_available or not all(stream_tokens.values()):
+            raise ReplayGap("resume token too old")
+        
+        # Subscribe first so live events queue up while we catch up
+        sub, _ = self.hub.subscribe(collection_names)
+        seq = self.hub.seq
+        try:
+            missed = []
+            for name, stream_token in stream_tokens.items():
+                missed.extend(await self._catch_up(name, stream_token))
+        except PyMongoError:
+            sub.close()
+            raise ReplayGap("resume token no longer in the oplog")
+        
+        missed.sort(key=lambda event: event["stream_token"])
+        skip_upto = dict(stream_tokens)
+        for event in missed:
+            skip_upto[event["collection"]] = event["stream_token"]
+        return FeedReader(sub, [(None, event) for event in missed], seq, dict(stream_tokens), skip_upto)
+
+
+class FeedReader:
+    """One client's position in the change feed"""
+    
+    def __init__(self, sub, pending: List[Tuple[Optional[int], dict]], seq: int, positions: Dict[str, Optional[str]], skip_upto: Optional[Dict[str, str]] = None):
+        self.sub = sub
+        self.pending = pending
+        self.seq = seq
+        self.positions = dict(positions)
+        self.skip_upto = skip_upto or {}
+    
+    @property
+    def overflowed(self) -> bool:
+        return self.sub.overflowed
+    
+    @property
+    def token(self) -> str:
+        return encode_token(self.seq, self.positions)
+    
+    def _accept(self, seq: Optional[int], event: dict) -> Optional[dict]:
+        """Advance the position past an event and return it with its resume token"""
+        collection_name = event["collection"]
+        stream_token = event.get("stream_token")
+        skip = self.skip_upto.get(collection_name)
+        
+        if seq is not None:
+            self.seq = max(self.seq, seq)
+        if skip and stream_token and stream_token <= skip:
+            return None
+        if stream_token:
+            self.positions[collection_name] = stream_token
+        
+        delivered = {k: v for k, v in event.items() if k != "stream_token"}
+        delivered["resume_token"] = self.token
+        return delivered
+    
+    async def next_batch(self, timeout: float, limit: int) -> List[dict]:
+        """Pending catch-up events, else wait up to `timeout` for live ones"""
+        batch = []
+        while self.pending and len(batch) < limit:
+            seq, event = self.pending.pop(0)
+            event = self._accept(seq, event)
+            if event:
+                batch.append(event)
+        if batch:
+            return batch
+        
+        first = await self.sub.get(timeout)
+        if first is None:
+            return []
+        for seq, _, event in [first] + self.sub.drain(limit - 1):
+            event = self._accept(seq, event)
+            if event:
+                batch.append(event)
+        return batch
+    
+    def close(self):
+        self.sub.close()
+
+
+# Shared per-process change feed
+change_feed = ChangeFeed()
+
+register_gauge(
+    "nami_change_feed",
+    "Change feed subscribers, dropped slow subscribers and published events",
+    lambda: {
+        'stat="subscribers"': change_feed.hub.subscriber_count(),
+        'stat="dropped_subscribers"': change_feed.hub.dropped_subscribers,
+        'stat="events"': change_feed.hub.seq,
+    }
+)
+
+
+def record_change(collection_name: str, operation: str, document_id: Any = None, document: Optional[dict] = None):
+    """Called by write routes after a successful write"""
+    change_feed.record_local(collection_name, operation, document_id, document)
@@ -0,0 +1,197 @@
+"""
+Robot Command Lifecycle
+Commands move through an enforced state machine:
+
+    pending / confirmed -> claimed -> executing -> completed | failed
+    any unfinished status -> cancelled
+
+Every transition is a single conditional update whose filter only matches
+a command in a status that may move to the new one, so two robots racing
+for the same command (or a robot and a nurse cancelling it) cannot both
+win. Each transition also appends to the command's `history` array, capped
+with `$slice` so the document stays small.
+
+A robot may go straight from pending to executing (claim-and-execute), so
+starting a command takes one call and finishing it takes another.
+
+A claim is a lease: a command left `claimed` for ROBOT_CLAIM_LEASE_SECONDS
+after its claimed_at (renewed by each sync of the holding robot) goes back
+to pending, so a robot that vanished does not keep its queue forever.
+"""
+
+import os
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Tuple
+
+from fastapi import HTTPException
+from pymongo import ReturnDocument
+
+from utils.db import get_collection
+from utils.dosing import settle_doses
+
+# Transitions kept per command (oldest dropped first)
+COMMAND_HISTORY_LIMIT = int(os.getenv("COMMAND_HISTORY_LIMIT", 20))
+
+# Claimed commands not started or renewed within this go back to the queue
+ROBOT_CLAIM_LEASE_SECONDS = int(os.getenv("ROBOT_CLAIM_LEASE_SECONDS", 900))
+
+# Status -> statuses it may move to
+COMMAND_TRANSITIONS: Dict[str, Tuple[str, ...]] = {
+    "pending": ("confirmed", "claimed", "executing", "cancelled"),
+    "confirmed": ("claimed", "executing", "cancelled"),
+    "claimed": ("executing", "pending", "failed", "cancelled"),
+    "executing": ("completed", "failed", "cancelled"),
+    "completed": (),
+    "failed": (),
+    "cancelled": (),
+}
+
+# Waiting for a robot
+QUEUED_STATUSES = ("pending", "confirmed")
+FINAL_STATUSES = ("completed", "failed", "cancelled")
+
+# Set by the lifecycle only, never by a PATCH
+LIFECYCLE_FIELDS = ("status", "history", "claimed_by", "claimed_at", "started_at", "completed_at")
+
+_TIMESTAMP_FIELDS = {
+    "claimed": "claimed_at",
+    "executing": "started_at",
+    "completed": "completed_at",
+    "failed": "completed_at",
+    "cancelled": "completed_at",
+}
+
+
+def sources(status: str) -> Tuple[str, ...]:
+    """Statuses a command may be in to move to `status`"""
+    if status not in COMMAND_TRANSITIONS:
+        raise HTTPException(status_code=400, detail=f"Unknown command status '{status}'")
+    return tuple(source for source, targets in COMMAND_TRANSITIONS.items() if status in targets)
+
+
+# Statuses in which a command belongs to the robot in claimed_by
+_HELD_STATUSES = ("claimed", "executing")
+
+
+def _filter(command_filter: dict, status: str, robot_id: Optional[str]) -> dict:
+    allowed = sources(status)
+    held = [source for source in allowed if source in _HELD_STATUSES]
+    if robot_id and held and status != "cancelled":
+        # Only the robot holding a claim may act on it
+        others = [source for source in allowed if source not in _HELD_STATUSES]
+        return {**command_filter, "$or": [
+            {"status": {"$in": others}},
+            {"status": {"$in": held}, "claimed_by": {"$in": [robot_id, None]}},
+        ]}
+    return {**command_filter, "status": {"$in": list(allowed)}}
+
+
+def transition_update(status: str, robot_id: Optional[str] = None, fields: Optional[Dict[str, Any]] = None, now: Optional[datetime] = None) -> dict:
+    """$set of the new status and its timestamp, plus a capped $push onto history"""
+    now = now or datetime.utcnow()
+    update_set = {**(fields or {}), "status": status, "updated_at": now}
+    if status in _TIMESTAMP_FIELDS:
+        update_set[_TIMESTAMP_FIELDS[status]] = now
+    if status in ("claimed", "executing") and robot_id:
+        update_set["claimed_by"] = robot_id
+    elif status == "pending":
+        update_set["claimed_by"] = None
+    
+    entry = {"status": status, "at": now}
+    if robot_id:
+        entry["by"] = robot_id
+    return {
+        "$set": update_set,
+        "$push": {"history": {"$each": [entry], "$slice": -COMMAND_HISTORY_LIMIT}},
+    }
+
+
+async def transition_command(
+    command_id: str,
+    status: str,
+    robot_id: Optional[str] = None,
+    fields: Optional[Dict[str, Any]] = None,
+    projection: Optional[dict] = None,
+    session=None,
+    at: Optional[datetime] = None
+) -> dict:
+    """Move one command to `status` if its current status allows it; returns the updated command"""
+    from bson import ObjectId
+    collection = get_collection("robot_commands")
+    
+    try:
+        command_oid = ObjectId(command_id)
+    except:
+        raise HTTPException(status_code=400, detail="Invalid command ID")
+    
+    command = await collection.find_one_and_update(
+        _filter({"_id": command_oid}, status, robot_id),
+        # `at` is when it happened on the robot, for reports synced after the fact
+        transition_update(status, robot_id, fields, now=at),
+        projection=projection,
+        return_document=ReturnDocument.AFTER,
+        session=session
+    )
+    if command is not None:
+        return command
+    
+    current = await collection.find_one({"_id": command_oid}, {"status": 1, "claimed_by": 1}, session=session)
+    if current is None:
+        raise HTTPException(status_code=404, detail="Command not found")
+    if current.get("status") in _HELD_STATUSES and robot_id and current.get("claimed_by") not in (robot_id, None):
+        raise HTTPException(status_code=409, detail=f"Command is claimed by {current['claimed_by']}")
+    raise HTTPException(status_code=409, detail=f"Command is {current.get('status')}; it cannot move to {status}")
+
+
+async def release_expired_claims(now: Optional[datetime] = None) -> int:
+    """Return commands whose claim lease ran out to pending; returns how many"""
+    now = now or datetime.utcnow()
+    result = await get_collection("robot_commands").update_many(
+        {"status": "claimed", "claimed_at": {"$lt": now - timedelta(seconds=ROBOT_CLAIM_LEASE_SECONDS)}},
+        transition_update("pending", now=now)
+    )
+    return result.modified_count
+
+
+async def next_scheduled_at(now: Optional[datetime] = None) -> Optional[datetime]:
+    """Earliest scheduled_for still in the future among queued commands (when the pending list next changes on its own)"""
+    now = now or datetime.utcnow()
+    command = await get_collection("robot_commands").find_one(
+        {"status": {"$in": list(QUEUED_STATUSES)}, "scheduled_for": {"$gt": now}},
+        {"scheduled_for": 1},
+        sort=[("scheduled_for", 1)]
+    )
+    return command["scheduled_for"] if command else None
+
+
+async def claim_next_command(robot_id: str, execute: bool = True, urgent: Optional[bool] = None) -> Optional[dict]:
+    """Atomically take the next due command (urgent first, then oldest) for a robot; `urgent` True/False takes only urgent/other commands"""
+    collection = get_collection("robot_commands")
+    status = "executing" if execute else "claimed"
+    now = datetime.utcnow()
+    
+    # Pre-planned deliveries stay hidden until their scheduled time
+    queued = {
+        "status": {"$in": list(QUEUED_STATUSES)},
+        "$or": [{"scheduled_for": None}, {"scheduled_for": {"$lte": now}}],
+    }
+    priorities = ({"priority": "urgent"}, {"priority": {"$ne": "urgent"}})
+    if urgent is not None:
+        priorities = priorities[:1] if urgent else priorities[1:]
+    for priority in priorities:
+        command = await collection.find_one_and_update(
+            {**queued, **priority},
+            transition_update(status, robot_id, now=now),
+            sort=[("timestamp", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+        if command is not None:
+            return command
+    return None
+
+
+async def cancel_command(command_id: str, robot_id: Optional[str] = None, fields: Optional[Dict[str, Any]] = None) -> dict:
+    """Cancel an unfinished command; its planned doses go back to the scheduler"""
+    command = await transition_command(command_id, "cancelled", robot_id, fields, projection={"status": 1, "details": 1, "completed_at": 1})
+    await settle_doses((command.get("details") or {}).get("dose_ids"), False, command["completed_at"])
+    return command
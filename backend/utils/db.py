@@ -1,11 +1,19 @@
-# db.py - placeholder
 """
 MongoDB Database Connection and Utilities
 """
 
 import os
+import asyncio
+from datetime import datetime, timedelta
 from motor.motor_asyncio import AsyncIOMotorClient
-from typing import Optional
+from pymongo import ASCENDING, DESCENDING, IndexModel, ReturnDocument, monitoring
+from pymongo.errors import DuplicateKeyError, OperationFailure
+from pymongo.read_concern import ReadConcern
+from pymongo.read_preferences import Primary, SecondaryPreferred
+from pymongo.write_concern import WriteConcern
+from typing import Optional, Dict, List, Any, Awaitable, Callable
+from contextvars import ContextVar
+import importlib.util
 import logging
 
 logger = logging.getLogger(__name__)
@@ -14,9 +22,198 @@ logger = logging.getLogger(__name__)
 MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017")
 MONGO_DB_NAME = os.getenv("MONGO_DB_NAME", "nami_hospital")
 
+# Connection pool and timeout configuration
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", 100))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", 0))
+MONGO_MAX_IDLE_TIME_MS = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", 60000))
+MONGO_COMPRESSORS = os.getenv("MONGO_COMPRESSORS", "zstd,snappy")
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", 5000))
+MONGO_CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", 5000))
+MONGO_SOCKET_TIMEOUT_MS = int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", 0)) or None
+
+# Robot telemetry samples are kept this long
+ROBOT_TELEMETRY_TTL_DAYS = int(os.getenv("ROBOT_TELEMETRY_TTL_DAYS", 30))
+
+# Staleness bound for reads routed to secondaries (MongoDB minimum is 90s)
+MONGO_MAX_STALENESS_SECONDS = max(int(os.getenv("MONGO_MAX_STALENESS_SECONDS", 90)), 90)
+
+# A one-off backfill whose worker died is taken over after this long
+BACKFILL_LEASE_SECONDS = int(os.getenv("BACKFILL_LEASE_SECONDS", 3600))
+
+# Python packages pymongo needs for each wire compressor
+_COMPRESSOR_MODULES = {
+    "zstd": "zstandard",
+    "snappy": "snappy",
+    "zlib": "zlib",
+}
+
+# Read/write concern profiles, from cheapest to most durable
+DURABILITY_PROFILES: Dict[str, Dict[str, Any]] = {
+    "fast": {
+        "write_concern": WriteConcern(w=1, j=False),
+        "read_concern": ReadConcern("local"),
+    },
+    "standard": {
+        "write_concern": WriteConcern(w=1, j=True),
+        "read_concern": ReadConcern("local"),
+    },
+    "critical": {
+        "write_concern": WriteConcern(w="majority", j=True),
+        "read_concern": ReadConcern("majority"),
+    },
+}
+
+# Durability profile per collection (collections not listed use "standard")
+COLLECTION_PROFILES: Dict[str, str] = {
+    "chatbot_logs": "fast",
+    "robot_telemetry": "fast",
+    "notifications": "standard",
+    "robot_commands": "standard",
+    "emergency_alerts": "critical",
+    "medicines": "critical",
+    "appointments": "critical",
+}
+
+# Read preferences routes can choose from. List and report endpoints use
+# "secondaryPreferred"; claim and conflict-check paths stay on "primary".
+READ_PREFERENCES = {
+    "primary": Primary(),
+    "secondaryPreferred": SecondaryPreferred(max_staleness=MONGO_MAX_STALENESS_SECONDS),
+}
+
+# Set while a read must see the latest writes (e.g. a cache refill right after a write)
+primary_reads: ContextVar[bool] = ContextVar("primary_reads", default=False)
+
+
+class ReadTracker:
+    """Collections a tracked request read with a secondary read preference, and the operationTime of each reply"""
+    
+    def __init__(self):
+        self.collections: set = set()
+        self.operation_times: List[Any] = []
+
+
+# Set for tracked requests (ETag-tagged GETs must not pin a lagging read to a version alone)
+secondary_reads: ContextVar[Optional[ReadTracker]] = ContextVar("secondary_reads", default=None)
+
+
+class _OperationTimeListener(monitoring.CommandListener):
+    """Records the operationTime each replica set reply reports into the request's ReadTracker"""
+    
+    # Motor runs commands with a copy of the caller's context, so the tracker is visible here
+    def succeeded(self, event):
+        tracked = secondary_reads.get()
+        if tracked is not None:
+            operation_time = event.reply.get("operationTime")
+            if operation_time is not None:
+                tracked.operation_times.append(operation_time)
+    
+    def started(self, event):
+        pass
+    
+    def failed(self, event):
+        pass
+
 # Global database client
 _client: Optional[AsyncIOMotorClient] = None
 _db = None
+_collections: Dict[str, Any] = {}
+_transactions_supported: Optional[bool] = None
+
+# Index specifications per collection, created in one batch per collection
+INDEX_SPECS: Dict[str, List[IndexModel]] = {
+    "doctors": [
+        IndexModel([("name", ASCENDING)]),
+        IndexModel([("specialization", ASCENDING)]),
+    ],
+    "patients": [
+        IndexModel([("name", ASCENDING)]),
+        IndexModel([("room_number", ASCENDING)]),
+    ],
+    "appointments": [
+        IndexModel([("date", ASCENDING), ("time", ASCENDING)]),
+        # Range queries on start time, alone or per doctor
+        IndexModel([("start_at", ASCENDING)]),
+        IndexModel([("doctor_name", ASCENDING), ("start_at", ASCENDING)]),
+        # Slot reservation: one active appointment per doctor, date and time
+        IndexModel(
+            [("doctor_name", ASCENDING), ("date", ASCENDING), ("time", ASCENDING)],
+            name="unique_active_slot",
+            unique=True,
+            partialFilterExpression={"slot_reserved": True},
+        ),
+    ],
+    "medicines": [
+        IndexModel([("patient_name", ASCENDING)]),
+        IndexModel([("status", ASCENDING)]),
+    ],
+    "robot_commands": [
+        IndexModel([("status", ASCENDING), ("timestamp", DESCENDING)]),
+    ],
+    "tasks": [
+        IndexModel([("status", ASCENDING)]),
+    ],
+    "chatbot_logs": [
+        IndexModel([("timestamp", ASCENDING)]),
+    ],
+    "emergency_alerts": [
+        IndexModel([("status", ASCENDING), ("triggered_at", DESCENDING)]),
+    ],
+    "notifications": [
+        # Exact-match delivery and listing by recipient (person or department),
+        # by member of a department, and bulk read-marking per member
+        IndexModel([("recipient_key", ASCENDING), ("status", ASCENDING), ("timestamp", DESCENDING)]),
+        IndexModel([("members", ASCENDING), ("timestamp", DESCENDING)]),
+        IndexModel([("unread_members", ASCENDING), ("timestamp", DESCENDING)]),
+    ],
+    "staff": [
+        IndexModel([("name_key", ASCENDING)], unique=True),
+        IndexModel([("department_keys", ASCENDING)]),
+    ],
+    "medicine_doses": [
+        # Upcoming-doses table: planning scans by status and due time
+        IndexModel([("status", ASCENDING), ("due_at", ASCENDING)]),
+        IndexModel([("medicine_id", ASCENDING), ("due_at", ASCENDING)]),
+        IndexModel([("robot_command_id", ASCENDING)]),
+    ],
+    "chatbot_log_rollups": [
+        IndexModel([("granularity", ASCENDING), ("bucket", ASCENDING)]),
+    ],
+    "robot_telemetry": [
+        IndexModel([("robot_id", ASCENDING), ("at", DESCENDING)]),
+        IndexModel([("at", ASCENDING)], expireAfterSeconds=ROBOT_TELEMETRY_TTL_DAYS * 86400),
+    ],
+}
+
+
+def _available_compressors() -> List[str]:
+    """Configured wire compressors whose Python support package is installed"""
+    available = []
+    for name in [c.strip() for c in MONGO_COMPRESSORS.split(",") if c.strip()]:
+        module = _COMPRESSOR_MODULES.get(name)
+        if module and importlib.util.find_spec(module) is not None:
+            available.append(name)
+        else:
+            logger.warning(f"MongoDB compressor '{name}' unavailable, skipping")
+    return available
+
+
+def get_client_options() -> Dict[str, Any]:
+    """Keyword arguments for AsyncIOMotorClient built from the environment"""
+    options = {
+        "maxPoolSize": MONGO_MAX_POOL_SIZE,
+        "minPoolSize": MONGO_MIN_POOL_SIZE,
+        "maxIdleTimeMS": MONGO_MAX_IDLE_TIME_MS,
+        "serverSelectionTimeoutMS": MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        "connectTimeoutMS": MONGO_CONNECT_TIMEOUT_MS,
+        "socketTimeoutMS": MONGO_SOCKET_TIMEOUT_MS,
+    }
+    
+    compressors = _available_compressors()
+    if compressors:
+        options["compressors"] = ",".join(compressors)
+    
+    return options
 
 
 def get_database():
@@ -24,42 +221,314 @@ def get_database():
     global _client, _db
     
     if _db is None:
-        _client = AsyncIOMotorClient(MONGO_URI)
+        _client = AsyncIOMotorClient(MONGO_URI, event_listeners=[_OperationTimeListener()], **get_client_options())
         _db = _client[MONGO_DB_NAME]
         logger.info(f"Connected to MongoDB: {MONGO_DB_NAME}")
     
     return _db
 
 
-def get_collection(collection_name: str):
-    """Get a specific collection"""
-    db = get_database()
-    return db[collection_name]
+def get_collection(collection_name: str, profile: Optional[str] = None, read_preference: str = "primary"):
+    """Get a specific collection with its durability profile and read preference applied"""
+    profile = profile or COLLECTION_PROFILES.get(collection_name, "standard")
+    if primary_reads.get():
+        read_preference = "primary"
+    if read_preference != "primary":
+        tracked = secondary_reads.get()
+        if tracked is not None:
+            tracked.collections.add(collection_name)
+    key = f"{collection_name}:{profile}:{read_preference}"
+    
+    if key not in _collections:
+        db = get_database()
+        _collections[key] = db.get_collection(
+            collection_name,
+            read_preference=READ_PREFERENCES[read_preference],
+            **DURABILITY_PROFILES[profile]
+        )
+    
+    return _collections[key]
+
+
+def reads_may_lag() -> bool:
+    """Whether non-primary reads can be served by a secondary (anything but a single server)"""
+    return _client is None or _client.topology_description.topology_type_name != "Single"
+
+
+async def transactions_supported() -> bool:
+    """Multi-document transactions need a replica set member or mongos (checked once)"""
+    global _transactions_supported
+    
+    if _transactions_supported is None:
+        hello = await get_database().command("hello")
+        _transactions_supported = "setName" in hello or hello.get("msg") == "isdbgrid"
+        if not _transactions_supported:
+            logger.warning("MongoDB is standalone: multi-document writes run without a transaction")
+    
+    return _transactions_supported
+
+
+async def run_transaction(callback: Callable[[Any], Awaitable[Any]]) -> Any:
+    """Run `callback(session)` in a majority transaction, retrying transient errors (session=None on a standalone server)"""
+    if not await transactions_supported():
+        return await callback(None)
+    
+    async with await _client.start_session() as session:
+        return await session.with_transaction(
+            callback,
+            read_concern=ReadConcern("majority"),
+            write_concern=WriteConcern(w="majority", j=True),
+            read_preference=Primary(),
+        )
+
+
+def _index_matches(existing: dict, model: IndexModel) -> bool:
+    """Check whether an existing index has the same name and options as a spec"""
+    spec = model.document
+    current = existing.get(spec["name"])
+    if current is None:
+        return False
+    
+    if list(current["key"]) != list(spec["key"].items()):
+        return False
+    
+    for option, value in spec.items():
+        if option in ("key", "name"):
+            continue
+        if current.get(option) != value:
+            return False
+    
+    return True
+
+
+async def _ensure_collection_indexes(db, collection_name: str, models: List[IndexModel]) -> int:
+    """Create the indexes of one collection that are missing, in a single command"""
+    collection = db[collection_name]
+    existing = await collection.index_information()
+    
+    missing = [model for model in models if not _index_matches(existing, model)]
+    if not missing:
+        return 0
+    
+    try:
+        await collection.create_indexes(missing)
+    except OperationFailure as e:
+        # Unique indexes are constraints (e.g. unique_active_slot prevents
+        # double-booking); without them writes would go unchecked
+        constraints = [model.document["name"] for model in missing if model.document.get("unique")]
+        if constraints:
+            raise RuntimeError(f"Failed to create constraint indexes {constraints} on {collection_name}: {e}") from e
+        logger.error(f"Failed to create indexes on {collection_name}: {e}")
+        return 0
+    return len(missing)
+
+
+async def _backfill_appointment_slots(db):
+    """Mark pre-existing appointments as reserving their slot unless cancelled, releasing double bookings"""
+    result = await db.appointments.update_many(
+        {"slot_reserved": {"$exists": False}},
+        [{"$set": {"slot_reserved": {"$ne": ["$status", "cancelled"]}}}]
+    )
+    if result.modified_count:
+        logger.info(f"Backfilled slot reservations on {result.modified_count} appointments")
+    
+    # Existing double bookings would make the unique_active_slot build fail:
+    # the oldest booking keeps each slot, later ones stop reserving it
+    duplicates = await db.appointments.aggregate([
+        {"$match": {"slot_reserved": True}},
+        {"$sort": {"_id": 1}},
+        {"$group": {
+            "_id": {"doctor_name": "$doctor_name", "date": "$date", "time": "$time"},
+            "ids": {"$push": "$_id"},
+        }},
+        {"$match": {"ids.1": {"$exists": True}}},
+    ]).to_list(length=None)
+    for slot in duplicates:
+        extra = slot["ids"][1:]
+        await db.appointments.update_many({"_id": {"$in": extra}}, {"$set": {"slot_reserved": False, "slot_conflict": True}})
+        logger.warning(
+            f"Double booking for {slot['_id']['doctor_name']} on {slot['_id']['date']} at {slot['_id']['time']}: "
+            f"kept {slot['ids'][0]}, released {', '.join(str(i) for i in extra)} (marked slot_conflict; reschedule or cancel them)"
+        )
+
+
+async def _claim_backfill(db, name: str) -> Optional[datetime]:
+    """Take a one-off backfill's lock document; returns its cut-off time, or None if it is done or another worker holds it"""
+    now = datetime.utcnow()
+    try:
+        # A lock left unfinished past the lease is taken over with its original cut-off
+        lock = await db.backfills.find_one_and_update(
+            {"_id": name, "finished_at": None, "started_at": {"$lt": now - timedelta(seconds=BACKFILL_LEASE_SECONDS)}},
+            {"$set": {"started_at": now}, "$setOnInsert": {"cut": now}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+    except DuplicateKeyError:
+        return None
+    return lock["cut"]
+
+
+async def _finish_backfill(db, name: str):
+    await db.backfills.update_one({"_id": name}, {"$set": {"finished_at": datetime.utcnow()}})
+
+
+async def _skip_backfill(db, name: str):
+    """Record a backfill as done without running it (its data was built by an earlier version)"""
+    now = datetime.utcnow()
+    try:
+        await db.backfills.insert_one({"_id": name, "cut": now, "started_at": now, "finished_at": now})
+    except DuplicateKeyError:
+        pass
+
+
+async def _wait_for_backfill(db, name: str):
+    """Wait for another worker's backfill to finish, up to BACKFILL_LEASE_SECONDS"""
+    deadline = datetime.utcnow() + timedelta(seconds=BACKFILL_LEASE_SECONDS)
+    while datetime.utcnow() < deadline:
+        lock = await db.backfills.find_one({"_id": name}, {"finished_at": 1})
+        if lock is None or lock.get("finished_at") is not None:
+            return
+        await asyncio.sleep(1)
+    logger.warning(f"Backfill {name} is still running in another worker; starting without it")
+
+
+async def _backfill_notification_counters(db):
+    """Add recipient keys and member read state to older notifications, and build unread counters if there are none"""
+    result = await db.notifications.update_many(
+        {"recipient_key": {"$exists": False}},
+        [{"$set": {"recipient_key": {"$toLower": {"$trim": {"input": "$recipient"}}}}}]
+    )
+    if result.modified_count:
+        logger.info(f"Backfilled recipient keys on {result.modified_count} notifications")
+    
+    result = await db.notifications.update_many(
+        {"members": {"$exists": False}},
+        [{"$set": {
+            "members": ["$recipient_key"],
+            "unread_members": {"$cond": [{"$eq": ["$status", "sent"]}, ["$recipient_key"], []]},
+            "read_by": [],
+        }}]
+    )
+    if result.modified_count:
+        logger.info(f"Backfilled member read state on {result.modified_count} notifications")
+    
+    if await db.backfills.find_one({"_id": "notification_counters"}) is None and await db.notification_counters.find_one({}) is not None:
+        await _skip_backfill(db, "notification_counters")
+        return
+    
+    # Mark-reads of older notifications would race the count, so other
+    # workers wait for it instead of serving; the counts are added to what
+    # newer notifications already put in, and each counter remembers the
+    # run so a taken-over run does not add twice
+    cut = await _claim_backfill(db, "notification_counters")
+    if cut is None:
+        await _wait_for_backfill(db, "notification_counters")
+        return
+    
+    merged = {"$eq": ["$backfilled_at", cut]}
+    await db.notifications.aggregate([
+        {"$match": {"unread_members.0": {"$exists": True}, "timestamp": {"$lt": cut}}},
+        {"$unwind": "$unread_members"},
+        {"$group": {"_id": "$unread_members", "unread": {"$sum": 1}}},
+        {"$set": {"backfilled_at": cut}},
+        {"$merge": {
+            "into": "notification_counters",
+            "whenMatched": [{"$set": {
+                "unread": {"$cond": [merged, "$unread", {"$add": ["$unread", "$$new.unread"]}]},
+                "backfilled_at": cut,
+            }}],
+        }},
+    ]).to_list(length=None)
+    await _finish_backfill(db, "notification_counters")
+
+
+async def _backfill_log_rollups(db):
+    """Build chatbot log rollups from the raw logs, once, in whichever worker takes the lock"""
+    from utils.rollups import ROLLUP_COLLECTION, ROLLUP_GRANULARITIES
+    
+    if await db.backfills.find_one({"_id": ROLLUP_COLLECTION}) is None and await db[ROLLUP_COLLECTION].find_one({}) is not None:
+        await _skip_backfill(db, ROLLUP_COLLECTION)
+        return
+    
+    cut = await _claim_backfill(db, ROLLUP_COLLECTION)
+    if cut is None:
+        return
+    
+    # Live $inc upserts count logs from the cut-off on; older ones are added
+    # to them here, once per rollup even if a taken-over run repeats
+    merged = {"$eq": ["$backfilled_at", cut]}
+    size = {"$strLenCP": {"$ifNull": ["$response", ""]}}
+    for granularity, fmt in ROLLUP_GRANULARITIES.items():
+        await db.chatbot_logs.aggregate([
+            {"$match": {"timestamp": {"$lt": cut}}},
+            {"$group": {
+                "_id": {
+                    "bucket": {"$dateTrunc": {"date": "$timestamp", "unit": granularity}},
+                    "intent": {"$ifNull": ["$intent", ""]},
+                    "action": {"$ifNull": ["$action", ""]},
+                },
+                "count": {"$sum": 1},
+                "response_chars": {"$sum": size},
+                "response_chars_min": {"$min": size},
+                "response_chars_max": {"$max": size},
+            }},
+            {"$project": {
+                "_id": {"$concat": [
+                    f"{granularity}|", {"$dateToString": {"date": "$_id.bucket", "format": fmt}},
+                    "|", "$_id.intent", "|", "$_id.action",
+                ]},
+                "granularity": {"$literal": granularity},
+                "bucket": "$_id.bucket",
+                "intent": "$_id.intent",
+                "action": "$_id.action",
+                "count": 1,
+                "response_chars": 1,
+                "response_chars_min": 1,
+                "response_chars_max": 1,
+                "backfilled_at": {"$literal": cut},
+            }},
+            {"$merge": {
+                "into": ROLLUP_COLLECTION,
+                "whenMatched": [{"$set": {
+                    "count": {"$cond": [merged, "$count", {"$add": ["$count", "$$new.count"]}]},
+                    "response_chars": {"$cond": [merged, "$response_chars", {"$add": ["$response_chars", "$$new.response_chars"]}]},
+                    "response_chars_min": {"$min": ["$response_chars_min", "$$new.response_chars_min"]},
+                    "response_chars_max": {"$max": ["$response_chars_max", "$$new.response_chars_max"]},
+                    "backfilled_at": cut,
+                }}],
+            }},
+        ]).to_list(length=None)
+    await _finish_backfill(db, ROLLUP_COLLECTION)
 
 
 async def init_database():
     """Initialize database with indexes and constraints"""
     db = get_database()
     
-    # Create indexes for better performance
-    await db.doctors.create_index("name")
-    await db.doctors.create_index("specialization")
-    await db.patients.create_index("name")
-    await db.patients.create_index("room_number")
-    await db.appointments.create_index([("date", 1), ("time", 1)])
-    await db.medicines.create_index("patient_name")
-    await db.medicines.create_index("status")
-    await db.robot_commands.create_index([("status", 1), ("timestamp", -1)])
-    await db.tasks.create_index("status")
-    await db.chatbot_logs.create_index("timestamp")
-    await db.emergency_alerts.create_index([("status", 1), ("triggered_at", -1)])
+    # The unique slot index only covers documents carrying the reservation flag
+    await _backfill_appointment_slots(db)
+    await _backfill_notification_counters(db)
+    await _backfill_log_rollups(db)
+    
+    # Collections are independent, so their index builds can run concurrently
+    created = await asyncio.gather(*[
+        _ensure_collection_indexes(db, name, models)
+        for name, models in INDEX_SPECS.items()
+    ])
     
-    logger.info("Database indexes created successfully")
+    if sum(created):
+        logger.info(f"Database indexes created successfully ({sum(created)} new)")
+    else:
+        logger.info("Database indexes already up to date")
 
 
 async def close_database():
     """Close database connection"""
-    global _client
+    global _client, _db, _transactions_supported
     if _client:
         _client.close()
-        logger.info("Database connection closed")
\ No newline at end of file
+        _client = None
+        _db = None
+        _transactions_supported = None
+        _collections.clear()
+        logger.info("Database connection closed")
@@ -0,0 +1,65 @@
+"""
+Staff Directory
+Department membership is precomputed in memory (department key -> member
+keys) so a group notification can be expanded to its recipients without a
+query. The map is loaded at startup and reloaded on any staff change seen
+by the change feed.
+"""
+
+import asyncio
+import logging
+from typing import Dict, List, Optional
+
+from utils.changes import change_feed
+from utils.db import get_collection
+from utils.notifications import recipient_key
+
+logger = logging.getLogger(__name__)
+
+
+def staff_keys(member: dict) -> dict:
+    """Normalized name and department keys stored on a staff document"""
+    return {
+        "name_key": recipient_key(member["name"]),
+        "department_keys": sorted({recipient_key(d) for d in member.get("departments") or []}),
+    }
+
+
+class StaffDirectory:
+    """In-memory department -> members expansion"""
+    
+    def __init__(self):
+        self.departments: Dict[str, List[str]] = {}
+        self._reload: Optional[asyncio.Task] = None
+        self._stale = False
+    
+    async def load(self):
+        """Rebuild the department map from the staff collection"""
+        collection = get_collection("staff")
+        while True:
+            self._stale = False
+            departments: Dict[str, List[str]] = {}
+            async for member in collection.find({}, {"name_key": 1, "department_keys": 1}):
+                for department in member.get("department_keys") or []:
+                    departments.setdefault(department, []).append(member["name_key"])
+            self.departments = departments
+            # A change that arrived mid-load needs another pass
+            if not self._stale:
+                break
+        logger.info(f"Staff directory loaded ({len(self.departments)} departments)")
+    
+    def on_change(self, event: dict):
+        if self._reload is None or self._reload.done():
+            self._reload = asyncio.create_task(self.load())
+        else:
+            self._stale = True
+    
+    def expand(self, key: str) -> List[str]:
+        """Member keys for a department key, or the key itself for a person"""
+        members = self.departments.get(key)
+        return list(members) if members else [key]
+
+
+# Shared per-process directory
+staff_directory = StaffDirectory()
+change_feed.add_listener("staff", staff_directory.on_change)
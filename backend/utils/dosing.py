@@ -0,0 +1,445 @@
+"""
+Dose Schedule Engine
+Free-text medicine frequencies ("twice daily", "every 6 hours", "q8h",
+"at bedtime") are parsed into dose rules. Every active prescription has
+one entry in an in-memory min-heap keyed by its next dose time, so a tick
+only pops the doses that have come due; nothing is rescanned.
+
+Popped doses are written to the `medicine_doses` collection up to
+DOSE_SCHEDULE_AHEAD_HOURS ahead (the upcoming-doses table). Doses due
+within DOSE_LEAD_MINUTES are batched per room into one pre-planned robot
+delivery. The command becomes available to robots DOSE_TRAVEL_MINUTES
+before its first dose. Dose ids are deterministic and planning claims
+doses and creates their command in one transaction, so several workers
+can tick at once without duplicates or doses left planned for no command.
+"""
+
+import os
+import re
+import heapq
+import asyncio
+import itertools
+import logging
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+
+from bson import ObjectId
+from pymongo import UpdateOne
+
+from models.robot_command import RobotCommand
+from utils.changes import change_feed, record_change
+from utils.db import get_collection, run_transaction
+from utils.metrics import register_gauge
+
+logger = logging.getLogger(__name__)
+
+# Dose scheduling configuration
+DOSE_SCHEDULE_AHEAD_HOURS = int(os.getenv("DOSE_SCHEDULE_AHEAD_HOURS", 24))
+DOSE_LEAD_MINUTES = int(os.getenv("DOSE_LEAD_MINUTES", 30))
+DOSE_TRAVEL_MINUTES = int(os.getenv("DOSE_TRAVEL_MINUTES", 10))
+DOSE_BATCH_WINDOW_MINUTES = int(os.getenv("DOSE_BATCH_WINDOW_MINUTES", 15))
+DOSE_TICK_SECONDS = int(os.getenv("DOSE_TICK_SECONDS", 60))
+# Planned doses whose command is still missing after this long are re-planned
+DOSE_ORPHAN_MINUTES = int(os.getenv("DOSE_ORPHAN_MINUTES", 5))
+# Clock times in frequencies ("at bedtime" = 21:00) are local to the ward
+DOSE_UTC_OFFSET_MINUTES = int(os.getenv("DOSE_UTC_OFFSET_MINUTES", 0))
+
+DOSES_COLLECTION = "medicine_doses"
+
+_MIN_INTERVAL = timedelta(minutes=15)
+
+_PROJECTION = {
+    "patient_name": 1, "medicine_name": 1, "dosage": 1, "frequency": 1,
+    "room_number": 1, "status": 1, "assigned_at": 1, "ends_at": 1,
+}
+
+
+# ==================== FREQUENCY PARSING ====================
+
+class DoseRule(NamedTuple):
+    """Either fixed local clock times every day, or a fixed interval from the assignment time"""
+    times: Tuple[Tuple[int, int], ...] = ()
+    interval: Optional[timedelta] = None
+
+
+_COUNTS = {"once": 1, "one": 1, "twice": 2, "two": 2, "thrice": 3, "three": 3, "four": 4, "five": 5, "six": 6}
+_ABBREVIATIONS = {"od": 1, "qd": 1, "daily": 1, "bd": 2, "bid": 2, "tds": 3, "tid": 3, "qds": 4, "qid": 4}
+_DAILY_TIMES = {
+    1: ((9, 0),),
+    2: ((9, 0), (21, 0)),
+    3: ((8, 0), (14, 0), (20, 0)),
+    4: ((8, 0), (12, 0), (16, 0), (20, 0)),
+}
+_NAMED_TIMES = {"morning": (8, 0), "noon": (12, 0), "evening": (18, 0), "night": (21, 0), "nightly": (21, 0), "bedtime": (21, 0), "hs": (21, 0)}
+
+_AS_NEEDED = re.compile(r"\b(as needed|prn|sos|when required|if needed|stat)\b")
+_EVERY_HOURS = re.compile(r"\b(?:every|q)\s*(\d+(?:\.\d+)?)\s*(?:h|hr|hrs|hour|hours)\b")
+_EVERY_DAYS = re.compile(r"\bevery\s*(\d+)\s*days?\b")
+_PER_DAY = re.compile(r"\b(\d+|" + "|".join(_COUNTS) + r")\s*(?:x|times?)?\s*(?:a|per|/)?\s*(?:day|daily)\b")
+_CLOCK = re.compile(r"\b(\d{1,2}):(\d{2})\b")
+
+
+def parse_frequency(text: str) -> Optional[DoseRule]:
+    """Dose rule for a frequency, or None when it is as-needed or not understood"""
+    text = (text or "").strip().lower()
+    if not text or _AS_NEEDED.search(text):
+        return None
+    
+    match = _EVERY_HOURS.search(text)
+    if match:
+        return DoseRule(interval=max(timedelta(hours=float(match.group(1))), _MIN_INTERVAL))
+    if re.search(r"\b(every other day|alternate days?)\b", text):
+        return DoseRule(interval=timedelta(days=2))
+    match = _EVERY_DAYS.search(text)
+    if match:
+        return DoseRule(interval=timedelta(days=max(int(match.group(1)), 1)))
+    if re.search(r"\b(weekly|once a week)\b", text):
+        return DoseRule(interval=timedelta(days=7))
+    
+    clock = sorted({(int(h), int(m)) for h, m in _CLOCK.findall(text) if int(h) < 24 and int(m) < 60})
+    if clock:
+        return DoseRule(times=tuple(clock))
+    
+    match = _PER_DAY.search(text)
+    count = None
+    if match:
+        word = match.group(1)
+        count = int(word) if word.isdigit() else _COUNTS[word]
+    else:
+        count = next((n for word, n in _ABBREVIATIONS.items() if re.search(rf"\b{word}\b", text)), None)
+    if count:
+        if count in _DAILY_TIMES:
+            return DoseRule(times=_DAILY_TIMES[count])
+        return DoseRule(interval=max(timedelta(hours=24 / count), _MIN_INTERVAL))
+    
+    named = sorted({t for word, t in _NAMED_TIMES.items() if re.search(rf"\b{word}\b", text)})
+    if named:
+        return DoseRule(times=tuple(named))
+    return None
+
+
+def next_dose(rule: DoseRule, after: datetime, anchor: datetime) -> datetime:
+    """First dose time strictly after `after` (UTC); interval rules count from `anchor`"""
+    if rule.interval:
+        if after < anchor:
+            return anchor
+        steps = (after - anchor) // rule.interval + 1
+        return anchor + steps * rule.interval
+    
+    offset = timedelta(minutes=DOSE_UTC_OFFSET_MINUTES)
+    local = after + offset
+    for day in (0, 1):
+        base = datetime.combine(local.date() + timedelta(days=day), datetime.min.time())
+        for hour, minute in rule.times:
+            candidate = base.replace(hour=hour, minute=minute)
+            if candidate > local:
+                return candidate - offset
+    raise ValueError("Dose rule has neither times nor an interval")
+
+
+def upcoming_doses(medicine: dict, count: int, after: Optional[datetime] = None) -> List[datetime]:
+    """The next `count` dose times of a medicine (empty if its frequency is not scheduled)"""
+    rule = parse_frequency(medicine.get("frequency"))
+    if rule is None:
+        return []
+    moment = after or datetime.utcnow()
+    anchor = medicine.get("assigned_at") or moment
+    times = []
+    while len(times) < count:
+        moment = next_dose(rule, moment, anchor)
+        if medicine.get("ends_at") and moment >= medicine["ends_at"]:
+            break
+        times.append(moment)
+    return times
+
+
+def dose_id(medicine_id: str, due_at: datetime) -> str:
+    return f"{medicine_id}|{due_at:%Y-%m-%dT%H:%M}"
+
+
+async def settle_doses(dose_ids: Optional[List[str]], delivered: bool, at: datetime, session=None):
+    """Doses of a finished delivery: delivered, or back to scheduled so the next tick re-plans them"""
+    if not dose_ids:
+        return
+    update = {"status": "delivered", "delivered_at": at} if delivered else {"status": "scheduled", "robot_command_id": None}
+    await get_collection(DOSES_COLLECTION).update_many({"_id": {"$in": dose_ids}, "status": "planned"}, {"$set": update}, session=session)
+
+
+def _is_active(medicine: dict, now: datetime) -> bool:
+    ends_at = medicine.get("ends_at")
+    return medicine.get("status") != "discontinued" and (ends_at is None or ends_at > now)
+
+
+# ==================== SCHEDULER ====================
+
+class DoseScheduler:
+    """Heap of next dose times per active prescription, materialized and planned on each tick"""
+    
+    def __init__(self):
+        # (next due, generation, medicine id); entries whose generation is not current are skipped
+        self._heap: List[Tuple[datetime, int, str]] = []
+        self._active: Dict[str, Tuple[dict, DoseRule, int]] = {}
+        self._generations = itertools.count()
+        self._dirty: Set[Optional[str]] = set()
+        self._refresh: Optional[asyncio.Task] = None
+        self.doses_scheduled = 0
+        self.deliveries_planned = 0
+    
+    @property
+    def active(self) -> int:
+        return len(self._active)
+    
+    @property
+    def heap_size(self) -> int:
+        return len(self._heap)
+    
+    def _track(self, medicine: dict, now: datetime):
+        medicine_id = str(medicine["_id"])
+        self._active.pop(medicine_id, None)
+        rule = parse_frequency(medicine.get("frequency"))
+        if rule is None or not _is_active(medicine, now):
+            return
+        
+        generation = next(self._generations)
+        self._active[medicine_id] = (medicine, rule, generation)
+        due = next_dose(rule, now, medicine.get("assigned_at") or now)
+        heapq.heappush(self._heap, (due, generation, medicine_id))
+    
+    async def load(self):
+        """Rebuild the heap from every active prescription"""
+        now = datetime.utcnow()
+        self._heap.clear()
+        self._active.clear()
+        cursor = get_collection("medicines").find({"status": {"$ne": "discontinued"}}, _PROJECTION)
+        async for medicine in cursor:
+            self._track(medicine, now)
+        logger.info(f"Dose scheduler loaded ({self.active} scheduled prescriptions)")
+    
+    def on_change(self, event: dict):
+        """Re-read changed medicines (all of them for bulk changes without an id)"""
+        self._dirty.add(event["id"])
+        if self._refresh is None or self._refresh.done():
+            self._refresh = asyncio.create_task(self._refresh_dirty())
+    
+    async def _refresh_dirty(self):
+        while self._dirty:
+            ids, self._dirty = self._dirty, set()
+            if None in ids:
+                await self.load()
+                continue
+            
+            ids = [i for i in ids if ObjectId.is_valid(i)]
+            medicines = {
+                str(medicine["_id"]): medicine
+                async for medicine in get_collection("medicines").find({"_id": {"$in": [ObjectId(i) for i in ids]}}, _PROJECTION)
+            }
+            # Doses not yet planned are re-created from the current frequency on the next tick
+            await get_collection(DOSES_COLLECTION).delete_many({"medicine_id": {"$in": ids}, "status": "scheduled"})
+            
+            now = datetime.utcnow()
+            for medicine_id in ids:
+                self._active.pop(medicine_id, None)
+                if medicine_id in medicines:
+                    self._track(medicines[medicine_id], now)
+        self._compact()
+    
+    def _compact(self):
+        """Drop stale heap entries once they outnumber the live ones"""
+        if len(self._heap) > 2 * len(self._active) + 100:
+            live = {medicine_id: generation for medicine_id, (_, _, generation) in self._active.items()}
+            self._heap = [entry for entry in self._heap if live.get(entry[2]) == entry[1]]
+            heapq.heapify(self._heap)
+    
+    def _pop_due(self, horizon: datetime) -> Tuple[List[dict], List[tuple], List[tuple]]:
+        """Dose documents for every heap entry due up to `horizon`, re-pushing each prescription's next dose; also returns the entries popped and pushed"""
+        doses, popped, pushed = [], [], []
+        while self._heap and self._heap[0][0] <= horizon:
+            due, generation, medicine_id = heapq.heappop(self._heap)
+            popped.append((due, generation, medicine_id))
+            entry = self._active.get(medicine_id)
+            if entry is None or entry[2] != generation:
+                continue
+            
+            medicine, rule, _ = entry
+            if medicine.get("ends_at") and due >= medicine["ends_at"]:
+                del self._active[medicine_id]
+                continue
+            
+            doses.append({
+                "_id": dose_id(medicine_id, due),
+                "medicine_id": medicine_id,
+                "patient_name": medicine.get("patient_name"),
+                "medicine_name": medicine.get("medicine_name"),
+                "dosage": medicine.get("dosage"),
+                "room_number": medicine.get("room_number"),
+                "due_at": due,
+                "status": "scheduled",
+                "robot_command_id": None,
+            })
+            following = (next_dose(rule, due, medicine.get("assigned_at") or due), generation, medicine_id)
+            heapq.heappush(self._heap, following)
+            pushed.append(following)
+        return doses, popped, pushed
+    
+    def _unpop(self, popped: List[tuple], pushed: List[tuple]):
+        """Undo _pop_due after a failed write, keeping entries pushed since by refreshes"""
+        remaining = Counter(pushed)
+        heap = []
+        for entry in self._heap + popped:
+            if remaining[entry]:
+                remaining[entry] -= 1
+            else:
+                heap.append(entry)
+        heapq.heapify(heap)
+        self._heap = heap
+    
+    async def tick(self, now: Optional[datetime] = None) -> Tuple[int, int]:
+        """Materialize doses coming due and plan deliveries; returns (doses written, deliveries planned)"""
+        now = now or datetime.utcnow()
+        doses, popped, pushed = self._pop_due(now + timedelta(hours=DOSE_SCHEDULE_AHEAD_HOURS))
+        if doses:
+            try:
+                # $setOnInsert: another worker, or this one before a restart, may have written it already
+                await get_collection(DOSES_COLLECTION).bulk_write(
+                    [UpdateOne({"_id": dose["_id"]}, {"$setOnInsert": dose}, upsert=True) for dose in doses],
+                    ordered=False
+                )
+            except Exception:
+                # The same doses are popped again on the next tick
+                self._unpop(popped, pushed)
+                raise
+            self.doses_scheduled += len(doses)
+        return len(doses), await self.plan(now)
+    
+    async def plan(self, now: datetime) -> int:
+        """Batch doses due within the lead time into one robot delivery per room and window"""
+        collection = get_collection(DOSES_COLLECTION)
+        grace = now - timedelta(minutes=DOSE_LEAD_MINUTES)
+        
+        # Doses that came due while nothing was planning them are not delivered late
+        await collection.update_many({"status": "scheduled", "due_at": {"$lt": grace}}, {"$set": {"status": "missed"}})
+        await self._release_orphans(now)
+        
+        cursor = collection.find({"status": "scheduled", "due_at": {"$lte": now + timedelta(minutes=DOSE_LEAD_MINUTES)}})
+        due = await cursor.sort("due_at", 1).to_list(length=None)
+        
+        groups: List[List[dict]] = []
+        open_windows: Dict[str, List[dict]] = {}
+        for dose in due:
+            room = dose.get("room_number") or ""
+            group = open_windows.get(room)
+            if group is None or dose["due_at"] - group[0]["due_at"] > timedelta(minutes=DOSE_BATCH_WINDOW_MINUTES):
+                group = open_windows[room] = []
+                groups.append(group)
+            group.append(dose)
+        
+        planned = 0
+        for group in groups:
+            if await self._dispatch(group):
+                planned += 1
+        self.deliveries_planned += planned
+        return planned
+    
+    async def _release_orphans(self, now: datetime):
+        """Return planned doses whose delivery command was never written (standalone server crash) to scheduled"""
+        collection = get_collection(DOSES_COLLECTION)
+        stale = now - timedelta(minutes=DOSE_ORPHAN_MINUTES)
+        command_ids = await collection.distinct("robot_command_id", {"status": "planned", "planned_at": {"$lt": stale}})
+        if not command_ids:
+            return
+        
+        existing = await get_collection("robot_commands").distinct(
+            "_id", {"_id": {"$in": [ObjectId(i) for i in command_ids if ObjectId.is_valid(i)]}}
+        )
+        orphaned = set(command_ids) - {str(i) for i in existing}
+        if orphaned:
+            result = await collection.update_many(
+                {"status": "planned", "robot_command_id": {"$in": list(orphaned)}},
+                {"$set": {"status": "scheduled", "robot_command_id": None}}
+            )
+            logger.warning(f"Released {result.modified_count} doses planned for missing delivery commands")
+    
+    async def _dispatch(self, group: List[dict]) -> bool:
+        """Claim a group of doses and create their delivery command (False if another worker got them all)"""
+        doses = get_collection(DOSES_COLLECTION)
+        commands = get_collection("robot_commands")
+        command_id = ObjectId()
+        
+        async def write(session):
+            result = await doses.update_many(
+                {"_id": {"$in": [dose["_id"] for dose in group]}, "status": "scheduled"},
+                {"$set": {"status": "planned", "robot_command_id": str(command_id), "planned_at": datetime.utcnow()}},
+                session=session
+            )
+            if not result.modified_count:
+                return None
+            claimed = await doses.find({"robot_command_id": str(command_id)}, session=session).sort("due_at", 1).to_list(length=None)
+            command = self._delivery(command_id, claimed)
+            try:
+                await commands.insert_one(command, session=session)
+            except Exception:
+                if session is None:
+                    # Standalone server: no transaction to abort, so undo by hand
+                    await settle_doses([dose["_id"] for dose in claimed], False, datetime.utcnow())
+                raise
+            return command
+        
+        command = await run_transaction(write)
+        if command is None:
+            return False
+        record_change("robot_commands", "insert", command_id, command)
+        return True
+    
+    def _delivery(self, command_id: ObjectId, claimed: List[dict]) -> dict:
+        """Robot command delivering a group of claimed doses"""
+        first_due = claimed[0]["due_at"]
+        command = RobotCommand(
+            intent="medicine_delivery",
+            action="deliver",
+            target=claimed[0].get("room_number") or "patient room",
+            details={
+                "dose_ids": [dose["_id"] for dose in claimed],
+                "doses": [
+                    {
+                        "medicine_id": dose["medicine_id"],
+                        "medicine": dose["medicine_name"],
+                        "patient": dose["patient_name"],
+                        "dosage": dose["dosage"],
+                        "due_at": dose["due_at"].isoformat(),
+                    }
+                    for dose in claimed
+                ],
+            },
+            scheduled_for=first_due - timedelta(minutes=DOSE_TRAVEL_MINUTES)
+        ).model_dump()
+        command["_id"] = command_id
+        return command
+    
+    async def run_forever(self, interval: int = DOSE_TICK_SECONDS):
+        """Background loop started from the app lifespan"""
+        await self.load()
+        while True:
+            try:
+                await self.tick()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Dose scheduling tick failed: {e}")
+            await asyncio.sleep(interval)
+
+
+# Shared per-process scheduler
+dose_scheduler = DoseScheduler()
+change_feed.add_listener("medicines", dose_scheduler.on_change)
+
+register_gauge(
+    "nami_dose_scheduler",
+    "Scheduled prescriptions, heap entries, doses written and deliveries planned since startup",
+    lambda: {
+        'stat="prescriptions"': dose_scheduler.active,
+        'stat="heap_entries"': dose_scheduler.heap_size,
+        'stat="doses_scheduled"': dose_scheduler.doses_scheduled,
+        'stat="deliveries_planned"': dose_scheduler.deliveries_planned,
+    }
+)
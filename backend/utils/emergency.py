@@ -0,0 +1,173 @@
+"""
+Emergency Dispatch Fast Path
+An alert, its team notification and its urgent robot command are
+persisted together in one majority transaction (a single commit on the
+critical path), then announced at once to notification subscribers (the
+emergency team) and to robots following robot_commands on the change feed.
+Only the unread counters and the audit log entry are written in the
+background.
+"""
+
+import os
+import time
+import asyncio
+import logging
+from collections import deque
+from datetime import datetime
+from typing import Set
+
+from bson import ObjectId
+
+from utils.changes import change_feed, record_change
+from utils.db import get_collection, run_transaction
+from utils.metrics import register_gauge
+from utils.directory import staff_directory
+from utils.notifications import adjust_unread, recipient_key
+from utils.rollups import record_log_rollups
+
+logger = logging.getLogger(__name__)
+
+# Emergency dispatch configuration
+EMERGENCY_RECIPIENT = os.getenv("EMERGENCY_RECIPIENT", "Emergency Team")
+EMERGENCY_SLA_MS = float(os.getenv("EMERGENCY_SLA_MS", 250))
+
+# Recent dispatch latencies kept for the p99 gauge
+_LATENCY_WINDOW = 500
+
+
+class EmergencyDispatcher:
+    """Durable writes, immediate fan-out, deferred bookkeeping"""
+    
+    def __init__(self):
+        self.latencies_ms = deque(maxlen=_LATENCY_WINDOW)
+        self.dispatched = 0
+        self.sla_breaches = 0
+        self._background: Set[asyncio.Task] = set()
+    
+    def _record_latency(self, elapsed_ms: float):
+        self.dispatched += 1
+        self.latencies_ms.append(elapsed_ms)
+        if elapsed_ms > EMERGENCY_SLA_MS:
+            self.sla_breaches += 1
+            logger.warning(f"Emergency dispatch took {elapsed_ms:.1f}ms (SLA {EMERGENCY_SLA_MS:.0f}ms)")
+    
+    def percentile(self, fraction: float) -> float:
+        if not self.latencies_ms:
+            return 0.0
+        ordered = sorted(self.latencies_ms)
+        return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+    
+    async def dispatch(self, alert: dict) -> dict:
+        """Persist an alert and broadcast it; returns the stored alert"""
+        start = time.perf_counter()
+        now = datetime.utcnow()
+        team = recipient_key(EMERGENCY_RECIPIENT)
+        members = staff_directory.expand(team)
+        
+        notification = {
+            "_id": ObjectId(),
+            "recipient": EMERGENCY_RECIPIENT,
+            "recipient_key": team,
+            "members": members,
+            "unread_members": list(members),
+            "read_by": [],
+            "message": f"EMERGENCY: {alert['alert_type'].upper()} at {alert['location']}",
+            "priority": "urgent",
+            "status": "sent",
+            "timestamp": now
+        }
+        command = {
+            "_id": ObjectId(),
+            "intent": "emergency",
+            "action": "respond",
+            "target": alert["location"],
+            "details": {"alert_type": alert["alert_type"], "details": alert.get("details")},
+            "priority": "urgent",
+            "status": "pending",
+            "timestamp": now
+        }
+        
+        # Ids are chosen up front so the documents can reference each other
+        alert["_id"] = ObjectId()
+        alert["notification_id"] = notification["_id"]
+        alert["robot_command_id"] = command["_id"]
+        command["details"]["alert_id"] = str(alert["_id"])
+        
+        alerts = get_collection("emergency_alerts")
+        notifications = get_collection("notifications")
+        commands = get_collection("robot_commands")
+        
+        async def write(session):
+            await alerts.insert_one(alert, session=session)
+            try:
+                await notifications.insert_one(notification, session=session)
+                await commands.insert_one(command, session=session)
+            except Exception:
+                if session is None:
+                    # Standalone server: no transaction to abort, so undo by hand
+                    await alerts.delete_one({"_id": alert["_id"]})
+                    await notifications.delete_one({"_id": notification["_id"]})
+                raise
+        
+        # The only wait on the critical path: one majority, journaled commit
+        await run_transaction(write)
+        
+        # Fan-out is a non-blocking put into every subscriber queue
+        change_feed.announce("notifications", notification["_id"], notification)
+        change_feed.announce("robot_commands", command["_id"], command)
+        record_change("emergency_alerts", "insert", alert["_id"], alert)
+        record_change("notifications", "insert", notification["_id"], notification)
+        record_change("robot_commands", "insert", command["_id"], command)
+        
+        self._record_latency((time.perf_counter() - start) * 1000)
+        self._spawn(self._follow_up(alert, notification))
+        return alert
+    
+    def _spawn(self, coroutine):
+        task = asyncio.create_task(coroutine)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+    
+    async def _follow_up(self, alert: dict, notification: dict):
+        """Count the notification as unread for the team and write the audit entry"""
+        audit = {
+            "query": f"trigger_emergency({alert['alert_type']}, {alert['location']})",
+            "intent": "emergency",
+            "action": "dispatch",
+            "target": alert["location"],
+            "response": notification["message"],
+            "timestamp": datetime.utcnow()
+        }
+        
+        try:
+            await adjust_unread(notification["unread_members"], 1)
+        except Exception as e:
+            logger.error(f"Emergency unread counter update failed: {e}")
+        
+        try:
+            await get_collection("chatbot_logs").insert_one(audit)
+        except Exception as e:
+            logger.error(f"Emergency audit log write failed: {e}")
+            return
+        record_change("chatbot_logs", "insert", audit["_id"], audit)
+        await record_log_rollups([audit])
+    
+    async def drain(self, timeout: float = 5):
+        """Wait for outstanding background writes (called on shutdown)"""
+        if self._background:
+            await asyncio.wait(list(self._background), timeout=timeout)
+
+
+# Shared per-process dispatcher
+emergency_dispatcher = EmergencyDispatcher()
+
+register_gauge(
+    "nami_emergency_dispatch",
+    "Emergency dispatches, SLA breaches and recent dispatch latency in ms",
+    lambda: {
+        'stat="dispatched"': emergency_dispatcher.dispatched,
+        'stat="sla_breaches"': emergency_dispatcher.sla_breaches,
+        'stat="p50_ms"': round(emergency_dispatcher.percentile(0.5), 2),
+        'stat="p99_ms"': round(emergency_dispatcher.percentile(0.99), 2),
+    }
+)
@@ -0,0 +1,155 @@
+"""
+ETag / Conditional GET Middleware
+List and detail GETs get a strong ETag derived from the version of the
+collections they read plus the request path and query string. A request
+whose If-None-Match matches is answered with 304 before the route runs.
+
+Routes keep their read preference: a response built from a read that a
+secondary may have served could be older than the version alone claims,
+so its tag also carries the operationTime of every reply the request got.
+Such a tag is only known after the route ran, so its 304 is answered
+then, with the body dropped.
+
+Responses that change with the clock (pending robot commands becoming
+due) carry the next such boundary in their tag.
+"""
+
+import re
+import hashlib
+import secrets
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import Response
+
+from utils.cache import get_version
+from utils.command_states import next_scheduled_at
+from utils.db import ReadTracker, reads_may_lag, secondary_reads
+
+# Versions are per process, so tags from another worker never match
+_EPOCH = secrets.token_hex(4)
+
+# Tagged routes and the collections their responses are built from
+ETAG_ROUTES = [
+    (re.compile(r"^/doctors(/(?!free-slots$)[^/]+)?$"), ("doctors",)),
+    (re.compile(r"^/patients(/[^/]+)?$"), ("patients",)),
+    (re.compile(r"^/appointments(/[^/]+)?$"), ("appointments",)),
+    # /medicines/doses depends on the clock (due-time window), so it is never tagged
+    (re.compile(r"^/medicines(/(?!doses$)[^/]+)?$"), ("medicines",)),
+    (re.compile(r"^/tasks(/[^/]+)?$"), ("tasks",)),
+    (re.compile(r"^/notifications$"), ("notifications",)),
+    (re.compile(r"^/robot/commands$"), ("robot_commands",)),
+    # Scheduled deliveries appear as time passes, so the tag carries the next scheduled_for
+    (re.compile(r"^/robot/commands/pending$"), ("robot_commands",), next_scheduled_at),
+    (re.compile(r"^/emergency$"), ("emergency_alerts",)),
+    (re.compile(r"^/logs$"), ("chatbot_logs",)),
+    (re.compile(r"^/staff(/[^/]+)?$"), ("staff",)),
+]
+
+
+# Route pattern -> (versions, boundary) of its last clock lookup
+_boundaries: Dict[str, Tuple[Tuple[int, ...], Optional[datetime]]] = {}
+
+
+def _route_for(path: str) -> Optional[Tuple[re.Pattern, Tuple[str, ...], Optional[Callable[[], Awaitable[Optional[datetime]]]]]]:
+    for pattern, collections, *clock in ETAG_ROUTES:
+        if pattern.match(path):
+            return pattern, collections, clock[0] if clock else None
+    return None
+
+
+async def _next_boundary(pattern: re.Pattern, collections: Tuple[str, ...], clock) -> Optional[datetime]:
+    """Next time a clock-driven response changes, looked up again only after a write or once it has passed"""
+    versions = tuple(get_version(name) for name in collections)
+    cached = _boundaries.get(pattern.pattern)
+    if cached is not None and cached[0] == versions and (cached[1] is None or cached[1] > datetime.utcnow()):
+        return cached[1]
+    
+    boundary = await clock()
+    _boundaries[pattern.pattern] = (versions, boundary)
+    return boundary
+
+
+def compute_etag(path: str, query_string: bytes, collections: Tuple[str, ...], variant: bytes = b"") -> str:
+    """Strong ETag for a GET of `path` given the current collection versions"""
+    versions = "-".join(str(get_version(name)) for name in collections)
+    # `variant` (Accept / Accept-Encoding) keeps JSON, MessagePack and compressed bodies apart
+    digest = hashlib.blake2b(path.encode() + b"?" + query_string + b"|" + variant, digest_size=8).hexdigest()
+    return f'"{_EPOCH}-{versions}-{digest}"'
+
+
+def _with_read_token(etag: str, operation_times: List[Any]) -> str:
+    """Fold the operationTimes the replies reported into a tag, so it names the snapshot the body was read at"""
+    token = hashlib.blake2b(",".join(map(str, operation_times)).encode(), digest_size=4).hexdigest()
+    return f'{etag[:-1]}-{token}"'
+
+
+def _matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    return etag in (tag.strip() for tag in if_none_match.split(","))
+
+
+class ETagMiddleware:
+    """Pure ASGI middleware adding ETags and answering conditional GETs"""
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in ("GET", "HEAD"):
+            await self.app(scope, receive, send)
+            return
+        
+        route = _route_for(scope["path"])
+        if route is None:
+            await self.app(scope, receive, send)
+            return
+        pattern, collections, clock = route
+        
+        # Snapshot the versions before the route reads, so a concurrent
+        # write can only make the tag older than the data, never newer
+        headers = Headers(scope=scope)
+        variant = f"{headers.get('accept', '')}|{headers.get('accept-encoding', '')}"
+        if clock is not None:
+            try:
+                boundary = await _next_boundary(pattern, collections, clock)
+            except Exception:
+                # Serve untagged; the route reports the database error itself
+                await self.app(scope, receive, send)
+                return
+            variant += f"|until={boundary.isoformat() if boundary else ''}"
+        etag = compute_etag(scope["path"], scope["query_string"], collections, variant.encode())
+        
+        if_none_match = headers.get("if-none-match")
+        if if_none_match and _matches(if_none_match, etag):
+            response = Response(status_code=304, headers={"ETag": etag})
+            await response(scope, receive, send)
+            return
+        
+        tracked = ReadTracker()
+        not_modified = False
+        
+        async def send_with_etag(message):
+            nonlocal not_modified
+            if message["type"] == "http.response.start" and message["status"] == 200:
+                tag = etag
+                if tracked.collections and reads_may_lag():
+                    tag = _with_read_token(etag, tracked.operation_times) if tracked.operation_times else None
+                if tag and if_none_match and _matches(if_none_match, tag):
+                    not_modified = True
+                    message = {"type": "http.response.start", "status": 304, "headers": [(b"etag", tag.encode())]}
+                elif tag:
+                    MutableHeaders(scope=message).append("ETag", tag)
+            elif message["type"] == "http.response.body" and not_modified:
+                if message.get("more_body"):
+                    return
+                message = {"type": "http.response.body", "body": b""}
+            await send(message)
+        
+        token = secondary_reads.set(tracked)
+        try:
+            await self.app(scope, receive, send_with_etag)
+        finally:
+            secondary_reads.reset(token)
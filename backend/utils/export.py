@@ -0,0 +1,49 @@
+"""
+Streaming NDJSON Exports
+Iterates a Motor cursor batch by batch and yields one NDJSON chunk per
+batch, so memory use depends on the batch size, not the result size.
+"""
+
+import os
+import json
+from datetime import date, datetime
+from typing import AsyncIterator
+
+from bson import ObjectId
+from fastapi.responses import StreamingResponse
+
+# Documents fetched per round trip and written per chunk
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", 1000))
+
+
+def _default(value):
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+async def ndjson_chunks(cursor, batch_size: int = EXPORT_BATCH_SIZE) -> AsyncIterator[bytes]:
+    """Encode a cursor's documents as NDJSON, one chunk per server batch"""
+    cursor.batch_size(batch_size)
+    lines = []
+    try:
+        async for document in cursor:
+            lines.append(json.dumps(document, default=_default))
+            if len(lines) >= batch_size:
+                yield ("\n".join(lines) + "\n").encode()
+                lines = []
+        if lines:
+            yield ("\n".join(lines) + "\n").encode()
+    finally:
+        # Also runs when the client disconnects mid-export
+        await cursor.close()
+
+
+def ndjson_response(cursor, filename: str, batch_size: int = EXPORT_BATCH_SIZE) -> StreamingResponse:
+    return StreamingResponse(
+        ndjson_chunks(cursor, batch_size),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
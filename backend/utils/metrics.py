@@ -0,0 +1,25 @@
+"""
+Minimal Prometheus-style metrics registry
+Subsystems register gauges as callbacks; /metrics renders them as text.
+"""
+
+from typing import Callable, Dict, List, Tuple
+
+_gauges: List[Tuple[str, str, Callable[[], Dict[str, float]]]] = []
+
+
+def register_gauge(name: str, help_text: str, collect: Callable[[], Dict[str, float]]):
+    """Register a gauge; `collect` returns {label_string: value} ("" for no labels)"""
+    _gauges.append((name, help_text, collect))
+
+
+def render() -> str:
+    """Render all registered gauges in the Prometheus text exposition format"""
+    lines = []
+    for name, help_text, collect in _gauges:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} gauge")
+        for labels, value in collect().items():
+            suffix = f"{{{labels}}}" if labels else ""
+            lines.append(f"{name}{suffix} {value}")
+    return "\n".join(lines) + "\n"
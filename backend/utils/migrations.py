@@ -0,0 +1,65 @@
+"""
+Background Data Migrations
+Long-running, batched migrations started from the app lifespan.
+"""
+
+import asyncio
+import logging
+from pymongo import UpdateOne
+
+from models.appointment import parse_start_at
+from utils.db import get_collection
+from utils.changes import record_change
+
+logger = logging.getLogger(__name__)
+
+MIGRATION_BATCH_SIZE = 500
+MIGRATION_PAUSE_SECONDS = 0.1
+
+
+async def migrate_appointment_start_at(batch_size: int = MIGRATION_BATCH_SIZE):
+    """Populate start_at/duration_minutes on appointments that only have date/time strings"""
+    collection = get_collection("appointments")
+    
+    try:
+        await _migrate_batches(collection, batch_size)
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        logger.error(f"Appointment start_at migration failed: {e}")
+
+
+async def _migrate_batches(collection, batch_size: int):
+    """Convert legacy appointments batch by batch until none are left"""
+    migrated = 0
+    
+    while True:
+        batch = await collection.find(
+            {"start_at": {"$exists": False}},
+            {"date": 1, "time": 1}
+        ).limit(batch_size).to_list(length=batch_size)
+        
+        if not batch:
+            break
+        
+        operations = []
+        for appt in batch:
+            try:
+                start_at = parse_start_at(appt.get("date"), appt.get("time"))
+            except (TypeError, ValueError):
+                # Unparseable legacy values are marked so they are not retried
+                start_at = None
+            operations.append(UpdateOne(
+                {"_id": appt["_id"], "start_at": {"$exists": False}},
+                {"$set": {"start_at": start_at, "duration_minutes": 30}}
+            ))
+        
+        result = await collection.bulk_write(operations, ordered=False)
+        migrated += result.modified_count
+        record_change("appointments", "update")
+        
+        # Yield to request handling between batches
+        await asyncio.sleep(MIGRATION_PAUSE_SECONDS)
+    
+    if migrated:
+        logger.info(f"Migrated {migrated} appointments to start_at datetimes")
@@ -0,0 +1,228 @@
+"""
+Real-Time Notification Fan-Out
+New notifications are published to an in-process PubSubHub with one topic
+per recipient key (staff name or department, case-insensitive) plus a "*" topic
+for dashboards. Inserts arrive through the change feed, so notifications
+written by another worker are delivered too when change streams are on.
+
+Event ids are "<epoch>.<seq>.<notification id>". A reconnecting client
+replays from the hub buffer when the id comes from this process and is
+still buffered, otherwise from the database by notification id.
+"""
+
+import os
+import secrets
+from datetime import datetime
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple
+
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+from pymongo import UpdateOne
+
+from utils.changes import change_feed
+from utils.db import get_collection
+from utils.metrics import register_gauge
+from utils.pubsub import PubSubHub, ReplayGap
+
+# Fan-out configuration
+NOTIFICATION_BUFFER_SIZE = int(os.getenv("NOTIFICATION_BUFFER_SIZE", 100))
+NOTIFICATION_QUEUE_SIZE = int(os.getenv("NOTIFICATION_QUEUE_SIZE", 256))
+NOTIFICATION_REPLAY_LIMIT = int(os.getenv("NOTIFICATION_REPLAY_LIMIT", 500))
+
+ALL_RECIPIENTS = "*"
+
+_EPOCH = secrets.token_hex(4)
+
+
+def recipient_key(recipient: str) -> str:
+    """Normalized recipient, stored as `recipient_key` and used as the topic name"""
+    return recipient.strip().lower()
+
+
+async def adjust_unread(keys: List[str], delta: int, session=None):
+    """Atomically move the unread counters of some recipients, in one round trip"""
+    if delta and keys:
+        await get_collection("notification_counters").bulk_write(
+            [UpdateOne({"_id": key}, {"$inc": {"unread": delta}}, upsert=True) for key in keys],
+            ordered=False,
+            session=session
+        )
+
+
+def recipient_filter(key: str) -> dict:
+    """Notifications addressed to a key, directly, as a department, or as a member of one"""
+    return {"$or": [{"recipient_key": key}, {"members": key}]}
+
+
+def mark_read_pipeline(now: datetime, keys: Optional[List[str]] = None) -> List[dict]:
+    """Update pipeline marking `keys` (default: all unread members) read; the notification turns "read" once none are left"""
+    readers = {"$setIntersection": ["$unread_members", {"$literal": keys}]} if keys is not None else "$unread_members"
+    remaining = {"$setDifference": ["$unread_members", {"$literal": keys}]} if keys is not None else {"$literal": []}
+    all_read = {"$and": [{"$eq": [{"$size": "$unread_members"}, 0]}, {"$eq": ["$status", "sent"]}]}
+    return [
+        {"$set": {
+            "read_by": {"$concatArrays": [
+                {"$ifNull": ["$read_by", []]},
+                {"$map": {"input": readers, "as": "member", "in": {"member": "$$member", "read_at": now}}},
+            ]},
+            "unread_members": remaining,
+        }},
+        {"$set": {
+            "status": {"$cond": [all_read, "read", "$status"]},
+            "read_at": {"$cond": [all_read, now, "$read_at"]},
+        }},
+    ]
+
+
+def unmark_read_pipeline(now: datetime, keys: Optional[List[str]] = None) -> List[dict]:
+    """Update pipeline undoing mark_read_pipeline(now, keys), for standalone servers where no transaction can abort it"""
+    marked = {"$eq": ["$$entry.read_at", now]}
+    if keys is not None:
+        marked = {"$and": [marked, {"$in": ["$$entry.member", {"$literal": keys}]}]}
+    read_by = {"$ifNull": ["$read_by", []]}
+    undone = {"$filter": {"input": read_by, "as": "entry", "cond": marked}}
+    marked_all = {"$eq": ["$read_at", now]}
+    return [
+        {"$set": {
+            "unread_members": {"$setUnion": ["$unread_members", {"$map": {"input": undone, "as": "entry", "in": "$$entry.member"}}]},
+            "read_by": {"$filter": {"input": read_by, "as": "entry", "cond": {"$not": [marked]}}},
+        }},
+        {"$set": {
+            "status": {"$cond": [marked_all, "sent", "$status"]},
+            "read_at": {"$cond": [marked_all, None, "$read_at"]},
+        }},
+    ]
+
+
+def encode_event_id(seq: int, notification_id: str) -> str:
+    return f"{_EPOCH}.{seq}.{notification_id}"
+
+
+def decode_event_id(event_id: str) -> Tuple[str, int, ObjectId]:
+    """Split an event id, raising ValueError if it is malformed"""
+    try:
+        epoch, seq, notification_id = event_id.split(".")
+        return epoch, int(seq), ObjectId(notification_id)
+    except Exception:
+        raise ValueError("Invalid event id")
+
+
+class NotificationBroadcaster:
+    """Per-recipient notification fan-out with bounded replay"""
+    
+    def __init__(self):
+        self.hub = PubSubHub(NOTIFICATION_BUFFER_SIZE, NOTIFICATION_QUEUE_SIZE)
+    
+    def publish(self, notification: dict):
+        """Deliver a stored notification (JSON-encoded, `_id` as a string) to its recipient and members"""
+        topics = {recipient_key(notification.get("recipient") or "")}
+        topics.update(notification.get("members") or ())
+        for topic in topics:
+            self.hub.publish(topic, notification)
+        self.hub.publish(ALL_RECIPIENTS, notification)
+    
+    def on_change(self, event: dict):
+        if event["operation"] == "insert" and event.get("document"):
+            self.publish(event["document"])
+    
+    async def _replay_from_db(self, recipients: List[str], after_id: ObjectId) -> List[dict]:
+        query: Dict[str, Any] = {"_id": {"$gt": after_id}}
+        keys = [recipient_key(r) for r in recipients]
+        if recipients:
+            query["$or"] = [{"recipient_key": {"$in": keys}}, {"members": {"$in": keys}}]
+        
+        collection = get_collection("notifications")
+        cursor = collection.find(query).sort("_id", 1).limit(NOTIFICATION_REPLAY_LIMIT)
+        notifications = await cursor.to_list(length=NOTIFICATION_REPLAY_LIMIT)
+        # Same encoding as live events from the change feed
+        return [jsonable_encoder(notif, custom_encoder={ObjectId: str}) for notif in notifications]
+    
+    async def open(self, recipients: List[str], last_event_id: Optional[str] = None) -> "NotificationStream":
+        """Subscribe to recipients (all if empty) from `last_event_id` (or now); raises ValueError"""
+        topics = [recipient_key(r) for r in recipients] or [ALL_RECIPIENTS]
+        
+        if not last_event_id:
+            sub, _ = self.hub.subscribe(topics)
+            return NotificationStream(sub, [], self.hub.seq)
+        
+        epoch, seq, last_id = decode_event_id(last_event_id)
+        if epoch == _EPOCH:
+            try:
+                sub, missed = self.hub.subscribe(topics, seq)
+                return NotificationStream(sub, [(s, event) for s, _, event in missed], seq, last_event_id=last_event_id)
+            except ReplayGap:
+                pass
+        
+        # Subscribe first so live notifications queue up while the database is read
+        sub, _ = self.hub.subscribe(topics)
+        seq = self.hub.seq
+        missed = await self._replay_from_db(recipients, last_id)
+        return NotificationStream(sub, [(None, event) for event in missed], seq, {n["_id"] for n in missed}, last_event_id)
+
+
+class NotificationStream:
+    """One connected client's notification subscription"""
+    
+    def __init__(self, sub, pending: List[Tuple[Optional[int], dict]], seq: int, skip_ids: Optional[Set[str]] = None, last_event_id: Optional[str] = None):
+        self.sub = sub
+        self.pending = pending
+        self.seq = seq
+        self.skip_ids = skip_ids or set()
+        # A subscriber to both a person and their department sees group notifications twice
+        self._recent_ids: Deque[str] = deque(maxlen=256)
+        # Until something is delivered, resume from where the client asked (or now)
+        self.last_event_id = last_event_id or encode_event_id(seq, str(ObjectId.from_datetime(datetime.utcnow())))
+    
+    @property
+    def overflowed(self) -> bool:
+        return self.sub.overflowed
+    
+    def _accept(self, seq: Optional[int], notification: dict) -> Optional[Tuple[str, dict]]:
+        if seq is not None:
+            self.seq = max(self.seq, seq)
+            if notification["_id"] in self.skip_ids:
+                # Already replayed from the database
+                return None
+        if notification["_id"] in self._recent_ids:
+            return None
+        self._recent_ids.append(notification["_id"])
+        self.last_event_id = encode_event_id(self.seq, notification["_id"])
+        return self.last_event_id, notification
+    
+    async def next_batch(self, timeout: float, limit: int = 100) -> List[Tuple[str, dict]]:
+        """(event id, notification) pairs: replayed ones first, else wait up to `timeout`"""
+        batch = []
+        while self.pending and len(batch) < limit:
+            item = self._accept(*self.pending.pop(0))
+            if item:
+                batch.append(item)
+        if batch:
+            return batch
+        
+        first = await self.sub.get(timeout)
+        if first is None:
+            return []
+        for seq, _, notification in [first] + self.sub.drain(limit - 1):
+            item = self._accept(seq, notification)
+            if item:
+                batch.append(item)
+        return batch
+    
+    def close(self):
+        self.sub.close()
+
+
+# Shared per-process broadcaster, fed by the change feed
+notification_broadcaster = NotificationBroadcaster()
+change_feed.add_listener("notifications", notification_broadcaster.on_change)
+
+register_gauge(
+    "nami_notification_fanout",
+    "Notification stream subscribers, dropped slow subscribers and published events",
+    lambda: {
+        'stat="subscribers"': notification_broadcaster.hub.subscriber_count(),
+        'stat="dropped_subscribers"': notification_broadcaster.hub.dropped_subscribers,
+        'stat="events"': notification_broadcaster.hub.seq,
+    }
+)
@@ -0,0 +1,106 @@
+"""
+In-Process Pub/Sub Hub
+Topics keep a bounded replay buffer of recent events, each tagged with a
+hub-wide sequence number, and fan new events out to subscriber queues.
+Subscribers that fall too far behind are dropped and told to resync.
+"""
+
+import asyncio
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, List, Optional, Set, Tuple
+
+
+class ReplayGap(Exception):
+    """The requested position is older than the replay buffer"""
+
+
+class Subscription:
+    """A subscriber's bounded queue of (seq, topic, event) tuples"""
+    
+    def __init__(self, hub: "PubSubHub", topics: Iterable[str], maxsize: int):
+        self.hub = hub
+        self.topics = set(topics)
+        self.queue: "asyncio.Queue[Tuple[int, str, Any]]" = asyncio.Queue(maxsize=maxsize)
+        self.overflowed = False
+    
+    async def get(self, timeout: Optional[float] = None) -> Optional[Tuple[int, str, Any]]:
+        """Next event, or None on timeout"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+    
+    def drain(self, limit: int) -> List[Tuple[int, str, Any]]:
+        """Up to `limit` already-queued events without waiting"""
+        events = []
+        while len(events) < limit and not self.queue.empty():
+            events.append(self.queue.get_nowait())
+        return events
+    
+    def close(self):
+        self.hub.unsubscribe(self)
+
+
+class PubSubHub:
+    """Topic-based fan-out with bounded replay and per-subscriber backpressure"""
+    
+    def __init__(self, buffer_size: int = 1000, queue_size: int = 1000):
+        self.buffer_size = buffer_size
+        self.queue_size = queue_size
+        self.seq = 0
+        self._buffers: Dict[str, Deque[Tuple[int, Any]]] = {}
+        self._evicted_upto: Dict[str, int] = {}
+        self._subscribers: Dict[str, Set[Subscription]] = {}
+        self.dropped_subscribers = 0
+    
+    def publish(self, topic: str, event: Any) -> int:
+        """Buffer an event and deliver it to the topic's subscribers"""
+        self.seq += 1
+        buffer = self._buffers.setdefault(topic, deque())
+        buffer.append((self.seq, event))
+        if len(buffer) > self.buffer_size:
+            evicted_seq, _ = buffer.popleft()
+            self._evicted_upto[topic] = evicted_seq
+        
+        for sub in list(self._subscribers.get(topic, ())):
+            try:
+                sub.queue.put_nowait((self.seq, topic, event))
+            except asyncio.QueueFull:
+                # Slow consumer: drop it rather than block or grow unbounded
+                sub.overflowed = True
+                self.dropped_subscribers += 1
+                self.unsubscribe(sub)
+        
+        return self.seq
+    
+    def replay(self, topics: Iterable[str], after_seq: int) -> List[Tuple[int, str, Any]]:
+        """Buffered events with seq > after_seq, in order; raises ReplayGap if some were evicted"""
+        events = []
+        for topic in topics:
+            if after_seq < self._evicted_upto.get(topic, 0):
+                raise ReplayGap(topic)
+            events.extend((seq, topic, event) for seq, event in self._buffers.get(topic, ()) if seq > after_seq)
+        events.sort(key=lambda item: item[0])
+        return events
+    
+    def subscribe(self, topics: Iterable[str], after_seq: Optional[int] = None) -> Tuple[Subscription, List[Tuple[int, str, Any]]]:
+        """Register a subscriber and return it with the events it missed since after_seq"""
+        topics = list(topics)
+        # Replay and registration happen without yielding, so nothing is lost or duplicated
+        missed = self.replay(topics, after_seq) if after_seq is not None else []
+        
+        sub = Subscription(self, topics, self.queue_size)
+        for topic in topics:
+            self._subscribers.setdefault(topic, set()).add(sub)
+        return sub, missed
+    
+    def unsubscribe(self, sub: Subscription):
+        for topic in sub.topics:
+            subscribers = self._subscribers.get(topic)
+            if subscribers is not None:
+                subscribers.discard(sub)
+                if not subscribers:
+                    del self._subscribers[topic]
+    
+    def subscriber_count(self) -> int:
+        return len({sub for subs in self._subscribers.values() for sub in subs})
@@ -0,0 +1,115 @@
+"""
+Chatbot Log Rollups
+Every chatbot log insert also bumps one rollup document per granularity
+(hour and day) for its intent and action, with `$inc`/`$min`/`$max`
+upserts in a single bulk write. Volume and intent-mix questions are then
+answered from the rollups, reading one document per bucket and
+intent/action pair instead of scanning raw logs. Rollups outlive the raw
+logs that tiering archives or expires.
+"""
+
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from pymongo import UpdateOne
+
+from utils.db import get_collection
+
+ROLLUP_COLLECTION = "chatbot_log_rollups"
+
+# Bucket id format per granularity (the same format strings work in $dateToString)
+ROLLUP_GRANULARITIES = {
+    "hour": "%Y-%m-%dT%H",
+    "day": "%Y-%m-%d",
+}
+
+
+def bucket_start(moment: datetime, granularity: str) -> datetime:
+    """Start of the hour or day containing `moment`"""
+    if granularity == "day":
+        return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def rollup_id(granularity: str, bucket: datetime, intent: str, action: str) -> str:
+    return f"{granularity}|{bucket.strftime(ROLLUP_GRANULARITIES[granularity])}|{intent}|{action}"
+
+
+def _rollup_updates(log: dict) -> List[UpdateOne]:
+    moment = log.get("timestamp") or datetime.utcnow()
+    intent, action = log.get("intent", ""), log.get("action", "")
+    size = len(log.get("response") or "")
+    
+    updates = []
+    for granularity in ROLLUP_GRANULARITIES:
+        bucket = bucket_start(moment, granularity)
+        updates.append(UpdateOne(
+            {"_id": rollup_id(granularity, bucket, intent, action)},
+            {
+                "$inc": {"count": 1, "response_chars": size},
+                "$min": {"response_chars_min": size},
+                "$max": {"response_chars_max": size},
+                "$setOnInsert": {"granularity": granularity, "bucket": bucket, "intent": intent, "action": action},
+            },
+            upsert=True
+        ))
+    return updates
+
+
+async def record_log_rollups(logs: List[dict]):
+    """Count inserted logs into their hour and day rollups, in one round trip"""
+    updates = [update for log in logs for update in _rollup_updates(log)]
+    if updates:
+        await get_collection(ROLLUP_COLLECTION).bulk_write(updates, ordered=False)
+
+
+async def rollup_stats(
+    start: datetime,
+    end: datetime,
+    granularity: str = "hour",
+    intent: Optional[str] = None,
+    action: Optional[str] = None
+) -> dict:
+    """Totals, intent/action mix, response sizes and a per-bucket series for [start, end)"""
+    collection = get_collection(ROLLUP_COLLECTION, read_preference="secondaryPreferred")
+    
+    query = {"granularity": granularity, "bucket": {"$gte": bucket_start(start, granularity), "$lt": end}}
+    if intent:
+        query["intent"] = intent
+    if action:
+        query["action"] = action
+    
+    total = chars = 0
+    chars_min: Optional[int] = None
+    chars_max: Optional[int] = None
+    by_intent: Dict[str, int] = {}
+    by_action: Dict[str, int] = {}
+    series: Dict[datetime, dict] = {}
+    
+    async for rollup in collection.find(query).sort("bucket", 1):
+        count = rollup["count"]
+        total += count
+        chars += rollup["response_chars"]
+        chars_min = rollup["response_chars_min"] if chars_min is None else min(chars_min, rollup["response_chars_min"])
+        chars_max = rollup["response_chars_max"] if chars_max is None else max(chars_max, rollup["response_chars_max"])
+        by_intent[rollup["intent"]] = by_intent.get(rollup["intent"], 0) + count
+        by_action[rollup["action"]] = by_action.get(rollup["action"], 0) + count
+        
+        point = series.setdefault(rollup["bucket"], {"bucket": rollup["bucket"], "count": 0, "intents": {}})
+        point["count"] += count
+        point["intents"][rollup["intent"]] = point["intents"].get(rollup["intent"], 0) + count
+    
+    return {
+        "granularity": granularity,
+        "from": bucket_start(start, granularity),
+        "to": end,
+        "total": total,
+        "by_intent": dict(sorted(by_intent.items(), key=lambda item: -item[1])),
+        "by_action": dict(sorted(by_action.items(), key=lambda item: -item[1])),
+        "response_chars": {
+            "avg": round(chars / total, 1) if total else None,
+            "min": chars_min,
+            "max": chars_max,
+        },
+        "series": list(series.values()),
+    }
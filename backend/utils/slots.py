@@ -0,0 +1,242 @@
+"""
+Doctor Availability Bitmaps
+Each day is a bitmap of fixed-length appointment slots (bit i = slot i);
+an appointment occupies every slot its duration_minutes overlaps.
+Working days come from Doctor.schedule; booked slots come from
+appointments and are cached per doctor/day, updated incrementally by this
+process's writes and evicted on appointment change events (writes made by
+other workers or directly in MongoDB).
+"""
+
+import os
+import logging
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from utils.changes import change_feed
+
+logger = logging.getLogger(__name__)
+
+# Slot grid configuration
+SLOT_MINUTES = int(os.getenv("APPOINTMENT_SLOT_MINUTES", 30))
+WORKDAY_START = os.getenv("WORKDAY_START", "09:00")
+WORKDAY_END = os.getenv("WORKDAY_END", "17:00")
+SLOT_CACHE_SIZE = int(os.getenv("SLOT_CACHE_SIZE", 10000))
+
+WEEKDAYS = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+
+
+def _minutes(hhmm: str) -> int:
+    hours, minutes = hhmm.split(":")
+    return int(hours) * 60 + int(minutes)
+
+
+DAY_START_MINUTES = _minutes(WORKDAY_START)
+SLOTS_PER_DAY = (_minutes(WORKDAY_END) - DAY_START_MINUTES) // SLOT_MINUTES
+FULL_DAY = (1 << SLOTS_PER_DAY) - 1
+
+
+def covered_slots(appointment: dict) -> range:
+    """Slots overlapped by an appointment's time and duration_minutes, clipped to working hours"""
+    try:
+        start = _minutes(appointment.get("time")) - DAY_START_MINUTES
+    except (ValueError, AttributeError):
+        return range(0)
+    
+    end = start + (appointment.get("duration_minutes") or SLOT_MINUTES)
+    return range(max(start // SLOT_MINUTES, 0), min(-(-end // SLOT_MINUTES), SLOTS_PER_DAY))
+
+
+async def overlapping_booking(collection, appointment: dict) -> Optional[dict]:
+    """Another active booking of the same doctor and day whose time range overlaps this one's"""
+    try:
+        start = _minutes(appointment.get("time"))
+    except (ValueError, AttributeError):
+        return None
+    end = start + (appointment.get("duration_minutes") or SLOT_MINUTES)
+    
+    cursor = collection.find(
+        {
+            "doctor_name": appointment.get("doctor_name"),
+            "date": appointment.get("date"),
+            "slot_reserved": True,
+            "_id": {"$ne": appointment.get("_id")}
+        },
+        {"time": 1, "duration_minutes": 1}
+    )
+    async for other in cursor:
+        try:
+            other_start = _minutes(other.get("time"))
+        except (ValueError, AttributeError):
+            continue
+        if other_start < end and start < other_start + (other.get("duration_minutes") or SLOT_MINUTES):
+            return other
+    return None
+
+
+async def revert_overlapping_update(collection, before: dict, update_data: dict) -> Optional[dict]:
+    """Undo an appointment update that made it overlap another booking; returns that booking"""
+    after = {**before, **update_data}
+    moved = any(after.get(field) != before.get(field) for field in ("doctor_name", "date", "time", "duration_minutes"))
+    if not after.get("slot_reserved") or (before.get("slot_reserved") and not moved):
+        return None
+    clash = await overlapping_booking(collection, after)
+    if clash is None:
+        return None
+    
+    # start_at may have been recomputed from date/time by the update pipeline
+    fields = set(update_data) | {"start_at"}
+    restore = {"$set": {field: before[field] for field in fields if field in before}}
+    unset = {field: "" for field in fields if field not in before}
+    if unset:
+        restore["$unset"] = unset
+    await collection.update_one({"_id": before["_id"]}, restore)
+    return clash
+
+
+def slot_time(index: int) -> str:
+    """HH:MM start time of a slot"""
+    minutes = DAY_START_MINUTES + index * SLOT_MINUTES
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def bitmap_to_times(bitmap: int) -> List[str]:
+    """Start times of the slots set in a bitmap"""
+    return [slot_time(i) for i in range(SLOTS_PER_DAY) if bitmap >> i & 1]
+
+
+def working_bitmap(schedule: Optional[List[str]], day: date) -> int:
+    """All slots if the doctor works that weekday (an empty schedule means every day)"""
+    if not schedule:
+        return FULL_DAY
+    
+    working_days = {d.strip()[:3].title() for d in schedule}
+    return FULL_DAY if WEEKDAYS[day.weekday()] in working_days else 0
+
+
+def upcoming_bitmap(day: date, now: datetime) -> int:
+    """Slots not yet started at `now`: all on later days, none on earlier ones"""
+    if day != now.date():
+        return FULL_DAY if day > now.date() else 0
+    
+    elapsed = now.hour * 60 + now.minute - DAY_START_MINUTES
+    first = max(-(-elapsed // SLOT_MINUTES), 0)
+    return FULL_DAY & ~((1 << first) - 1) if first < SLOTS_PER_DAY else 0
+
+
+def date_range(start: date, days: int) -> List[str]:
+    """ISO dates of `days` consecutive days starting at `start`"""
+    return [(start + timedelta(days=i)).isoformat() for i in range(days)]
+
+
+class SlotCache:
+    """LRU cache of booked-slot counts per (doctor_name, date)"""
+    
+    def __init__(self, max_entries: int = SLOT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str], List[int]]" = OrderedDict()
+        # Appointment id -> cached day it is counted in, to evict moved or deleted appointments
+        self._keys_by_id: Dict[str, Tuple[str, str]] = {}
+        self._ids_by_key: Dict[Tuple[str, str], Set[str]] = {}
+    
+    def _store(self, key: Tuple[str, str], counts: List[int], ids: Set[str]):
+        self.evict(key)
+        self._entries[key] = counts
+        self._ids_by_key[key] = ids
+        for appointment_id in ids:
+            self._keys_by_id[appointment_id] = key
+        while len(self._entries) > self.max_entries:
+            self.evict(next(iter(self._entries)))
+    
+    def evict(self, key: Tuple[str, str]):
+        """Drop a cached day; it is reloaded on the next search"""
+        self._entries.pop(key, None)
+        for appointment_id in self._ids_by_key.pop(key, ()):
+            self._keys_by_id.pop(appointment_id, None)
+    
+    async def booked_bitmaps(self, collection, doctor_names: Iterable[str], dates: List[str]) -> Dict[Tuple[str, str], int]:
+        """Booked bitmap per (doctor_name, date), loading missing days in one query"""
+        keys = [(name, day) for name in doctor_names for day in dates]
+        
+        counts_by_key = {}
+        for key in keys:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                counts_by_key[key] = self._entries[key]
+        
+        missing = [key for key in keys if key not in counts_by_key]
+        if missing:
+            loaded = {key: [0] * SLOTS_PER_DAY for key in missing}
+            ids = {key: set() for key in missing}
+            cursor = collection.find(
+                {
+                    "doctor_name": {"$in": list({name for name, _ in missing})},
+                    "date": {"$in": list({day for _, day in missing})},
+                    "slot_reserved": True
+                },
+                {"doctor_name": 1, "date": 1, "time": 1, "duration_minutes": 1}
+            )
+            async for appt in cursor:
+                key = (appt["doctor_name"], appt["date"])
+                slots = covered_slots(appt)
+                if key in loaded and slots:
+                    for index in slots:
+                        loaded[key][index] += 1
+                    ids[key].add(str(appt["_id"]))
+            
+            for key, counts in loaded.items():
+                self._store(key, counts, ids[key])
+            counts_by_key.update(loaded)
+        
+        return {
+            key: sum(1 << i for i, n in enumerate(counts) if n)
+            for key, counts in counts_by_key.items()
+        }
+    
+    def apply(self, appointment: Optional[dict], delta: int):
+        """Add (+1) or remove (-1) an appointment's slots in the cached day, if loaded"""
+        if not appointment or not appointment.get("slot_reserved"):
+            return
+        
+        key = (appointment.get("doctor_name"), appointment.get("date"))
+        slots = covered_slots(appointment)
+        counts = self._entries.get(key)
+        if counts is not None and slots:
+            for index in slots:
+                counts[index] = max(counts[index] + delta, 0)
+            appointment_id = str(appointment["_id"]) if appointment.get("_id") is not None else None
+            if appointment_id and delta > 0:
+                self._keys_by_id[appointment_id] = key
+                self._ids_by_key[key].add(appointment_id)
+            elif appointment_id:
+                self._keys_by_id.pop(appointment_id, None)
+                self._ids_by_key[key].discard(appointment_id)
+    
+    def apply_change(self, before: Optional[dict], after: Optional[dict]):
+        """Move an appointment's slots from its old state to its new state"""
+        self.apply(before, -1)
+        self.apply(after, +1)
+    
+    def on_change(self, event: dict):
+        """Evict the days an appointment was and now is counted in (everything for bulk changes without an id)"""
+        if event["id"] is None:
+            self.clear()
+            return
+        
+        old_key = self._keys_by_id.get(event["id"])
+        if old_key is not None:
+            self.evict(old_key)
+        document = event.get("document")
+        if document:
+            self.evict((document.get("doctor_name"), document.get("date")))
+    
+    def clear(self):
+        self._entries.clear()
+        self._keys_by_id.clear()
+        self._ids_by_key.clear()
+
+
+# Shared per-process cache
+slot_cache = SlotCache()
+change_feed.add_listener("appointments", slot_cache.on_change)
@@ -0,0 +1,365 @@
+"""
+Hot/Cold Tiering
+Documents that match a collection's cold policy (a status filter plus an
+age on some timestamp) are moved in batches out of the hot collection,
+either into a `<name>_archive` collection or into gzip-compressed NDJSON
+files on local disk, one file per collection and day of `time_field`.
+The hot collections, and so their indexes, stay small enough to live in RAM.
+
+Moves are copy-then-delete by _id, so an interrupted batch is simply
+copied again on the next run; cold reads de-duplicate by _id. The delete
+repeats the cold query, so a document that changed after it was copied
+stays hot and its archived copy is removed again.
+"""
+
+import os
+import gzip
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from bson import json_util
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import BulkWriteError
+
+from utils.changes import record_change
+from utils.db import INDEX_SPECS, get_collection
+from utils.metrics import register_gauge
+
+logger = logging.getLogger(__name__)
+
+# Tiering configuration
+TIERING_BACKEND = os.getenv("TIERING_BACKEND", "collection")  # collection or ndjson
+TIERING_ARCHIVE_DIR = os.getenv("TIERING_ARCHIVE_DIR", "archive")
+TIERING_BATCH_SIZE = int(os.getenv("TIERING_BATCH_SIZE", 500))
+TIERING_INTERVAL_SECONDS = int(os.getenv("TIERING_INTERVAL_SECONDS", 3600))
+TIERING_PAUSE_SECONDS = 0.1
+
+# Cold policy per collection: documents matching `cold` whose `age_field` is
+# older than `days` are archived. Archives are queried and partitioned by
+# `time_field`; `ttl_days` expires archived documents (None keeps them).
+TIERING_POLICIES: Dict[str, Dict[str, Any]] = {
+    "chatbot_logs": {
+        "cold": {},
+        "age_field": "timestamp",
+        "days": 30,
+        "time_field": "timestamp",
+        "ttl_days": 365,
+    },
+    "robot_commands": {
+        "cold": {"status": {"$in": ["completed", "failed", "cancelled"]}},
+        "age_field": "completed_at",
+        "days": 7,
+        "time_field": "timestamp",
+        "ttl_days": 365,
+    },
+    "notifications": {
+        "cold": {"status": "read"},
+        "age_field": "read_at",
+        "days": 30,
+        "time_field": "timestamp",
+        "ttl_days": 180,
+    },
+    "emergency_alerts": {
+        "cold": {"status": {"$in": ["resolved", "false_alarm"]}},
+        "age_field": "resolved_at",
+        "days": 90,
+        "time_field": "triggered_at",
+        "ttl_days": None,
+    },
+    "patients": {
+        "cold": {"status": "discharged"},
+        "age_field": "updated_at",
+        "days": 180,
+        "time_field": "admission_date",
+        "ttl_days": None,
+    },
+}
+
+
+def archive_name(collection_name: str) -> str:
+    return f"{collection_name}_archive"
+
+
+def _register_indexes():
+    """Add the indexes tiering relies on to INDEX_SPECS, created by init_database()"""
+    for name, policy in TIERING_POLICIES.items():
+        hot = INDEX_SPECS.setdefault(name, [])
+        age_key = [(policy["age_field"], ASCENDING)]
+        if not any(model.document["key"] == dict(age_key) for model in hot):
+            hot.append(IndexModel(age_key))
+        
+        archive = [IndexModel([(policy["time_field"], DESCENDING)])]
+        if policy["ttl_days"]:
+            archive.append(IndexModel([("archived_at", ASCENDING)], expireAfterSeconds=policy["ttl_days"] * 86400))
+        INDEX_SPECS[archive_name(name)] = archive
+
+
+_register_indexes()
+
+
+# ==================== NDJSON FILE TIER ====================
+
+def _file_path(collection_name: str, day: str) -> str:
+    return os.path.join(TIERING_ARCHIVE_DIR, collection_name, f"{day}.ndjson.gz")
+
+
+def _append_ndjson(path: str, documents: List[dict]):
+    """Append documents as one gzip member (concatenated members read back as one stream)"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with gzip.open(path, "at", encoding="utf-8") as f:
+        for document in documents:
+            f.write(json_util.dumps(document) + "\n")
+
+
+def _remove_ndjson(path: str, ids: set):
+    """Rewrite a day file without the documents whose _id is in `ids`"""
+    if not os.path.exists(path):
+        return
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        lines = [line for line in f if line.strip() and json_util.loads(line)["_id"] not in ids]
+    with gzip.open(path + ".tmp", "wt", encoding="utf-8") as f:
+        f.writelines(lines)
+    os.replace(path + ".tmp", path)
+
+
+def _expired(day: str, ttl_days: Optional[int]) -> bool:
+    return bool(ttl_days) and day < (datetime.utcnow() - timedelta(days=ttl_days)).strftime("%Y-%m-%d")
+
+
+def _read_ndjson(
+    collection_name: str,
+    start: Optional[datetime],
+    end: Optional[datetime],
+    query: Optional[Dict[str, Any]] = None,
+    limit: Optional[int] = None
+) -> List[dict]:
+    """Documents matching `query` from the day files overlapping [start, end], newest day first"""
+    directory = os.path.join(TIERING_ARCHIVE_DIR, collection_name)
+    if not os.path.isdir(directory):
+        return []
+    
+    ttl_days = TIERING_POLICIES[collection_name]["ttl_days"]
+    first = start.strftime("%Y-%m-%d") if start else None
+    last = end.strftime("%Y-%m-%d") if end else None
+    
+    # Keyed by _id: an interrupted move may have appended a document twice
+    documents: Dict[Any, dict] = {}
+    for filename in sorted(os.listdir(directory), reverse=True):
+        day = filename.split(".")[0]
+        if (first and day < first) or (last and day > last) or _expired(day, ttl_days):
+            continue
+        with gzip.open(os.path.join(directory, filename), "rt", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                document = json_util.loads(line)
+                if query is None or _matches(document, query):
+                    documents.setdefault(document["_id"], document)
+        # Older day files can only hold older documents
+        if limit is not None and len(documents) >= limit:
+            break
+    return list(documents.values())
+
+
+def _prune_ndjson(collection_name: str):
+    """Delete day files past the policy's TTL (the file-tier equivalent of a TTL index)"""
+    ttl_days = TIERING_POLICIES[collection_name]["ttl_days"]
+    directory = os.path.join(TIERING_ARCHIVE_DIR, collection_name)
+    if not ttl_days or not os.path.isdir(directory):
+        return
+    for filename in os.listdir(directory):
+        if _expired(filename.split(".")[0], ttl_days):
+            os.remove(os.path.join(directory, filename))
+
+
+# ==================== MOVING COLD DATA ====================
+
+class Tierer:
+    """Moves cold documents out of the hot collections"""
+    
+    def __init__(self, backend: str = TIERING_BACKEND):
+        self.backend = backend
+        self.archived: Dict[str, int] = {name: 0 for name in TIERING_POLICIES}
+    
+    def cold_query(self, collection_name: str, now: Optional[datetime] = None) -> dict:
+        policy = TIERING_POLICIES[collection_name]
+        cutoff = (now or datetime.utcnow()) - timedelta(days=policy["days"])
+        return {**policy["cold"], policy["age_field"]: {"$lt": cutoff}}
+    
+    def _by_day(self, collection_name: str, documents: List[dict]) -> Dict[str, List[dict]]:
+        """Group archived documents by the NDJSON day file they belong in"""
+        time_field = TIERING_POLICIES[collection_name]["time_field"]
+        by_day: Dict[str, List[dict]] = {}
+        for document in documents:
+            moment = document.get(time_field) or document["archived_at"]
+            by_day.setdefault(moment.strftime("%Y-%m-%d"), []).append(document)
+        return by_day
+    
+    async def _store(self, collection_name: str, batch: List[dict]):
+        now = datetime.utcnow()
+        for document in batch:
+            document["archived_at"] = now
+        
+        if self.backend == "ndjson":
+            for day, documents in self._by_day(collection_name, batch).items():
+                await asyncio.to_thread(_append_ndjson, _file_path(collection_name, day), documents)
+            return
+        
+        try:
+            await get_collection(archive_name(collection_name)).insert_many(batch, ordered=False)
+        except BulkWriteError as e:
+            # Documents copied by an interrupted earlier run are already there
+            if any(error["code"] != 11000 for error in e.details["writeErrors"]):
+                raise
+    
+    async def _unstore(self, collection_name: str, documents: List[dict]):
+        """Remove the archived copies of documents that stayed hot"""
+        ids = [document["_id"] for document in documents]
+        if self.backend == "ndjson":
+            for day in self._by_day(collection_name, documents):
+                await asyncio.to_thread(_remove_ndjson, _file_path(collection_name, day), set(ids))
+            return
+        await get_collection(archive_name(collection_name)).delete_many({"_id": {"$in": ids}})
+    
+    async def archive_collection(self, collection_name: str, batch_size: int = TIERING_BATCH_SIZE) -> int:
+        """Move every currently cold document of a collection, batch by batch"""
+        collection = get_collection(collection_name)
+        query = self.cold_query(collection_name)
+        moved = 0
+        
+        while True:
+            batch = await collection.find(query).limit(batch_size).to_list(length=batch_size)
+            if not batch:
+                break
+            
+            await self._store(collection_name, batch)
+            # Only documents still cold are deleted; one changed since the find stays hot
+            ids = [document["_id"] for document in batch]
+            result = await collection.delete_many({**query, "_id": {"$in": ids}})
+            moved += result.deleted_count
+            record_change(collection_name, "delete")
+            
+            if result.deleted_count < len(batch):
+                kept = set(await collection.distinct("_id", {"_id": {"$in": ids}}))
+                await self._unstore(collection_name, [document for document in batch if document["_id"] in kept])
+            
+            # Yield to request handling between batches
+            await asyncio.sleep(TIERING_PAUSE_SECONDS)
+        
+        if self.backend == "ndjson":
+            await asyncio.to_thread(_prune_ndjson, collection_name)
+        
+        self.archived[collection_name] += moved
+        if moved:
+            logger.info(f"Archived {moved} cold {collection_name} documents ({self.backend})")
+        return moved
+    
+    async def run_once(self):
+        for name in TIERING_POLICIES:
+            try:
+                await self.archive_collection(name)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Tiering {name} failed: {e}")
+    
+    async def run_forever(self, interval: int = TIERING_INTERVAL_SECONDS):
+        """Background loop started from the app lifespan"""
+        while True:
+            await self.run_once()
+            await asyncio.sleep(interval)
+    
+    # ==================== READING BOTH TIERS ====================
+    
+    async def query(
+        self,
+        collection_name: str,
+        filters: Dict[str, Any],
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        limit: int = 100,
+        tiers: tuple = ("hot", "cold")
+    ) -> List[dict]:
+        """Documents from the hot collection and its archive, newest `time_field` first"""
+        time_field = TIERING_POLICIES[collection_name]["time_field"]
+        query = dict(filters)
+        if start or end:
+            query[time_field] = {}
+            if start:
+                query[time_field]["$gte"] = start
+            if end:
+                query[time_field]["$lte"] = end
+        
+        results: Dict[Any, dict] = {}
+        
+        if "hot" in tiers:
+            hot = get_collection(collection_name, read_preference="secondaryPreferred")
+            async for document in hot.find(query).sort(time_field, -1).limit(limit):
+                document["_tier"] = "hot"
+                results[document["_id"]] = document
+        
+        if "cold" in tiers:
+            if self.backend == "ndjson":
+                cold = await asyncio.to_thread(_read_ndjson, collection_name, start, end, query, limit)
+            else:
+                archive = get_collection(archive_name(collection_name), read_preference="secondaryPreferred")
+                cold = await archive.find(query).sort(time_field, -1).limit(limit).to_list(length=limit)
+            for document in cold:
+                document["_tier"] = "cold"
+                results.setdefault(document["_id"], document)
+        
+        merged = sorted(results.values(), key=lambda d: d.get(time_field) or datetime.min, reverse=True)
+        return merged[:limit]
+    
+    async def scan(
+        self,
+        collection_name: str,
+        start: datetime,
+        end: datetime,
+        projection: Optional[Dict[str, Any]] = None,
+        batch_size: int = TIERING_BATCH_SIZE
+    ) -> AsyncIterator[dict]:
+        """Every document with `time_field` in [start, end) from both tiers, unordered (for bulk reads)"""
+        time_field = TIERING_POLICIES[collection_name]["time_field"]
+        query = {time_field: {"$gte": start, "$lt": end}}
+        
+        hot = get_collection(collection_name, read_preference="secondaryPreferred")
+        async for document in hot.find(query, projection).batch_size(batch_size):
+            yield document
+        
+        if self.backend == "ndjson":
+            for document in await asyncio.to_thread(_read_ndjson, collection_name, start, end):
+                if start <= (document.get(time_field) or datetime.min) < end:
+                    yield document
+        else:
+            archive = get_collection(archive_name(collection_name), read_preference="secondaryPreferred")
+            async for document in archive.find(query, projection).batch_size(batch_size):
+                yield document
+
+
+def _matches(document: dict, query: Dict[str, Any]) -> bool:
+    """Evaluate the equality and $gte/$lte filters built by Tierer.query() on a document"""
+    for field, condition in query.items():
+        value = document.get(field)
+        if isinstance(condition, dict):
+            if value is None:
+                return False
+            if "$gte" in condition and value < condition["$gte"]:
+                return False
+            if "$lte" in condition and value > condition["$lte"]:
+                return False
+        elif value != condition:
+            return False
+    return True
+
+
+# Shared tierer
+tierer = Tierer()
+
+register_gauge(
+    "nami_tiering_archived",
+    "Documents moved to the cold tier since startup, per collection",
+    lambda: {f'collection="{name}"': count for name, count in tierer.archived.items()}
+)
@@ -0,0 +1,242 @@
+"""
+Robot Wire Format
+Robot routes negotiate the body format from the Accept and Content-Type
+headers: MessagePack (application/msgpack) or CBOR (application/cbor) when
+the package is installed, JSON otherwise. Binary responses carry the
+trimmed robot command schema (ROBOT_COMMAND_FIELDS) instead of whole
+Mongo documents; JSON responses are unchanged for other consumers.
+
+Bodies of at least WIRE_COMPRESS_MIN_BYTES are compressed with zstd (when
+zstandard is installed and the client accepts it) or gzip. Request bodies
+may use either; responses advertise the accepted request codings in an
+Accept-Encoding header (RFC 7694). Request bodies are read and
+decompressed in chunks and rejected with 413 past WIRE_MAX_BODY_BYTES, so
+neither a large upload nor a small compression bomb can exhaust memory.
+"""
+
+import os
+import gzip
+import json
+import zlib
+import importlib.util
+from datetime import datetime, timezone
+from typing import Any, List, Optional
+
+from bson import ObjectId
+from fastapi import HTTPException, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import Response
+
+# Compression settings
+WIRE_COMPRESS_MIN_BYTES = int(os.getenv("WIRE_COMPRESS_MIN_BYTES", 1024))
+WIRE_GZIP_LEVEL = int(os.getenv("WIRE_GZIP_LEVEL", 6))
+WIRE_ZSTD_LEVEL = int(os.getenv("WIRE_ZSTD_LEVEL", 3))
+# Largest request body accepted, after decompression
+WIRE_MAX_BODY_BYTES = int(os.getenv("WIRE_MAX_BODY_BYTES", 10 * 1024 * 1024))
+
+_CHUNK_BYTES = 64 * 1024
+
+JSON_TYPE = "application/json"
+MSGPACK_TYPE = "application/msgpack"
+CBOR_TYPE = "application/cbor"
+
+_ALIASES = {
+    "application/x-msgpack": MSGPACK_TYPE,
+    "application/vnd.msgpack": MSGPACK_TYPE,
+    "application/*": JSON_TYPE,
+    "*/*": JSON_TYPE,
+}
+
+# Fields a robot needs to carry out a command
+ROBOT_COMMAND_FIELDS = ("_id", "intent", "action", "target", "coordinates", "details", "priority", "scheduled_for")
+
+HAS_MSGPACK = importlib.util.find_spec("msgpack") is not None
+HAS_CBOR = importlib.util.find_spec("cbor2") is not None
+HAS_ZSTD = importlib.util.find_spec("zstandard") is not None
+
+# Media types and content codings this process can handle, in preference order
+MEDIA_TYPES: List[str] = [t for t, ok in ((MSGPACK_TYPE, HAS_MSGPACK), (CBOR_TYPE, HAS_CBOR), (JSON_TYPE, True)) if ok]
+ENCODINGS: List[str] = ["zstd", "gzip"] if HAS_ZSTD else ["gzip"]
+
+
+def _preferences(header: Optional[str]) -> List[str]:
+    """Values of an Accept / Accept-Encoding header, highest q first, q=0 dropped"""
+    weighted = []
+    for position, part in enumerate((header or "").split(",")):
+        value, _, params = part.strip().partition(";")
+        q = 1.0
+        for param in params.split(";"):
+            name, _, number = param.strip().partition("=")
+            if name == "q":
+                try:
+                    q = float(number)
+                except ValueError:
+                    q = 0.0
+        if value and q > 0:
+            weighted.append((-q, position, value.strip().lower()))
+    return [value for _, _, value in sorted(weighted)]
+
+
+def negotiate(request: Request) -> str:
+    """Response media type for a request's Accept header (JSON by default)"""
+    for media_type in _preferences(request.headers.get("accept")):
+        media_type = _ALIASES.get(media_type, media_type)
+        if media_type in MEDIA_TYPES:
+            return media_type
+    return JSON_TYPE
+
+
+def robot_command(command: dict, media_type: str) -> dict:
+    """Whole document for JSON, trimmed to ROBOT_COMMAND_FIELDS for binary formats"""
+    if media_type == JSON_TYPE:
+        return command
+    return {field: command[field] for field in ROBOT_COMMAND_FIELDS if command.get(field) is not None}
+
+
+def _utc(value: datetime) -> datetime:
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def _msgpack_default(value):
+    import msgpack
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, datetime):
+        return msgpack.Timestamp.from_datetime(_utc(value))
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def _cbor_default(encoder, value):
+    if isinstance(value, ObjectId):
+        encoder.encode(str(value))
+        return
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def encode(payload: Any, media_type: str) -> bytes:
+    if media_type == MSGPACK_TYPE:
+        import msgpack
+        return msgpack.packb(payload, default=_msgpack_default)
+    if media_type == CBOR_TYPE:
+        import cbor2
+        return cbor2.dumps(payload, default=_cbor_default, timezone=timezone.utc, datetime_as_timestamp=True)
+    return json.dumps(jsonable_encoder(payload, custom_encoder={ObjectId: str}), separators=(",", ":")).encode()
+
+
+def decode(raw: bytes, media_type: str) -> Any:
+    """Body in any supported format; binary timestamps come back as aware UTC datetimes"""
+    media_type = _ALIASES.get(media_type, media_type)
+    if media_type == MSGPACK_TYPE and HAS_MSGPACK:
+        import msgpack
+        return msgpack.unpackb(raw, timestamp=3)
+    if media_type == CBOR_TYPE and HAS_CBOR:
+        import cbor2
+        return cbor2.loads(raw)
+    if media_type in ("", JSON_TYPE):
+        return json.loads(raw)
+    raise HTTPException(status_code=415, detail=f"Unsupported body type {media_type}; use one of {', '.join(MEDIA_TYPES)}")
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    if encoding == "zstd":
+        import zstandard
+        return zstandard.ZstdCompressor(level=WIRE_ZSTD_LEVEL).compress(data)
+    return gzip.compress(data, compresslevel=WIRE_GZIP_LEVEL)
+
+
+class _TooLarge(Exception):
+    pass
+
+
+def _too_large(limit: int) -> HTTPException:
+    return HTTPException(status_code=413, detail=f"Request body exceeds {limit} bytes")
+
+
+def _gunzip(data: bytes, limit: int) -> bytes:
+    """gzip.decompress (all members) that stops once the output passes `limit`"""
+    out = bytearray()
+    while data:
+        decompressor = zlib.decompressobj(wbits=31)
+        out += decompressor.decompress(data, limit + 1 - len(out))
+        if len(out) > limit:
+            raise _TooLarge()
+        if not decompressor.eof:
+            raise ValueError("Truncated gzip member")
+        data = decompressor.unused_data
+    return bytes(out)
+
+
+def _unzstd(data: bytes, limit: int) -> bytes:
+    """zstd decompression (all frames) that stops once the output passes `limit`"""
+    import zstandard
+    out = bytearray()
+    with zstandard.ZstdDecompressor().stream_reader(data, read_across_frames=True) as reader:
+        while True:
+            chunk = reader.read(_CHUNK_BYTES)
+            if not chunk:
+                return bytes(out)
+            out += chunk
+            if len(out) > limit:
+                raise _TooLarge()
+
+
+def decompress(data: bytes, encoding: Optional[str], limit: int = WIRE_MAX_BODY_BYTES) -> bytes:
+    encoding = (encoding or "identity").strip().lower()
+    if encoding not in ENCODINGS + ["identity"]:
+        raise HTTPException(status_code=415, detail=f"Unsupported Content-Encoding {encoding}; use one of {', '.join(ENCODINGS)}")
+    try:
+        if encoding == "identity":
+            if len(data) > limit:
+                raise _TooLarge()
+            return data
+        if encoding == "zstd":
+            return _unzstd(data, limit)
+        return _gunzip(data, limit)
+    except _TooLarge:
+        raise _too_large(limit)
+    except Exception:
+        raise HTTPException(status_code=400, detail=f"Invalid {encoding} body")
+
+
+async def _read_raw(request: Request, limit: int = WIRE_MAX_BODY_BYTES) -> bytes:
+    """Request body as sent, rejected as soon as it passes `limit` (before it is buffered whole)"""
+    length = request.headers.get("content-length", "")
+    if length.isdigit() and int(length) > limit:
+        raise _too_large(limit)
+    
+    raw = bytearray()
+    async for chunk in request.stream():
+        raw += chunk
+        if len(raw) > limit:
+            raise _too_large(limit)
+    return bytes(raw)
+
+
+async def read_body(request: Request) -> Any:
+    """Decompressed, decoded request body (JSON, MessagePack or CBOR)"""
+    raw = decompress(await _read_raw(request), request.headers.get("content-encoding"))
+    media_type = request.headers.get("content-type", JSON_TYPE).split(";")[0].strip().lower()
+    try:
+        return decode(raw, media_type)
+    except HTTPException:
+        raise
+    except Exception:
+        raise HTTPException(status_code=400, detail=f"Invalid {media_type} body")
+
+
+def wire_response(request: Request, payload: Any, media_type: Optional[str] = None) -> Response:
+    """Payload in the negotiated format, compressed when large enough and accepted"""
+    media_type = media_type or negotiate(request)
+    body = encode(payload, media_type)
+    headers = {"Vary": "Accept, Accept-Encoding", "Accept-Encoding": ", ".join(ENCODINGS)}
+    
+    if len(body) >= WIRE_COMPRESS_MIN_BYTES:
+        accepted = _preferences(request.headers.get("accept-encoding"))
+        encoding = next((e for e in accepted if e in ENCODINGS), None)
+        if encoding is None and "*" in accepted:
+            encoding = ENCODINGS[0]
+        if encoding:
+            body = compress(body, encoding)
+            headers["Content-Encoding"] = encoding
+    
+    return Response(content=body, media_type=media_type, headers=headers)
@@ -0,0 +1,147 @@
+"""
+Robot Command Journal
+SQLite file on the robot holding the commands it has claimed and the
+status reports (started, completed, failed, telemetry) the backend has not
+acknowledged yet. Every state change is committed locally before anything
+is sent, so the robot keeps working through its queue while the backend is
+unreachable and loses nothing across restarts; reports are uploaded in
+order and deleted once the backend acknowledges them.
+"""
+
+import json
+import sqlite3
+from datetime import datetime
+from typing import List, Optional
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS commands (
+    id TEXT PRIMARY KEY,
+    body TEXT NOT NULL,
+    urgent INTEGER NOT NULL DEFAULT 0,
+    state TEXT NOT NULL DEFAULT 'queued',  -- queued, executing, done
+    received_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS commands_state ON commands (state, urgent DESC, received_at);
+
+CREATE TABLE IF NOT EXISTS reports (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,  -- started, completed, failed, released, telemetry
+    command_id TEXT,
+    at TEXT NOT NULL,
+    error_message TEXT,
+    data TEXT
+);
+"""
+
+
+def _now() -> str:
+    return datetime.utcnow().isoformat()
+
+
+class Journal:
+    """Local queue of claimed commands and outbox of unacknowledged reports"""
+    
+    def __init__(self, path: str):
+        self.db = sqlite3.connect(path)
+        self.db.row_factory = sqlite3.Row
+        # WAL keeps commits cheap on SD cards; NORMAL still survives an application crash
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+        self._last_telemetry: Optional[dict] = None
+    
+    def close(self):
+        self.db.close()
+    
+    # ---- commands ----
+    
+    def add_commands(self, commands: List[dict]):
+        """Queue commands handed out by the backend (already claimed for this robot)"""
+        with self.db:
+            self.db.executemany(
+                "INSERT OR IGNORE INTO commands (id, body, urgent, received_at) VALUES (?, ?, ?, ?)",
+                [(str(c["_id"]), json.dumps(c, default=str), int(c.get("priority") == "urgent"), _now()) for c in commands]
+            )
+    
+    def next_command(self) -> Optional[dict]:
+        """Next queued command, urgent first, then in the order received"""
+        row = self.db.execute(
+            "SELECT body FROM commands WHERE state = 'queued' ORDER BY urgent DESC, received_at LIMIT 1"
+        ).fetchone()
+        return json.loads(row["body"]) if row else None
+    
+    def queued_count(self) -> int:
+        return self.db.execute("SELECT COUNT(*) FROM commands WHERE state = 'queued'").fetchone()[0]
+    
+    def held(self) -> List[str]:
+        """Ids of commands claimed but not finished"""
+        return [row["id"] for row in self.db.execute("SELECT id FROM commands WHERE state != 'done'")]
+    
+    def start(self, command_id: str):
+        with self.db:
+            self.db.execute("UPDATE commands SET state = 'executing' WHERE id = ?", (command_id,))
+            self._report("started", command_id)
+    
+    def finish(self, command_id: str, success: bool, error_message: Optional[str] = None):
+        with self.db:
+            self.db.execute("UPDATE commands SET state = 'done' WHERE id = ?", (command_id,))
+            self._report("completed" if success else "failed", command_id, error_message)
+    
+    def drop(self, command_ids: List[str]):
+        """Forget queued commands the backend cancelled or reassigned"""
+        with self.db:
+            self.db.executemany("DELETE FROM commands WHERE id = ? AND state = 'queued'", [(i,) for i in command_ids])
+    
+    def interrupted(self) -> List[str]:
+        """Commands that were executing when the robot last stopped; reported failed"""
+        ids = [row["id"] for row in self.db.execute("SELECT id FROM commands WHERE state = 'executing'")]
+        for command_id in ids:
+            self.finish(command_id, False, "Robot restarted during execution")
+        return ids
+    
+    # ---- reports ----
+    
+    def _report(self, kind: str, command_id: Optional[str] = None, error_message: Optional[str] = None, data: Optional[dict] = None):
+        self.db.execute(
+            "INSERT INTO reports (kind, command_id, at, error_message, data) VALUES (?, ?, ?, ?, ?)",
+            (kind, command_id, _now(), error_message, json.dumps(data) if data is not None else None)
+        )
+    
+    def record_telemetry(self, data: dict, battery_step: float = 1.0) -> bool:
+        """Journal a telemetry sample only if something changed since the last one (delta)"""
+        last = self._last_telemetry
+        if last is not None and all(
+            abs(data[key] - last.get(key, 0)) < battery_step if key == "battery" else data[key] == last.get(key)
+            for key in data
+        ):
+            return False
+        with self.db:
+            self._report("telemetry", data=data)
+        self._last_telemetry = dict(data)
+        return True
+    
+    def pending_reports(self, limit: int) -> List[dict]:
+        rows = self.db.execute("SELECT * FROM reports ORDER BY seq LIMIT ?", (limit,)).fetchall()
+        reports = []
+        for row in rows:
+            report = {"seq": row["seq"], "kind": row["kind"], "at": row["at"]}
+            if row["command_id"]:
+                report["command_id"] = row["command_id"]
+            if row["error_message"]:
+                report["error_message"] = row["error_message"]
+            if row["data"]:
+                report["data"] = json.loads(row["data"])
+            reports.append(report)
+        return reports
+    
+    def pending_count(self) -> int:
+        return self.db.execute("SELECT COUNT(*) FROM reports").fetchone()[0]
+    
+    def ack(self, up_to_seq: int):
+        """Delete acknowledged reports, and finished commands with nothing left to report"""
+        with self.db:
+            self.db.execute("DELETE FROM reports WHERE seq <= ?", (up_to_seq,))
+            self.db.execute(
+                "DELETE FROM commands WHERE state = 'done' "
+                "AND id NOT IN (SELECT command_id FROM reports WHERE command_id IS NOT NULL)"
+            )
@@ -1,6 +1,19 @@
 """
 Raspberry Pi Robot Client
 Simulates a robot that polls for commands and executes them
+
+Offline-first: claimed commands and status reports live in a local SQLite
+journal (journal.py). The robot works through its journal whether or not
+the backend is reachable; each sync uploads every unacknowledged report
+(completions and telemetry) in one POST /robot/sync, which also tops up
+the local command queue. Syncs use MessagePack and zstd/gzip (wire.py).
+Urgent commands are never queued ahead: while online, the robot claims one
+right before it would start its next local command.
+
+Three concurrent tasks share one keep-alive HTTP session: the receiver
+keeps the next command prefetched into the journal while the current one
+runs, the executor works through the journal, and the reporter uploads
+status and telemetry. Syncs never overlap, so each report is sent once.
 """
 
 import asyncio
@@ -10,11 +23,19 @@ import time
 from datetime import datetime
 from dotenv import load_dotenv
 
+from journal import Journal
+from wire import Wire, CONTENT_TYPE
+
 load_dotenv()
 
 API_BASE = os.getenv("API_BASE", "http://localhost:5000")
 ROBOT_ID = os.getenv("ROBOT_ID", "NAMI-001")
 POLL_INTERVAL = 3  # seconds
+JOURNAL_PATH = os.getenv("JOURNAL_PATH", "robot_journal.db")
+CLAIM_AHEAD = int(os.getenv("CLAIM_AHEAD", 2))  # commands kept queued locally, to keep working offline
+SYNC_BATCH_SIZE = int(os.getenv("SYNC_BATCH_SIZE", 500))  # reports per sync request
+SYNC_TIMEOUT = float(os.getenv("SYNC_TIMEOUT", 10))  # seconds
+TELEMETRY_INTERVAL = float(os.getenv("TELEMETRY_INTERVAL", 3))  # seconds
 
 
 class RobotClient:
@@ -26,6 +47,14 @@ class RobotClient:
         self.battery = 100
         self.status = "idle"
         self.current_task = None
+        self.journal = Journal(JOURNAL_PATH)
+        self.online = None
+        self.http = None  # one keep-alive session, opened in run()
+        self.wire = Wire()
+        self.sync_lock = asyncio.Lock()
+        self.work_ready = asyncio.Event()  # commands added to the journal
+        self.need_work = asyncio.Event()  # journal queue below CLAIM_AHEAD
+        self.reports_ready = asyncio.Event()  # a command finished; report it now
         
     def log(self, message: str):
         """Log with timestamp"""
@@ -33,13 +62,78 @@ class RobotClient:
         print(f"[{timestamp}] 🤖 {self.robot_id}: {message}")
     
     async def update_status(self):
-        """Report status to backend"""
-        async with httpx.AsyncClient() as client:
-            try:
-                # In a real robot, this would send actual telemetry
-                pass
-            except Exception as e:
-                self.log(f"Status update failed: {e}")
+        """Journal telemetry for the next sync (only when it changed)"""
+        # In a real robot, this would read actual sensors
+        self.journal.record_telemetry({
+            "location": self.current_location,
+            "battery": round(self.battery, 1),
+            "status": self.status,
+        })
+    
+    async def sync(self):
+        """Upload journaled reports in one compressed request and top up the local command queue"""
+        async with self.sync_lock:
+            await self._sync()
+    
+    async def _sync(self):
+        payload = {
+            "robot_id": self.robot_id,
+            "reports": self.journal.pending_reports(SYNC_BATCH_SIZE),
+            "held": self.journal.held(),
+            "claim": max(CLAIM_AHEAD - self.journal.queued_count(), 0),
+        }
+        body, headers = self.wire.encode(payload)
+        
+        try:
+            response = await self.http.post("/robot/sync", content=body, headers=headers)
+            response.raise_for_status()
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code == 415 and self.wire.downgrade():
+                self.log("⚠️  Backend cannot read MessagePack; syncing as JSON")
+                return
+            self.log(f"❌ Sync rejected: {e.response.status_code} {e.response.text[:200]}")
+            return
+        except httpx.HTTPError as e:
+            if self.online is not False:
+                self.log(f"📴 Backend unreachable ({type(e).__name__}); working from the local journal")
+            self.online = False
+            return
+        
+        result = self.wire.decode(response)
+        if self.online is False:
+            self.log(f"📶 Back online; synced {len(payload['reports'])} reports ({len(body)} bytes)")
+        self.online = True
+        
+        if result["acked"] is not None:
+            self.journal.ack(result["acked"])
+        for report in result["results"]:
+            if report["status"] != "ok":
+                self.log(f"⚠️  Report {report['seq']} {report['status']}: {report.get('error')}")
+        if result["dropped"]:
+            self.journal.drop(result["dropped"])
+            self.log(f"🗑️  Dropped {len(result['dropped'])} commands cancelled or reassigned by the backend")
+        if result["commands"]:
+            self.journal.add_commands(result["commands"])
+            self.work_ready.set()
+    
+    async def claim_urgent(self):
+        """Claim an urgent command to run next, ahead of the local queue (only while online)"""
+        if not self.online:
+            return None
+        try:
+            response = await self.http.post(
+                "/robot/commands/claim",
+                params={"robot_id": self.robot_id, "execute": "false", "urgent": "true"}
+            )
+            response.raise_for_status()
+        except httpx.HTTPError:
+            return None
+        
+        command = self.wire.decode(response)["command"]
+        if command:
+            self.log(f"🚨 Claimed urgent command {command['_id']}")
+            self.journal.add_commands([command])
+        return command
     
     async def navigate_to(self, target: str, coordinates: dict = None):
         """Simulate navigation to a location"""
@@ -100,12 +194,8 @@ class RobotClient:
         self.log(f"📋 Executing: {intent} - {action} -> {target}")
         self.current_task = command_id
         
-        # Mark as executing
-        async with httpx.AsyncClient() as client:
-            try:
-                await client.post(f"{API_BASE}/robot/commands/{command_id}/execute")
-            except:
-                pass
+        # Journaled first, so the report survives being offline or a restart
+        self.journal.start(command_id)
         
         try:
             # Execute based on intent
@@ -119,6 +209,10 @@ class RobotClient:
             elif intent == "medicine_delivery":
                 await self.deliver_medicine(details)
             
+            elif intent == "emergency":
+                self.log(f"🚨 Emergency {details.get('alert_type', '')} - responding to {target}")
+                await self.navigate_to(target)
+            
             elif intent == "robot_control":
                 if action == "stop":
                     self.log("⏸️  Robot stopped")
@@ -134,81 +228,102 @@ class RobotClient:
             else:
                 self.log(f"⚠️  Unknown intent: {intent}")
             
-            # Mark as completed
-            async with httpx.AsyncClient() as client:
-                try:
-                    await client.post(
-                        f"{API_BASE}/robot/commands/{command_id}/complete",
-                        params={"success": True}
-                    )
-                    self.log(f"✅ Command completed successfully")
-                except Exception as e:
-                    self.log(f"Failed to mark command as complete: {e}")
+            # Mark as completed (reported on the next sync)
+            self.journal.finish(command_id, True)
+            self.log(f"✅ Command completed successfully")
         
         except Exception as e:
             self.log(f"❌ Command execution failed: {e}")
             
             # Mark as failed
-            async with httpx.AsyncClient() as client:
-                try:
-                    await client.post(
-                        f"{API_BASE}/robot/commands/{command_id}/complete",
-                        params={"success": False, "error_message": str(e)}
-                    )
-                except:
-                    pass
+            self.journal.finish(command_id, False, str(e))
         
         finally:
             self.current_task = None
             self.status = "idle"
     
-    async def poll_for_commands(self):
-        """Poll backend for new commands"""
-        async with httpx.AsyncClient() as client:
+    async def receiver(self):
+        """Keep the journal queue topped up, so the next command is already local when one finishes"""
+        while True:
+            try:
+                self.need_work.clear()
+                await self.sync()
+                # Wake early when the executor takes a command, to prefetch its successor
+                try:
+                    await asyncio.wait_for(self.need_work.wait(), POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+            except Exception as e:
+                self.log(f"Receiver error: {e}")
+                await asyncio.sleep(POLL_INTERVAL)
+    
+    async def executor(self):
+        """Execute journaled commands back to back, online or not"""
+        while True:
             try:
-                response = await client.get(f"{API_BASE}/robot/commands/pending")
-                commands = response.json()
+                command = self.journal.next_command()
+                if command is None or command.get("priority") != "urgent":
+                    command = await self.claim_urgent() or command
+                if command is None:
+                    self.work_ready.clear()
+                    try:
+                        await asyncio.wait_for(self.work_ready.wait(), POLL_INTERVAL)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
                 
-                if commands:
-                    # Execute the oldest pending command
-                    command = commands[0]
-                    await self.execute_command(command)
-                    
-            except httpx.ConnectError:
-                self.log("❌ Cannot connect to backend server")
+                # Prefetch the next command while this one runs
+                self.need_work.set()
+                await self.execute_command(command)
+                self.reports_ready.set()
             except Exception as e:
-                self.log(f"Error polling for commands: {e}")
+                self.log(f"Executor error: {e}")
+                await asyncio.sleep(POLL_INTERVAL)
     
-    async def run(self):
-        """Main robot loop"""
-        self.log(f"🚀 Starting robot client")
-        self.log(f"📍 Initial location: {self.current_location}")
-        self.log(f"🔋 Battery: {self.battery}%")
-        self.log(f"🔗 Connected to: {API_BASE}")
-        self.log(f"⏱️  Polling interval: {POLL_INTERVAL}s")
-        print("")
-        
+    async def reporter(self):
+        """Journal telemetry and upload reports: right after each command, else every TELEMETRY_INTERVAL"""
         while True:
             try:
-                if self.status == "idle":
-                    await self.poll_for_commands()
+                try:
+                    await asyncio.wait_for(self.reports_ready.wait(), TELEMETRY_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                self.reports_ready.clear()
                 
                 # Simulate battery drain
                 if self.battery > 0:
                     self.battery -= 0.1
                 
-                # Report status periodically
                 await self.update_status()
-                
-                # Wait before next poll
-                await asyncio.sleep(POLL_INTERVAL)
-                
-            except KeyboardInterrupt:
-                self.log("👋 Shutting down robot client")
-                break
+                if self.journal.pending_count():
+                    await self.sync()
             except Exception as e:
-                self.log(f"Unexpected error: {e}")
+                self.log(f"Reporter error: {e}")
                 await asyncio.sleep(POLL_INTERVAL)
+    
+    async def run(self):
+        """Main robot loop"""
+        self.log(f"🚀 Starting robot client")
+        self.log(f"📍 Initial location: {self.current_location}")
+        self.log(f"🔋 Battery: {self.battery}%")
+        self.log(f"🔗 Connected to: {API_BASE} ({CONTENT_TYPE})")
+        self.log(f"⏱️  Polling interval: {POLL_INTERVAL}s")
+        self.log(f"📓 Journal: {JOURNAL_PATH} ({self.journal.queued_count()} queued, {self.journal.pending_count()} unsent reports)")
+        print("")
+        
+        for command_id in self.journal.interrupted():
+            self.log(f"⚠️  Command {command_id} was interrupted by a restart; reporting it failed")
+        
+        # One pooled keep-alive session for every request
+        limits = httpx.Limits(max_connections=2, max_keepalive_connections=2, keepalive_expiry=60)
+        async with httpx.AsyncClient(base_url=API_BASE, timeout=SYNC_TIMEOUT, limits=limits, headers=self.wire.headers) as self.http:
+            tasks = [asyncio.create_task(task()) for task in (self.receiver, self.executor, self.reporter)]
+            try:
+                await asyncio.gather(*tasks)
+            finally:
+                for task in tasks:
+                    task.cancel()
+                self.log("👋 Shutting down robot client")
 
 
 async def main():
@@ -219,7 +334,10 @@ async def main():
     print("")
     
     robot = RobotClient()
-    await robot.run()
+    try:
+        await robot.run()
+    finally:
+        robot.journal.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,89 @@
+"""
+Robot Wire Format (client side)
+Sync bodies go out as MessagePack when the msgpack package is installed
+(WIRE_FORMAT=json forces JSON), and responses are requested in the same
+format, which carries the backend's trimmed command schema. Bodies of at
+least WIRE_COMPRESS_MIN_BYTES are compressed with the best coding the
+backend advertised in its last Accept-Encoding response header: zstd when
+zstandard is installed, else gzip.
+"""
+
+import gzip
+import json
+import os
+from typing import Any, Optional, Tuple
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+WIRE_FORMAT = os.getenv("WIRE_FORMAT", "msgpack")
+WIRE_COMPRESS_MIN_BYTES = int(os.getenv("WIRE_COMPRESS_MIN_BYTES", 1024))
+
+JSON_TYPE = "application/json"
+MSGPACK_TYPE = "application/msgpack"
+
+USE_MSGPACK = WIRE_FORMAT == "msgpack" and msgpack is not None
+CONTENT_TYPE = MSGPACK_TYPE if USE_MSGPACK else JSON_TYPE
+
+
+class Wire:
+    """Encodes requests and decodes responses, tracking what the backend accepts"""
+    
+    def __init__(self):
+        # Until the backend says otherwise, assume only gzip request bodies
+        self.request_encodings = ["gzip"]
+        self.content_type = CONTENT_TYPE
+    
+    @property
+    def headers(self) -> dict:
+        """Accept headers for every request on the session"""
+        return {
+            "Accept": f"{MSGPACK_TYPE}, {JSON_TYPE};q=0.5" if USE_MSGPACK else JSON_TYPE,
+            "Accept-Encoding": "zstd, gzip" if zstandard else "gzip",
+        }
+    
+    def encode(self, payload: Any) -> Tuple[bytes, dict]:
+        """Request body and its Content-Type / Content-Encoding headers"""
+        if self.content_type == MSGPACK_TYPE:
+            body = msgpack.packb(payload)
+        else:
+            body = json.dumps(payload, separators=(",", ":")).encode()
+        headers = {"Content-Type": self.content_type}
+        
+        encoding = self._encoding() if len(body) >= WIRE_COMPRESS_MIN_BYTES else None
+        if encoding == "zstd":
+            body = zstandard.ZstdCompressor(level=3).compress(body)
+        elif encoding == "gzip":
+            body = gzip.compress(body)
+        if encoding:
+            headers["Content-Encoding"] = encoding
+        return body, headers
+    
+    def downgrade(self) -> bool:
+        """Fall back to JSON request bodies (backend without MessagePack answered 415)"""
+        if self.content_type == JSON_TYPE:
+            return False
+        self.content_type = JSON_TYPE
+        return True
+    
+    def _encoding(self) -> Optional[str]:
+        if zstandard and "zstd" in self.request_encodings:
+            return "zstd"
+        return "gzip" if "gzip" in self.request_encodings else None
+    
+    def decode(self, response) -> Any:
+        """Decoded response body (httpx has already undone its Content-Encoding)"""
+        advertised = response.headers.get("accept-encoding")
+        if advertised:
+            self.request_encodings = [e.strip().lower() for e in advertised.split(",") if e.strip()]
+        
+        if response.headers.get("content-type", "").startswith(MSGPACK_TYPE) and msgpack is not None:
+            return msgpack.unpackb(response.content, timestamp=3)
+        return response.json()